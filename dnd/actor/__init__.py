@@ -1 +1,2 @@
 from dnd.actor.actor import *
+from dnd.actor.template import *
@@ -1,42 +1,123 @@
 
+import contextlib
+
+import dnd.instrument as _instrument
 import dnd.variable as _v
 import dnd.actor.race as race
+import dnd.actor.inventory as inventory
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
-    from typing import Callable, Dict, List, Union, Optional
+    from typing import Any, Callable, Dict, Iterator, List, Union, Optional
     from dnd.variable import Attribute, Points, StrVar, IntVar
+    from dnd.actor.race import Race
+    from dnd.actor.template import Template
 
 
 class Actor(object):
+    AttributeKeys = ('hp', 'mp', 'str', 'dex', 'con', 'int', 'wis', 'cha')
+
+    # Set while inside of batch(); kept on the class so idle actors don't store them
+    _batch_depth = 0
+    _batch_dirty = False
+
+    @staticmethod
+    def from_json(json_data: 'Dict[str, Any]', races: 'Optional[race.Registry]' = None) -> 'Actor':
+        """Build an Actor from a save file entry.
+
+        Only the state an Actor can hold is read: name, race, speed,
+        init_mod, the hp/mp points and the six attributes. Class levels and
+        feats are ignored. Races are looked up in races if given; the
+        racial values stored in the save are used as is.
+        """
+        race_obj = None
+        race_name = json_data.get("race", None)
+        speed = int(json_data.get("speed", 30))
+        if race_name is not None:
+            if races is not None and race_name in races:
+                race_obj = races.get(race_name)
+            else:
+                race_obj = race.Race(race_name, speed=speed)
+
+        actor = Actor(
+            name=json_data.get("name", ""), race=race_obj,
+            init_mod=json_data.get("init_mod", 0), max_dex_mod=json_data.get("max_dex_mod", 0)
+        )
+        actor._speed.set(speed)
+
+        for key in ('hp', 'mp'):
+            points_data = json_data.get(key, None)
+            if points_data is not None:
+                points = actor._attributes[key]
+                points.max(int(points_data.get("max", points.max())))
+                points.current(int(points_data.get("current", points.max())))
+                points.temp(int(points_data.get("temp", 0)))
+
+        for key in ('str', 'dex', 'con', 'int', 'wis', 'cha'):
+            attribute_data = json_data.get(key, None)
+            if attribute_data is not None:
+                attribute = actor._attributes[key]
+                attribute.level(int(attribute_data.get("level", 10)))
+                attribute.racial(int(attribute_data.get("racial", 0)))
+                attribute.enhancement(int(attribute_data.get("enhance", 0)))
+                attribute.spell(int(attribute_data.get("spell", 0)))
+
+        return actor
+
     def __init__(self, **kwargs) -> None:
         self._pass_through = lambda a, o, n, m=None: self.notify()
-
-        self._name = _v.StrVar(kwargs.get("name", ""), listener=self._pass_through)  # type: StrVar
-        self._race = kwargs.get("race", None)  # type: Race
-        self._init_mod = int(kwargs.get("init_mod", 0))  # type: int
+        self._template = kwargs.get("template", None)  # type: Optional[Template]
+        template = self._template
+
+        # Actors shared between threads get a single reentrant lock which is
+        # also used by all of their variables; otherwise locking is a no-op.
+        self._lock = _v.new_lock() if kwargs.get("thread_safe", False) else _v.NullLock
+        lock = self._lock if self._lock is not _v.NullLock else None
+
+        self._name = _v.StrVar(kwargs.get("name", ""), listener=self._pass_through, lock=lock)  # type: StrVar
+        if template is None:
+            self._race = kwargs.get("race", None)  # type: Race
+            self._init_mod = int(kwargs.get("init_mod", 0))  # type: int
+            self._max_dex_mod = int(kwargs.get("max_dex_mod", 0))  # type: int
+            speed = 30 if self._race is None else self._race.speed
+        else:
+            self._race = kwargs.get("race", template.race())
+            self._init_mod = int(kwargs.get("init_mod", template.init_mod()))
+            self._max_dex_mod = int(kwargs.get("max_dex_mod", template.max_dex_mod()))
+            speed = template.speed()
         self._init_roll = 0  # type: int
-        self._max_dex_mod = int(kwargs.get("max_dex_mod", 0))  # type: int
-        self._speed = _v.IntVar(30 if self._race is None else self._race.speed)  # type: IntVar
+        self._speed = _v.IntVar(speed, lock=lock)  # type: IntVar
 
         # An object that we notify whenever we update things that aren't already attached
         self._listeners = list()  # type: List[Callable[['Actor'], None]]
         
         self._armor = None
+        self._inventory = None  # type: Optional[inventory.Inventory]
+
+        if template is not None:
+            # Variables are built on demand from the template's shared baselines
+            self._attributes = template.attributes(self._pass_through, self._lock)
+            return
 
         self._attributes = {
-            'hp': _v.Points(10, listener=self._pass_through),
-            'mp': _v.Points(10, listener=self._pass_through),
-
-            'str': _v.Attribute(listener=self._pass_through),
-            'dex': _v.Attribute(listener=self._pass_through),
-            'con': _v.Attribute(listener=self._pass_through),
-            'int': _v.Attribute(listener=self._pass_through),
-            'wis': _v.Attribute(listener=self._pass_through),
-            'cha': _v.Attribute(listener=self._pass_through)
+            'hp': _v.Points(10, listener=self._pass_through, lock=lock),
+            'mp': _v.Points(10, listener=self._pass_through, lock=lock),
+
+            'str': _v.Attribute(listener=self._pass_through, lock=lock),
+            'dex': _v.Attribute(listener=self._pass_through, lock=lock),
+            'con': _v.Attribute(listener=self._pass_through, lock=lock),
+            'int': _v.Attribute(listener=self._pass_through, lock=lock),
+            'wis': _v.Attribute(listener=self._pass_through, lock=lock),
+            'cha': _v.Attribute(listener=self._pass_through, lock=lock)
         }  # type: Dict[str, Union[Points, Attribute]]
 
     def notify(self) -> None:
+        if self._batch_depth > 0:
+            self._batch_dirty = True
+            return
+        if _instrument.active is not None:
+            _instrument.active.dispatch(self._listeners, (self,))
+            return
         for listener in self._listeners:
             listener(self)
 
@@ -47,6 +128,46 @@ class Actor(object):
     def remove_listener(self, listener: 'Callable[[Actor], None]'):
         self._listeners.remove(listener)
 
+    def thread_safe(self) -> bool:
+        return self._lock is not _v.NullLock
+
+    def lock(self) -> 'Any':
+        """Get the lock shared by this actor and all of its variables.
+
+        Every update to a thread safe actor takes this lock, so holding it
+        makes a sequence of reads and updates atomic:
+
+            with actor.lock():
+                if actor.hp().current() > 0:
+                    actor.hp().dec_current(damage)
+
+        For actors created without thread_safe=True this is a no-op lock.
+        """
+        return self._lock
+
+    @contextlib.contextmanager
+    def batch(self) -> 'Iterator[Actor]':
+        """Coalesce the notifications of several updates into one.
+
+        Listeners of the actor are notified at most once, when the
+        outermost batch exits, and only if something changed. Listeners
+        attached directly to the actor's variables are still called for
+        every change. The actor's lock is held for the whole batch.
+        """
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    dirty, self._batch_dirty = self._batch_dirty, False
+                    if dirty:
+                        self.notify()
+
+    def template(self) -> 'Optional[Template]':
+        return self._template
+
     def attribute(self, key: str) -> 'Union[Points, Attribute]':
         return self._attributes[key]
 
@@ -59,6 +180,18 @@ class Actor(object):
     def strength(self) -> 'Attribute':
         return self._attributes['str']
 
+    def inventory(self) -> 'inventory.Inventory':
+        """Get the actor's inventory, creating it on first use.
+
+        Changes to the inventory notify the actor's listeners, and its
+        encumbrance uses the actor's current strength.
+        """
+        if self._inventory is None:
+            lock = self._lock if self._lock is not _v.NullLock else None
+            self._inventory = inventory.Inventory(
+                listener=self._pass_through, strength=self._attributes['str'].current, lock=lock)
+        return self._inventory
+
     def dexterity(self) -> 'Attribute':
         return self._attributes['dex']
 
@@ -76,11 +209,24 @@ class Actor(object):
 
     def initiative(self, roll_value: 'Optional[int]' = None) -> int:
         if roll_value is not None:
-            self._init_roll = max(min(roll_value, 20), 1)
-        return self._init_mod + min(self.dexterity().mod(), self._max_dex_mod)
+            with self._lock:
+                old_roll, self._init_roll = self._init_roll, max(min(roll_value, 20), 1)
+                if old_roll != self._init_roll:
+                    self.notify()
+        return self._init_mod + min(self._peek('dex').mod(), self._max_dex_mod)
+
+    def init_roll(self) -> int:
+        return self._init_roll
 
     def speed(self) -> 'IntVar':
         return self._speed
 
     def __getitem__(self, key: str):
         return self._attributes[key]
+
+    def _peek(self, key: str) -> '_v.Variable':
+        # Read a variable without creating it on a spawned actor, see
+        # _TemplateAttributes.peek(). The result must not be changed.
+        attrs = self._attributes
+        variable = dict.get(attrs, key, None)
+        return variable if variable is not None else attrs.peek(key)
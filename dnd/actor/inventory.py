@@ -0,0 +1,204 @@
+
+import dnd.variable as _v
+from dnd.item import money
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+    from dnd.item import Item
+    InventoryListener = Callable[['Inventory', float, float, str], None]
+
+
+# Heavy load limits in lbs for strength 1 to 29. Light loads are up to a
+# third of this and medium loads up to two thirds. Every 10 points of
+# strength past 29 multiplies the limits by 4.
+_HeavyLoads = (
+    0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100, 115, 130, 150, 175, 200, 230, 260, 300, 350,
+    400, 460, 520, 600, 700, 800, 920, 1040, 1200, 1400,
+)
+
+Light = 'light'
+Medium = 'medium'
+Heavy = 'heavy'
+Overloaded = 'overloaded'
+
+
+def carrying_capacity(strength: int) -> 'Tuple[int, int, int]':
+    """Get the (light, medium, heavy) load limits in lbs for a strength score."""
+    if strength <= 0:
+        return 0, 0, 0
+    multiplier = 1
+    while strength > 29:
+        strength -= 10
+        multiplier *= 4
+    heavy = _HeavyLoads[strength] * multiplier
+    return heavy // 3, heavy * 2 // 3, heavy
+
+
+def encumbrance(weight: float, strength: int) -> str:
+    light, medium, heavy = carrying_capacity(strength)
+    if weight <= light:
+        return Light
+    if weight <= medium:
+        return Medium
+    if weight <= heavy:
+        return Heavy
+    return Overloaded
+
+
+def _weight_units(item: 'Item') -> int:
+    # Weights are summed in whole thousandths of a lb (the smallest item
+    # weight), like values in cp, so the total can't drift
+    return int(round(item.weight() * 1000))
+
+
+class Stack(object):
+    """A quantity of a single item in an inventory."""
+    __slots__ = ('_item', '_quantity')
+
+    def __init__(self, item: 'Item', quantity: int) -> None:
+        self._item = item
+        self._quantity = quantity
+
+    def item(self) -> 'Item':
+        return self._item
+
+    def quantity(self) -> int:
+        return self._quantity
+
+    def weight(self) -> float:
+        return self._item.weight() * self._quantity
+
+
+class Inventory(object):
+    """The items and coins carried by an actor.
+
+    Items are kept as stacks keyed by item key. The total weight (items
+    plus coins, see Money.weight), item value and encumbrance tier are
+    updated on each add or remove rather than summed when asked for, and
+    the listener is called as listener(inventory, old weight, new weight,
+    note) after each change.
+
+    The encumbrance tier depends on the strength given by the strength
+    function, normally the owning actor's current strength.
+    """
+    def __init__(self, **kwargs) -> None:
+        self._listener = kwargs.pop("listener", None)  # type: Optional[InventoryListener]
+        self._strength = kwargs.pop("strength", None)  # type: Optional[Callable[[], int]]
+        self._lock = kwargs.pop("lock", None) or _v.NullLock
+
+        if len(kwargs.keys()) > 0:
+            raise KeyError("Unknown keyword arguments: {}".format(", ".join(kwargs.keys())))
+
+        self._stacks = dict()  # type: Dict[str, Stack]
+        self._purse = money.Money()
+        self._item_weight = 0  # Total item weight in thousandths of a lb
+        self._value = 0  # Total item value in cp
+        self._count = 0
+
+    def _notify(self, old_weight: float, note: str) -> None:
+        if self._listener is not None:
+            self._listener(self, old_weight, self.weight(), note)
+
+    def add(self, item: 'Item', quantity: int = 1) -> int:
+        """Add items to the inventory.
+
+        :return: The quantity of the item now carried
+        """
+        if quantity < 1:
+            raise ValueError("Quantity must be positive")
+        with self._lock:
+            old_weight = self.weight()
+            stack = self._stacks.get(item.key(), None)
+            if stack is None:
+                stack = self._stacks[item.key()] = Stack(item, 0)
+            stack._quantity += quantity
+            self._item_weight += _weight_units(item) * quantity
+            self._value += item.value().total_cp() * quantity
+            self._count += quantity
+            self._notify(old_weight, "add")
+            return stack._quantity
+
+    def remove(self, item: 'Union[Item, str]', quantity: int = 1) -> int:
+        """Remove items from the inventory, by item or item key.
+
+        Raises a KeyError if the item isn't carried, or a ValueError if
+        fewer than quantity are carried.
+
+        :return: The quantity of the item still carried
+        """
+        key = item if isinstance(item, str) else item.key()
+        if quantity < 1:
+            raise ValueError("Quantity must be positive")
+        with self._lock:
+            stack = self._stacks[key]
+            if quantity > stack._quantity:
+                raise ValueError("Only {} of {} carried".format(stack._quantity, key))
+            old_weight = self.weight()
+            stack._quantity -= quantity
+            if stack._quantity == 0:
+                del self._stacks[key]
+            self._count -= quantity
+            self._item_weight -= _weight_units(stack._item) * quantity
+            self._value -= stack._item.value().total_cp() * quantity
+            self._notify(old_weight, "remove")
+            return stack._quantity
+
+    def add_money(self, amount: 'money.Money') -> 'money.Money':
+        with self._lock:
+            old_weight = self.weight()
+            self._purse += amount
+            self._notify(old_weight, "money")
+            return self._purse
+
+    def remove_money(self, amount: 'money.Money') -> 'money.Money':
+        """Spend money from the purse, making change as needed.
+
+        Raises a ValueError if the purse doesn't hold enough.
+        """
+        with self._lock:
+            if float(amount) > float(self._purse):
+                raise ValueError("Not enough money: have {}, need {}".format(self._purse, amount))
+            old_weight = self.weight()
+            self._purse -= amount
+            self._notify(old_weight, "money")
+            return self._purse
+
+    def purse(self) -> 'money.Money':
+        return self._purse
+
+    def quantity(self, item: 'Union[Item, str]') -> int:
+        key = item if isinstance(item, str) else item.key()
+        stack = self._stacks.get(key, None)
+        return stack._quantity if stack is not None else 0
+
+    def stacks(self) -> 'List[Stack]':
+        return list(self._stacks.values())
+
+    def count(self) -> int:
+        """Get the total number of items carried."""
+        return self._count
+
+    def weight(self) -> float:
+        """Get the total weight carried, items and coins, in lbs."""
+        return self._item_weight / 1000.0 + self._purse.weight
+
+    def value(self) -> 'money.Money':
+        """Get the total value of the items carried, not counting the purse."""
+        return money.Money({'cp': self._value})
+
+    def capacity(self) -> 'Tuple[int, int, int]':
+        return carrying_capacity(self._strength() if self._strength is not None else 10)
+
+    def encumbrance(self) -> str:
+        """Get the load tier: Light, Medium, Heavy or Overloaded."""
+        return encumbrance(self.weight(), self._strength() if self._strength is not None else 10)
+
+    def __contains__(self, item: 'Union[Item, str]') -> bool:
+        return (item if isinstance(item, str) else item.key()) in self._stacks
+
+    def __iter__(self) -> 'Iterator[Stack]':
+        return iter(self.stacks())
+
+    def __len__(self) -> int:
+        return len(self._stacks)
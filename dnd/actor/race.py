@@ -1,4 +1,21 @@
 
+import json
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from typing import Dict, Iterable, List, Optional, Tuple, Union
+    from dnd.actor.actor import Actor
+
+
+# The attribute keys racial bonuses apply to, in bonus vector order
+BonusKeys = ('str', 'dex', 'con', 'int', 'wis', 'cha')
+
+
 class Race(object):
     def __init__(self, name, **kwargs) -> None:
         self._name = name
@@ -14,4 +31,102 @@ class Race(object):
         self.speed = int(kwargs.get("speed", 30))
         self.perks = list(kwargs.get("perks", list()))
 
+    def name(self) -> str:
+        return self._name
+
+    def bonuses(self) -> 'Tuple[int, int, int, int, int, int]':
+        """Get the racial bonuses in BonusKeys order."""
+        return self.str_bonus, self.dex_bonus, self.con_bonus, self.int_bonus, self.wis_bonus, self.cha_bonus
+
+
+class Registry(object):
+    """A lookup of races by name, with their bonuses precompiled.
+
+    Each race is compiled once, when registered, into a fixed bonus
+    vector and speed. Applying a race to an actor is then a single pass
+    over that vector inside of Actor.batch(), so the actor notifies its
+    listeners once no matter how many values changed.
+    """
+    def __init__(self) -> None:
+        self._races = dict()  # type: Dict[str, Race]
+        self._compiled = dict()  # type: Dict[str, Tuple[Tuple[int, ...], int, int]]
+
+    @staticmethod
+    def load_filename(filename: str) -> 'Registry':
+        """Load a registry from a json or yaml file holding a 'races' list."""
+        registry = Registry()
+        registry.load(filename)
+        return registry
+
+    def load(self, filename: str) -> None:
+        with open(filename, "r", encoding="utf-8") as fp:
+            if filename.endswith(".json"):
+                data = json.load(fp)
+            elif yaml is None:
+                raise ImportError("PyYAML is required to load {}".format(filename))
+            else:
+                data = yaml.safe_load(fp)
+        races = data.get("races", None)
+        if type(races) is not list:
+            raise ValueError("base-level races collection expected list, got {}".format(type(races)))
+        for race_data in races:
+            race_data = dict(race_data)
+            name = race_data.pop("name", None)
+            if name is None:
+                raise KeyError("Missing required field 'name'")
+            self.register(Race(name, **race_data))
+
+    def register(self, race: 'Race', replace: bool = False) -> None:
+        key = race.name().lower()
+        if key in self._races and not replace:
+            raise KeyError("Race {} is already registered".format(race.name()))
+        self._races[key] = race
+        self._compiled[key] = (race.bonuses(), race.any_bonus, race.speed)
+
+    def get(self, name: str) -> 'Race':
+        return self._races[name.lower()]
+
+    def names(self) -> 'List[str]':
+        return [race.name() for race in self._races.values()]
+
+    def __contains__(self, name: str) -> bool:
+        return name.lower() in self._races
+
+    def __len__(self) -> int:
+        return len(self._races)
+
+    def apply(self, actor: 'Actor', race: 'Union[str, Race]', any_bonus: 'Optional[str]' = None) -> None:
+        """Set an actor's race, racial attribute bonuses and speed.
+
+        Races with a bonus to any attribute (e.g. humans) apply it to the
+        attribute named by any_bonus, if given.
+        """
+        self.apply_many((actor,), race, any_bonus)
+
+    def apply_many(self, actors: 'Iterable[Actor]', race: 'Union[str, Race]',
+                   any_bonus: 'Optional[str]' = None) -> None:
+        """Apply a race to many actors, compiling the bonus vector once."""
+        name = race if isinstance(race, str) else race.name()
+        key = name.lower()
+        race_obj = self._races[key]
+        bonuses, any_value, speed = self._compiled[key]
+        if any_bonus is not None:
+            if any_bonus not in BonusKeys:
+                raise KeyError("Invalid attribute for any_bonus: {}".format(any_bonus))
+            index = BonusKeys.index(any_bonus)
+            bonuses = bonuses[:index] + (bonuses[index] + any_value,) + bonuses[index + 1:]
+        pairs = tuple(zip(BonusKeys, bonuses))
 
+        for actor in actors:
+            with actor.batch():
+                if actor._race is not race_obj:
+                    actor._race = race_obj
+                    actor.notify()
+                for attribute_key, bonus in pairs:
+                    attribute = actor.attribute(attribute_key)
+                    if attribute.racial() != bonus:
+                        attribute.racial(bonus)
+                if actor.speed().get() != speed:
+                    # Speed isn't wired to the actor's listeners
+                    actor.speed().set(speed)
+                    actor.notify()
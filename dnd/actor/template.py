@@ -0,0 +1,171 @@
+
+import dnd.variable as _v
+from dnd.actor.actor import Actor
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from typing import Any, Callable, Dict, List, Optional, Type, Union
+    from dnd.actor.race import Race
+
+
+_RaceBonusLookup = {
+    'str': 'str_bonus', 'dex': 'dex_bonus', 'con': 'con_bonus',
+    'int': 'int_bonus', 'wis': 'wis_bonus', 'cha': 'cha_bonus',
+}
+
+
+def _baseline_type(base: 'Type[_v.Variable]', name: str, fields: 'Dict[str, int]') -> 'Type[_v.Variable]':
+    """Create a subclass of base whose field defaults live on the class.
+
+    Instances of the new type only hold their listeners. The Points and
+    Attribute methods all assign their fields on the instance, so a field
+    is only copied into an instance the first time it is changed.
+    """
+    def __init__(self, **kwargs) -> None:
+        _v.Variable.__init__(self, **kwargs)
+
+    attrs = dict(fields)  # type: Dict[str, Any]
+    attrs['__init__'] = __init__
+    return type(name, (base,), attrs)
+
+
+class _TemplateAttributes(dict):
+    """The attribute table of a spawned actor.
+
+    Variables are only created when they are first looked up, and are
+    created from the template's baseline types.
+    """
+    def __init__(self, template: 'Template', listener: 'Callable', lock: 'Any') -> None:
+        dict.__init__(self)
+        self._template = template
+        self._listener = listener
+        self._lock = lock
+
+    def __missing__(self, key: str) -> '_v.Variable':
+        type_ = self._template._types[key]
+        with self._lock:
+            variable = dict.get(self, key, None)
+            if variable is None:
+                lock = self._lock if self._lock is not _v.NullLock else None
+                variable = self[key] = type_(listener=self._listener, lock=lock)
+        return variable
+
+    def peek(self, key: str) -> '_v.Variable':
+        """Get the variable for key for reading, without creating it.
+
+        If the actor's variable hasn't been created yet the template's
+        shared prototype is returned instead; it holds the baseline
+        values and must never be changed.
+        """
+        variable = dict.get(self, key, None)
+        return variable if variable is not None else self._template.prototype(key)
+
+    def materialized(self) -> 'List[str]':
+        """Get the keys of the variables which have been created."""
+        return list(dict.keys(self))
+
+
+class Template(object):
+    """Baseline statistics shared by many actors, e.g. a goblin warrior.
+
+    Base stats are given with the same keys as Actor attributes. Points
+    ('hp', 'mp') may be an int (the max) or a dict with 'max', 'current'
+    and 'temp'. Attributes may be an int (the level) or a dict with
+    'level', 'racial', 'enhance' and 'spell'. If a race is given its
+    bonuses and speed are folded into the baseline once, when the
+    template is created.
+
+    Actors spawned from a template share the template's values until
+    they change them, so spawning many actors only allocates storage for
+    the values that actually diverge (such as current hp).
+    """
+    def __init__(self, name: str, race: 'Optional[Race]' = None, **kwargs) -> None:
+        self._name = name
+        self._race = race
+        self._init_mod = int(kwargs.pop("init_mod", 0))
+        self._max_dex_mod = int(kwargs.pop("max_dex_mod", 0))
+        self._speed = int(kwargs.pop("speed", 30 if race is None else race.speed))
+        any_bonus = kwargs.pop("any_bonus", None)  # type: Optional[str]
+        if any_bonus is not None and any_bonus not in _RaceBonusLookup:
+            raise KeyError("Invalid attribute for any_bonus: {}".format(any_bonus))
+
+        self._types = dict()  # type: Dict[str, Type[_v.Variable]]
+        self._prototypes = dict()  # type: Dict[str, _v.Variable]
+        type_prefix = "".join(part.capitalize() for part in name.split())
+        for key in ('hp', 'mp'):
+            data = kwargs.pop(key, 10)  # type: Union[int, Dict[str, int]]
+            if type(data) is not dict:
+                data = {'max': data}
+            max_value = int(data.get('max', 10))
+            self._types[key] = _baseline_type(_v.Points, "{}{}Points".format(type_prefix, key.capitalize()), {
+                '_max': max_value,
+                '_current': int(data.get('current', max_value)),
+                '_temp': int(data.get('temp', 0)),
+            })
+
+        for key, bonus_name in _RaceBonusLookup.items():
+            data = kwargs.pop(key, 10)
+            if type(data) is not dict:
+                data = {'level': data}
+            racial = 0
+            if race is not None:
+                racial = getattr(race, bonus_name)
+                if any_bonus == key:
+                    racial += race.any_bonus
+            self._types[key] = _baseline_type(_v.Attribute, "{}{}Attribute".format(type_prefix, key.capitalize()), {
+                '_level': int(data.get('level', 10)),
+                '_racial': int(data.get('racial', racial)),
+                '_enhance': int(data.get('enhance', 0)),
+                '_spell': int(data.get('spell', 0)),
+            })
+
+        if len(kwargs.keys()) > 0:
+            raise KeyError("Unknown keyword arguments: {}".format(", ".join(kwargs.keys())))
+
+    def name(self) -> str:
+        return self._name
+
+    def race(self) -> 'Optional[Race]':
+        return self._race
+
+    def init_mod(self) -> int:
+        return self._init_mod
+
+    def max_dex_mod(self) -> int:
+        return self._max_dex_mod
+
+    def speed(self) -> int:
+        return self._speed
+
+    def baseline(self, key: str) -> 'Type[_v.Variable]':
+        """Get the shared variable type holding the baseline for key."""
+        return self._types[key]
+
+    def prototype(self, key: str) -> '_v.Variable':
+        """Get a shared, listener-less instance of the baseline for key, for reads only."""
+        variable = self._prototypes.get(key, None)
+        if variable is None:
+            variable = self._prototypes.setdefault(key, self._types[key]())
+        return variable
+
+    def attributes(self, listener: 'Callable', lock: 'Any') -> 'Dict[str, _v.Variable]':
+        return _TemplateAttributes(self, listener, lock)
+
+    def spawn(self, n: int = 1, **kwargs) -> 'List[Actor]':
+        return spawn(self, n, **kwargs)
+
+
+def spawn(template: 'Template', n: int, **kwargs) -> 'List[Actor]':
+    """Create n actors from a template.
+
+    Actors are named using name_format, which is formatted with the
+    template name and the actor's index (starting from start). Any other
+    keyword arguments are passed through to every Actor.
+    """
+    name_format = kwargs.pop("name_format", "{name} {index}")  # type: str
+    start = int(kwargs.pop("start", 1))
+    name = template.name()
+    return [
+        Actor(name=name_format.format(name=name, index=index), template=template, **kwargs)
+        for index in range(start, start + n)
+    ]
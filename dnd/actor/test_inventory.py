@@ -0,0 +1,68 @@
+
+import pytest
+
+from dnd.actor import Actor
+from dnd.actor import inventory
+from dnd.item import Item, Money
+
+
+def _item(key, gp, weight):
+    return Item(key, Item.Item, key.split('.')[-1], value=Money({'gp': gp}), weight=weight)
+
+
+def test_carrying_capacity():
+    assert inventory.carrying_capacity(10) == (33, 66, 100)
+    assert inventory.carrying_capacity(18) == (100, 200, 300)
+    assert inventory.carrying_capacity(30) == (533, 1066, 1600)
+    assert inventory.carrying_capacity(0) == (0, 0, 0)
+
+
+def test_inventory_totals():
+    actor = Actor(name="Valeros")
+    bag = actor.inventory()
+    rope = _item("gear.rope", 1, 10)
+    assert bag.add(rope, 2) == 2
+    assert bag.add(_item("gear.tent", 10, 20)) == 1
+    assert bag.weight() == 40
+    assert bag.value() == Money({'gp': 12})
+    assert bag.encumbrance() == inventory.Medium
+    assert bag.remove("gear.rope") == 1
+    assert bag.weight() == 30
+    assert bag.count() == 2
+    assert bag.encumbrance() == inventory.Light
+    with pytest.raises(ValueError):
+        bag.remove(rope, 5)
+    bag.remove(rope)
+    assert rope not in bag
+    with pytest.raises(KeyError):
+        bag.remove(rope)
+
+
+def test_inventory_coins_and_strength():
+    actor = Actor()
+    bag = actor.inventory()
+    bag.add_money(Money({'gp': 100}))
+    assert bag.weight() == 2
+    bag.remove_money(Money({'gp': 40, 'sp': 5}))
+    assert bag.purse() == Money({'gp': 59, 'sp': 95})
+    with pytest.raises(ValueError):
+        bag.remove_money(Money({'pp': 1}))
+
+    bag.add(_item("gear.anvil", 5, 70))
+    assert bag.encumbrance() == inventory.Heavy
+    actor.strength().level(16)
+    assert bag.encumbrance() == inventory.Light
+
+
+def test_inventory_notifies_actor():
+    actor = Actor()
+    calls = list()
+    actor.add_listener(calls.append)
+    calls.clear()
+    actor.inventory().add(_item("gear.rope", 1, 10))
+    actor.inventory().add_money(Money({'gp': 1}))
+    assert calls == [actor, actor]
+    with actor.batch():
+        actor.inventory().add(_item("gear.torch", 0, 1), 5)
+        actor.inventory().remove("gear.torch", 2)
+    assert len(calls) == 3
@@ -0,0 +1,49 @@
+
+import os
+
+import pytest
+
+from dnd.actor import Actor, Template
+from dnd.actor.race import Race, Registry
+
+_Races = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data", "races.yaml")
+
+
+def test_registry_load():
+    registry = Registry.load_filename(_Races)
+    assert "Dwarf" in registry
+    assert "dwarf" in registry
+    dwarf = registry.get("Dwarf")
+    assert dwarf.bonuses() == (0, 0, 2, 0, 2, -2)
+    assert dwarf.speed == 20
+    with pytest.raises(KeyError):
+        registry.register(Race("Dwarf"))
+
+
+def test_registry_apply_one_notification():
+    registry = Registry.load_filename(_Races)
+    actor = Actor(name="Gimli")
+    calls = list()
+    actor.add_listener(calls.append)
+    calls.clear()
+
+    registry.apply(actor, "Dwarf")
+    assert calls == [actor]
+    assert actor._race is registry.get("Dwarf")
+    assert actor.constitution().racial() == 2
+    assert actor.attribute('cha').current() == 8
+    assert actor.speed().get() == 20
+
+    calls.clear()
+    registry.apply(actor, "Dwarf")
+    assert calls == []
+
+
+def test_registry_apply_many_any_bonus():
+    registry = Registry.load_filename(_Races)
+    actors = Template("Militia", hp=8).spawn(50)
+    registry.apply_many(actors, registry.get("Human"), any_bonus='str')
+    assert all(a.strength().current() == 12 for a in actors)
+    assert all(a.dexterity().racial() == 0 for a in actors)
+    with pytest.raises(KeyError):
+        registry.apply(actors[0], "Human", any_bonus='luck')
@@ -0,0 +1,77 @@
+from dnd import snapshot, sync
+
+from dnd.actor import Actor, Template, spawn
+from dnd.actor.race import Race
+
+
+def _goblin() -> 'Template':
+    race = Race("Goblin", dexterity=4, strength=-2, charisma=-2, speed=30)
+    return Template("Goblin Warrior", race, hp=6, str=11, dex={'level': 13}, init_mod=2)
+
+
+def test_template_applies_race_once():
+    template = _goblin()
+    actor = Actor(name="Grub", template=template)
+    assert actor.template() is template
+    assert actor.strength().current() == 9
+    assert actor.dexterity().racial() == 4
+    assert actor.dexterity().current() == 17
+    assert actor.attribute('cha').current() == 8
+    assert actor.hp().max() == 6
+    assert actor.speed().get() == 30
+
+
+def test_spawn_names_and_count():
+    actors = spawn(_goblin(), 3, start=5)
+    assert [a._name.get() for a in actors] == ["Goblin Warrior 5", "Goblin Warrior 6", "Goblin Warrior 7"]
+
+
+def test_spawn_copy_on_write():
+    template = _goblin()
+    a, b = template.spawn(2)
+    # Nothing is allocated until it is used
+    assert a._attributes.materialized() == []
+
+    a.hp().dec_current(4)
+    assert a.hp().current() == 2
+    assert b.hp().current() == 6
+    assert a._attributes.materialized() == ['hp']
+
+    # Only the diverged field is stored on the instance
+    assert '_current' in vars(a.hp())
+    assert '_max' not in vars(a.hp())
+    assert vars(b.hp()).keys() == {'_listeners'}
+    assert type(a.hp()) is template.baseline('hp')
+
+
+def test_baseline_type_names():
+    template = _goblin()
+    keys = ('hp', 'mp', 'str', 'dex', 'con', 'int', 'wis', 'cha')
+    names = [template.baseline(key).__name__ for key in keys]
+    assert len(set(names)) == len(keys)
+    assert names[:3] == ["GoblinWarriorHpPoints", "GoblinWarriorMpPoints", "GoblinWarriorStrAttribute"]
+
+
+def test_snapshot_does_not_materialize():
+    a, b = _goblin().spawn(2)
+    a.hp().dec_current(4)
+    assert snapshot.state(b) == snapshot.state(_goblin().spawn(1)[0])
+    assert snapshot.get_field(b, 'dex.racial') == 4
+    data = snapshot.snapshot([a, b])
+    snapshot.restore([a, b], data)
+    assert a._attributes.materialized() == ['hp']
+    assert b._attributes.materialized() == []
+
+    engine = sync.DeltaEngine()
+    engine.track(b)
+    b.strength().level(12)
+    assert b._attributes.materialized() == ['str']
+
+
+def test_spawned_actors_notify():
+    actor = spawn(_goblin(), 1, thread_safe=True)[0]
+    seen = list()
+    actor.add_listener(seen.append)
+    actor.strength().inc_level()
+    assert seen == [actor, actor]
+    assert actor.strength().lock() is actor.lock()
@@ -0,0 +1,150 @@
+
+import heapq
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+    ModifierListener = Callable[['ModifierSet', int, int], None]
+
+
+# Bonus types which stack with themselves; for all other types only the
+# largest bonus of that type counts.
+Stacking = frozenset(('dodge', 'untyped'))
+
+
+class ModifierSet(object):
+    """The typed bonuses and penalties applied to a single value.
+
+    Each source (a spell, an item, a feat...) contributes one typed
+    modifier. Bonuses of the same type don't stack - only the largest
+    applies - except for the types in Stacking, which are summed.
+    Penalties (negative modifiers) always stack.
+
+    The total is kept up to date incrementally. Each non-stacking type
+    has a max-heap of its bonuses; entries for removed or replaced
+    sources are discarded lazily when they reach the top, so adding or
+    removing a source is O(log k) for k sources of that type.
+    """
+    def __init__(self, listener: 'Optional[ModifierListener]' = None) -> None:
+        self._listener = listener
+        self._sources = dict()  # type: Dict[Hashable, Tuple[str, int, int]]
+        self._heaps = dict()  # type: Dict[str, List[Tuple[int, int, Hashable]]]
+        self._live = dict()  # type: Dict[str, int]
+        self._total = 0
+        self._seq = 0
+
+    def total(self) -> int:
+        return self._total
+
+    def get(self, source: 'Hashable') -> 'Optional[Tuple[str, int]]':
+        """Get the (type, value) contributed by a source, if any."""
+        entry = self._sources.get(source, None)
+        return (entry[0], entry[1]) if entry is not None else None
+
+    def sources(self) -> 'Dict[Hashable, Tuple[str, int]]':
+        return {source: (entry[0], entry[1]) for source, entry in self._sources.items()}
+
+    def __len__(self) -> int:
+        return len(self._sources)
+
+    def __contains__(self, source: 'Hashable') -> bool:
+        return source in self._sources
+
+    def _top(self, type_: str) -> int:
+        heap = self._heaps.get(type_, None)
+        if heap is None:
+            return 0
+        sources = self._sources
+        while len(heap) > 0:
+            neg_value, seq, source = heap[0]
+            entry = sources.get(source, None)
+            if entry is not None and entry[2] == seq:
+                return -neg_value
+            heapq.heappop(heap)
+        return 0
+
+    def bonus(self, type_: str) -> int:
+        """Get the bonus which applies for a type."""
+        if type_ in Stacking:
+            return sum(e[1] for e in self._sources.values() if e[0] == type_ and e[1] > 0)
+        return self._top(type_)
+
+    def add(self, source: 'Hashable', type_: str, value: int, notify: bool = True) -> int:
+        """Add (or replace) the modifier from a source.
+
+        :return: The new total
+        """
+        old_total = self._total
+        if source in self._sources:
+            self._remove(source)
+        value = int(value)
+        seq = self._seq
+        self._seq += 1
+
+        if value < 0 or type_ in Stacking:
+            self._sources[source] = (type_, value, seq)
+            self._total += value
+        else:
+            old_top = self._top(type_)
+            self._sources[source] = (type_, value, seq)
+            heap = self._heaps.setdefault(type_, list())
+            heapq.heappush(heap, (-value, seq, source))
+            self._live[type_] = self._live.get(type_, 0) + 1
+            if value > old_top:
+                self._total += value - old_top
+            self._compact(type_)
+
+        if notify:
+            self._notify(old_total)
+        return self._total
+
+    def remove(self, source: 'Hashable', notify: bool = True) -> int:
+        """Remove the modifier from a source.
+
+        :return: The new total
+        """
+        old_total = self._total
+        if source in self._sources:
+            self._remove(source)
+            if notify:
+                self._notify(old_total)
+        return self._total
+
+    def _remove(self, source: 'Hashable') -> None:
+        type_, value, seq = self._sources[source]
+        if value < 0 or type_ in Stacking:
+            del self._sources[source]
+            self._total -= value
+        else:
+            old_top = self._top(type_)
+            del self._sources[source]
+            self._live[type_] -= 1
+            self._total += self._top(type_) - old_top
+
+    def _compact(self, type_: str) -> None:
+        # Stale entries below the top are only dropped lazily; rebuild the
+        # heap if they come to dominate it.
+        heap = self._heaps[type_]
+        if len(heap) > 2 * self._live[type_] + 8:
+            sources = self._sources
+            self._heaps[type_] = [e for e in heap if sources.get(e[2], (None, None, None))[2] == e[1]]
+            heapq.heapify(self._heaps[type_])
+
+    def _notify(self, old_total: int) -> None:
+        if self._listener is not None and old_total != self._total:
+            self._listener(self, old_total, self._total)
+
+    def recompute(self) -> int:
+        """Compute the total from scratch, without using the heaps."""
+        best = dict()  # type: Dict[str, int]
+        total = 0
+        for type_, value, _ in self._sources.values():
+            if value < 0 or type_ in Stacking:
+                total += value
+            elif value > best.get(type_, 0):
+                best[type_] = value
+        return total + sum(best.values())
+
+    def __repr__(self) -> str:
+        parts = ["{}: {} {:+d}".format(repr(s), e[0], e[1]) for s, e in self._sources.items()]
+        return "ModifierSet({})".format(", ".join(parts))
@@ -0,0 +1,160 @@
+
+from dnd import snapshot
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from typing import Any, Dict, List, Optional, Tuple
+    from dnd.actor import Actor
+    FieldKey = Tuple[int, str]
+
+
+class _Layer(object):
+    """An immutable set of changes shared by every branch forked from it."""
+    __slots__ = ('changes', 'expected', 'actors', 'parent', 'depth')
+
+    def __init__(self, changes: 'Dict[FieldKey, Any]', expected: 'Dict[FieldKey, Any]',
+                 actors: 'Dict[int, Actor]', parent: 'Optional[_Layer]') -> None:
+        self.changes = changes
+        self.expected = expected
+        self.actors = actors
+        self.parent = parent
+        self.depth = 1 if parent is None else parent.depth + 1
+
+
+def _flatten(top: '_Layer') -> '_Layer':
+    """Collapse a chain of layers into a single layer."""
+    layers = list()
+    layer = top  # type: Optional[_Layer]
+    while layer is not None:
+        layers.append(layer)
+        layer = layer.parent
+    changes, expected, actors = dict(), dict(), dict()
+    for layer in reversed(layers):
+        changes.update(layer.changes)
+        expected.update(layer.expected)
+        actors.update(layer.actors)
+    return _Layer(changes, expected, actors, None)
+
+
+class Branch(object):
+    """A speculative copy of actor state, for trying out "what if".
+
+    A branch starts out as a view of the live actors and records only the
+    fields it changes. Forking a branch freezes its changes into a layer
+    that both the original and the fork read through, so forking is O(1)
+    and every branch shares the data it hasn't changed. Reads walk the
+    layers from newest to oldest and fall back to the live actor.
+
+    Discarding a branch is just dropping it. commit() writes a branch's
+    changes to the live actors; by default it first checks that none of
+    the changed fields were modified in the live state since the branch
+    first changed them.
+    """
+    # Forks flatten their layers once the chain gets this deep, to bound
+    # the cost of a read.
+    MaxDepth = 32
+
+    def __init__(self, parent: 'Optional[_Layer]' = None) -> None:
+        self._parent = parent
+        self._changes = dict()  # type: Dict[FieldKey, Any]
+        self._expected = dict()  # type: Dict[FieldKey, Any]
+        self._actors = dict()  # type: Dict[int, Actor]
+
+    def _lookup(self, key: 'FieldKey', attr: str) -> 'Tuple[bool, Any]':
+        mapping = getattr(self, '_' + attr)
+        if key in mapping:
+            return True, mapping[key]
+        layer = self._parent
+        while layer is not None:
+            mapping = getattr(layer, attr)
+            if key in mapping:
+                return True, mapping[key]
+            layer = layer.parent
+        return False, None
+
+    def get(self, actor: 'Actor', field: str) -> 'Any':
+        """Get a field (e.g. 'hp.current', see snapshot.Fields) as seen by this branch."""
+        found, value = self._lookup((id(actor), field), 'changes')
+        return value if found else snapshot.get_field(actor, field)
+
+    def set(self, actor: 'Actor', field: str, value: 'Any') -> None:
+        key = (id(actor), field)
+        if key not in self._expected and not self._lookup(key, 'expected')[0]:
+            self._expected[key] = snapshot.get_field(actor, field)
+        self._actors[id(actor)] = actor
+        self._changes[key] = value
+
+    def state(self, actor: 'Actor') -> 'Tuple[int, ...]':
+        """Get all snapshot fields of an actor as seen by this branch."""
+        return tuple(self.get(actor, field) for field in snapshot.Fields)
+
+    def damage(self, actor: 'Actor', amount: int) -> int:
+        """Damage an actor in this branch, using temporary hp first.
+
+        :return: The actor's current hp in this branch
+        """
+        temp = self.get(actor, 'hp.temp')
+        absorbed = min(max(temp, 0), amount)
+        if absorbed != 0:
+            self.set(actor, 'hp.temp', temp - absorbed)
+        current = self.get(actor, 'hp.current') - (amount - absorbed)
+        self.set(actor, 'hp.current', current)
+        return current
+
+    def heal(self, actor: 'Actor', amount: int) -> int:
+        current = min(self.get(actor, 'hp.current') + amount, self.get(actor, 'hp.max'))
+        self.set(actor, 'hp.current', current)
+        return current
+
+    def depth(self) -> int:
+        return 1 if self._parent is None else self._parent.depth + 1
+
+    def fork(self) -> 'Branch':
+        """Create a new branch starting from this branch's current state."""
+        if len(self._changes) > 0 or len(self._expected) > 0:
+            self._parent = _Layer(self._changes, self._expected, self._actors, self._parent)
+            self._changes, self._expected, self._actors = dict(), dict(), dict()
+        if self._parent is not None and self._parent.depth > Branch.MaxDepth:
+            self._parent = _flatten(self._parent)
+        return Branch(self._parent)
+
+    def changes(self) -> 'Dict[Tuple[Actor, str], Any]':
+        """Get every change this branch makes to the live state."""
+        flat = _flatten(_Layer(self._changes, self._expected, self._actors, self._parent))
+        return {(flat.actors[actor_id], field): value for (actor_id, field), value in flat.changes.items()}
+
+    def conflicts(self) -> 'List[Tuple[Actor, str]]':
+        """Get the changed fields whose live value changed after the branch changed them."""
+        result = list()
+        for (actor, field) in self.changes().keys():
+            expected = self._lookup((id(actor), field), 'expected')[1]
+            if snapshot.get_field(actor, field) != expected:
+                result.append((actor, field))
+        return result
+
+    def commit(self, check: bool = True) -> None:
+        """Write this branch's changes to the live actors.
+
+        Each actor is updated inside of Actor.batch(), so it notifies its
+        listeners once. If check is True and the live state has changed
+        underneath the branch, a ValueError is raised and nothing is
+        written.
+        """
+        if check:
+            conflicts = self.conflicts()
+            if len(conflicts) > 0:
+                raise ValueError("Branch conflicts with live state: {}".format(
+                    ", ".join("{}.{}".format(a._name.get(), f) for a, f in conflicts)))
+
+        by_actor = dict()  # type: Dict[int, Tuple[Actor, List[Tuple[str, Any]]]]
+        for (actor, field), value in self.changes().items():
+            by_actor.setdefault(id(actor), (actor, list()))[1].append((field, value))
+        for actor, fields in by_actor.values():
+            with actor.batch():
+                for field, value in fields:
+                    if snapshot.get_field(actor, field) != value:
+                        snapshot.set_field(actor, field, value)
+
+        # The branch now matches the live state
+        self._parent = None
+        self._changes, self._expected, self._actors = dict(), dict(), dict()
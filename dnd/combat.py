@@ -0,0 +1,164 @@
+
+import random
+
+from dnd import roll
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from typing import Callable, Collection, Iterator, List, Mapping, Optional, Union
+    from dnd.actor import Actor
+    AmountSource = Union[roll.Roll, int]
+    PerActor = Union[Mapping[Actor, int], Callable[[Actor], int], None]
+
+
+class TargetResult(object):
+    """The outcome of an area effect for one target."""
+    def __init__(self, actor: 'Actor', rolled: int, saved: bool, resisted: int, applied: int,
+                 before: int, after: int) -> None:
+        self._actor = actor
+        self._rolled = rolled
+        self._saved = saved
+        self._resisted = resisted
+        self._applied = applied
+        self._before = before
+        self._after = after
+
+    def actor(self) -> 'Actor':
+        return self._actor
+
+    def rolled(self) -> int:
+        return self._rolled
+
+    def saved(self) -> bool:
+        return self._saved
+
+    def resisted(self) -> int:
+        return self._resisted
+
+    def applied(self) -> int:
+        return self._applied
+
+    def before(self) -> int:
+        return self._before
+
+    def after(self) -> int:
+        return self._after
+
+    def downed(self) -> bool:
+        return self._before > 0 >= self._after
+
+    def __repr__(self) -> str:
+        return "TargetResult({}, rolled={}, saved={}, resisted={}, applied={}, hp={}->{})".format(
+            repr(self._actor._name.get()), self._rolled, self._saved, self._resisted,
+            self._applied, self._before, self._after)
+
+
+class AreaResult(object):
+    """The outcome of an area effect for all targets."""
+    def __init__(self, targets: 'List[TargetResult]') -> None:
+        self._targets = targets
+
+    def targets(self) -> 'List[TargetResult]':
+        return self._targets
+
+    def total(self) -> int:
+        return sum(t.applied() for t in self._targets)
+
+    def saved(self) -> 'List[Actor]':
+        return [t.actor() for t in self._targets if t.saved()]
+
+    def downed(self) -> 'List[Actor]':
+        return [t.actor() for t in self._targets if t.downed()]
+
+    def __len__(self) -> int:
+        return len(self._targets)
+
+    def __iter__(self) -> 'Iterator[TargetResult]':
+        return iter(self._targets)
+
+
+def _lookup(source: 'PerActor', actor: 'Actor', default: int) -> int:
+    if source is None:
+        return default
+    if callable(source):
+        return source(actor)
+    return source.get(actor, default)
+
+
+def _amount(source: 'AmountSource', rand: 'Optional[random.Random]') -> int:
+    # A roll with a penalty can come out below zero, which counts as zero
+    if isinstance(source, roll.Roll):
+        return max(0, source.roll(rand).value())
+    return int(source)
+
+
+def area_damage(actors: 'Collection[Actor]', amount: 'AmountSource', **kwargs) -> 'AreaResult':
+    """Damage the hp of many actors in a single pass.
+
+    The amount is either a fixed value or a Roll. A Roll is rolled once
+    and shared by all targets unless per_target=True is given.
+
+    saved: The actors which made their saving throw, as a set, or a
+        callable taking an actor. Targets that save take half damage
+        (rounded down), or none if evasion=True.
+    resistances: The amount each target resists, as a mapping or a
+        callable taking an actor. Resistance applies after halving.
+    rand: The random source used for rolls.
+
+    Each target's hp is updated with a single Points.damage() call inside
+    of Actor.batch(), so every actor notifies its listeners once.
+    """
+    return _apply(actors, amount, False, **kwargs)
+
+
+def area_heal(actors: 'Collection[Actor]', amount: 'AmountSource', **kwargs) -> 'AreaResult':
+    """Heal the hp of many actors in a single pass, up to their max hp.
+
+    Accepts the same per_target and rand arguments as area_damage().
+    """
+    return _apply(actors, amount, True, **kwargs)
+
+
+def _apply(actors: 'Collection[Actor]', amount: 'AmountSource', healing: bool, **kwargs) -> 'AreaResult':
+    per_target = bool(kwargs.pop("per_target", False))
+    saved = kwargs.pop("saved", None)  # type: Union[Collection[Actor], Callable[[Actor], bool], None]
+    evasion = bool(kwargs.pop("evasion", False))
+    resistances = kwargs.pop("resistances", None)  # type: PerActor
+    rand = kwargs.pop("rand", None)  # type: Optional[random.Random]
+    if len(kwargs.keys()) > 0:
+        raise KeyError("Unknown keyword arguments: {}".format(", ".join(kwargs.keys())))
+    if healing and (saved is not None or resistances is not None):
+        raise ValueError("Healing can not be saved against or resisted")
+
+    if not isinstance(amount, roll.Roll) and int(amount) < 0:
+        raise ValueError("Amount must not be negative, got {}".format(amount))
+
+    shared = None if per_target else _amount(amount, rand)
+    results = list()
+    for actor in actors:
+        rolled = shared if shared is not None else _amount(amount, rand)
+        if saved is None:
+            made_save = False
+        elif callable(saved):
+            made_save = bool(saved(actor))
+        else:
+            made_save = actor in saved
+
+        value = rolled
+        if made_save:
+            value = 0 if evasion else value // 2
+        resisted = min(value, max(0, _lookup(resistances, actor, 0)))
+        value -= resisted
+
+        hp = actor.hp()
+        with actor.batch():
+            before = hp.current()
+            if healing:
+                hp.inc_current(value)
+                after = hp.current()
+                value = after - before
+            else:
+                hp.damage(value)
+                after = hp.current()
+        results.append(TargetResult(actor, rolled, made_save, resisted, value, before, after))
+    return AreaResult(results)
@@ -0,0 +1,205 @@
+
+import heapq
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from typing import Callable, Dict, List, Optional, Tuple
+    from dnd.actor import Actor
+    from dnd.tracker import Tracker
+
+
+class Effect(object):
+    """A temporary modifier on an actor, such as a spell buff.
+
+    The kind selects what is modified:
+      * 'spell' - the spell adjustment of attribute key (e.g. 'str')
+      * 'enhancement' - the enhancement adjustment of attribute key
+      * 'temp' - temporary points of key ('hp' or 'mp')
+
+    The duration is in rounds. If an anchor actor is given the effect ends
+    at the start of the anchor's turn (typically the caster's), otherwise
+    it ends at the start of the round.
+    """
+    Kinds = ('spell', 'enhancement', 'temp')
+
+    def __init__(self, actor: 'Actor', key: str, kind: str, amount: int, duration: int, **kwargs) -> None:
+        if kind not in Effect.Kinds:
+            raise ValueError("Invalid effect kind '{}'".format(kind))
+        if kind == 'temp' and key not in ('hp', 'mp'):
+            raise ValueError("Temporary points can only be given to hp or mp")
+        if kind != 'temp' and key in ('hp', 'mp'):
+            raise ValueError("{} effects only apply to attributes".format(kind))
+        if duration < 1:
+            raise ValueError("Effect duration must be at least 1 round")
+
+        self._actor = actor
+        self._key = key
+        self._kind = kind
+        self._amount = int(amount)
+        self._duration = int(duration)
+        self._anchor = kwargs.pop("anchor", None)  # type: Optional[Actor]
+        self._name = str(kwargs.pop("name", ""))
+        self._applied = 0
+        self._active = False
+        self._expires = None  # type: Optional[Tuple[int, Optional[int]]]
+
+        if len(kwargs.keys()) > 0:
+            raise KeyError("Unknown keyword arguments: {}".format(", ".join(kwargs.keys())))
+
+    def actor(self) -> 'Actor':
+        return self._actor
+
+    def name(self) -> str:
+        return self._name
+
+    def kind(self) -> str:
+        return self._kind
+
+    def amount(self) -> int:
+        return self._amount
+
+    def duration(self) -> int:
+        return self._duration
+
+    def anchor(self) -> 'Optional[Actor]':
+        return self._anchor
+
+    def active(self) -> bool:
+        return self._active
+
+    def expires(self) -> 'Optional[int]':
+        """Get the round this effect expires in, if it has been scheduled."""
+        return self._expires[0] if self._expires is not None else None
+
+    def apply(self) -> None:
+        if self._active:
+            return
+        variable = self._actor.attribute(self._key)
+        if self._kind == 'spell':
+            variable.inc_spell(self._amount)
+        elif self._kind == 'enhancement':
+            variable.inc_enhancement(self._amount)
+        else:
+            variable.inc_temp(self._amount)
+        self._applied = self._amount
+        self._active = True
+
+    def remove(self) -> None:
+        if not self._active:
+            return
+        variable = self._actor.attribute(self._key)
+        if self._kind == 'spell':
+            variable.dec_spell(self._applied)
+        elif self._kind == 'enhancement':
+            variable.dec_enhancement(self._applied)
+        else:
+            # Temporary points already lost to damage aren't removed twice
+            remaining = min(self._applied, variable.temp())
+            if remaining > 0:
+                variable.inc_temp(-remaining)
+        self._active = False
+
+
+class EffectScheduler(object):
+    """Applies effects and expires them at round and turn boundaries.
+
+    Scheduled effects are kept in a timing wheel: a bucket per expiry
+    round, split by anchor actor, plus a heap of the rounds which have a
+    bucket. Starting a round or a turn only looks at the bucket that is
+    expiring, so each tick costs O(expiring effects) regardless of how
+    many effects are active.
+    """
+    def __init__(self) -> None:
+        self._round = 0
+        self._wheel = dict()  # type: Dict[int, Dict[Optional[int], List[Effect]]]
+        self._rounds = list()  # type: List[int]
+        self._count = 0
+        self._listeners = list()  # type: List[Callable[[Effect], None]]
+
+    def add_listener(self, listener: 'Callable[[Effect], None]') -> None:
+        """Add a listener called with each effect as it expires."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: 'Callable[[Effect], None]') -> None:
+        self._listeners.remove(listener)
+
+    def round(self) -> int:
+        return self._round
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, effect: 'Effect', start_round: 'Optional[int]' = None) -> 'Effect':
+        """Apply an effect and schedule it to expire.
+
+        The effect lasts duration rounds from start_round, which defaults
+        to the current round.
+        """
+        if effect._expires is not None:
+            raise ValueError("Effect is already scheduled")
+        round_ = (self._round if start_round is None else start_round) + effect.duration()
+        anchor = id(effect.anchor()) if effect.anchor() is not None else None
+        effect._expires = (round_, anchor)
+
+        buckets = self._wheel.get(round_, None)
+        if buckets is None:
+            buckets = self._wheel[round_] = dict()
+            heapq.heappush(self._rounds, round_)
+        buckets.setdefault(anchor, list()).append(effect)
+        self._count += 1
+
+        with effect.actor().batch():
+            effect.apply()
+        return effect
+
+    def cancel(self, effect: 'Effect') -> None:
+        """End an effect early.
+
+        The effect is removed from its actor immediately; its slot in the
+        wheel is discarded when its bucket comes due.
+        """
+        if effect._expires is None or not effect.active():
+            return
+        with effect.actor().batch():
+            effect.remove()
+        self._count -= 1
+
+    def _expire(self, effects: 'List[Effect]') -> None:
+        for effect in effects:
+            if not effect.active():
+                continue
+            with effect.actor().batch():
+                effect.remove()
+            self._count -= 1
+            for listener in self._listeners:
+                listener(effect)
+
+    def start_round(self, round_: int) -> None:
+        """Expire everything due before round_, and round-anchored effects due in it."""
+        self._round = round_
+        while len(self._rounds) > 0 and self._rounds[0] < round_:
+            for effects in self._wheel.pop(heapq.heappop(self._rounds)).values():
+                self._expire(effects)
+        buckets = self._wheel.get(round_, None)
+        if buckets is not None:
+            self._expire(buckets.pop(None, list()))
+
+    def start_turn(self, actor: 'Actor') -> None:
+        """Expire the effects anchored to an actor's turn in the current round."""
+        buckets = self._wheel.get(self._round, None)
+        if buckets is not None:
+            self._expire(buckets.pop(id(actor), list()))
+
+    def attach(self, tracker: 'Tracker') -> None:
+        """Drive the scheduler from an initiative tracker's rounds and turns."""
+        tracker.add_listener(self._tracker_changed)
+
+    def detach(self, tracker: 'Tracker') -> None:
+        tracker.remove_listener(self._tracker_changed)
+
+    def _tracker_changed(self, tracker: 'Tracker') -> None:
+        if tracker.round() != self._round:
+            self.start_round(tracker.round())
+        current = tracker.current()
+        if current is not None:
+            self.start_turn(current)
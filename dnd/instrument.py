@@ -0,0 +1,176 @@
+
+import contextlib
+import time
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+class ListenerStats(object):
+    """Timing information collected for a single listener."""
+    def __init__(self, listener: 'Callable') -> None:
+        self._listener = listener
+        self._name = listener_name(listener)
+        self._calls = 0
+        self._total = 0.0
+        self._max = 0.0
+        self._max_depth = 0
+        self._max_fan_out = 0
+
+    def listener(self) -> 'Callable':
+        return self._listener
+
+    def name(self) -> str:
+        return self._name
+
+    def calls(self) -> int:
+        return self._calls
+
+    def total_time(self) -> float:
+        return self._total
+
+    def max_time(self) -> float:
+        return self._max
+
+    def mean_time(self) -> float:
+        return self._total / self._calls if self._calls > 0 else 0.0
+
+    def max_depth(self) -> int:
+        return self._max_depth
+
+    def max_fan_out(self) -> int:
+        return self._max_fan_out
+
+    def __repr__(self) -> str:
+        return "ListenerStats({}, calls={}, total={:.6f}, max={:.6f})".format(
+            self._name, self._calls, self._total, self._max)
+
+
+class Profiler(object):
+    """Records the cost of every listener dispatched by a notify() call.
+
+    A Profiler does nothing until it is enabled, either with enable()
+    or with the profiling() context manager. While enabled, every
+    Variable.notify() and Actor.notify() call is routed through
+    dispatch(), which times each listener individually.
+
+    The depth recorded for a listener is how deeply nested the notify
+    call was when the listener ran - a Variable notifying its Actor
+    which in turn notifies a UI callback is a depth of 2. The fan-out
+    is the number of listeners attached to the source being notified.
+    """
+    def __init__(self, clock: 'Optional[Callable[[], float]]' = None) -> None:
+        self._clock = clock if clock is not None else time.perf_counter
+        self._stats = dict()  # type: Dict[Tuple[int, int], ListenerStats]
+        self._depth = 0
+        self._max_depth = 0
+        self._dispatches = 0
+
+    def dispatch(self, listeners: 'Sequence[Callable]', args: 'Sequence[Any]') -> None:
+        clock = self._clock
+        self._depth += 1
+        self._dispatches += 1
+        if self._depth > self._max_depth:
+            self._max_depth = self._depth
+        fan_out = len(listeners)
+        try:
+            for listener in listeners:
+                start = clock()
+                try:
+                    listener(*args)
+                finally:
+                    self._record(listener, clock() - start, fan_out)
+        finally:
+            self._depth -= 1
+
+    def _record(self, listener: 'Callable', elapsed: float, fan_out: int) -> None:
+        # Bound methods are recreated on every attribute access, so they
+        # are keyed by the underlying function and instance instead.
+        key = id(getattr(listener, '__func__', listener)), id(getattr(listener, '__self__', None))
+        stats = self._stats.get(key, None)
+        if stats is None:
+            stats = self._stats[key] = ListenerStats(listener)
+        stats._calls += 1
+        stats._total += elapsed
+        if elapsed > stats._max:
+            stats._max = elapsed
+        if self._depth > stats._max_depth:
+            stats._max_depth = self._depth
+        if fan_out > stats._max_fan_out:
+            stats._max_fan_out = fan_out
+
+    def dispatches(self) -> int:
+        return self._dispatches
+
+    def max_depth(self) -> int:
+        return self._max_depth
+
+    def reset(self) -> None:
+        self._stats.clear()
+        self._max_depth = 0
+        self._dispatches = 0
+
+    def report(self) -> 'List[ListenerStats]':
+        """Get the collected stats, most expensive listener first."""
+        return sorted(self._stats.values(), key=lambda s: s.total_time(), reverse=True)
+
+    def format_report(self, limit: 'Optional[int]' = None) -> str:
+        stats = self.report()
+        if limit is not None:
+            stats = stats[:limit]
+        fmt_str = "{:<40} {:>8} {:>12} {:>12} {:>6} {:>7}"
+        lines = [fmt_str.format("listener", "calls", "total (ms)", "max (ms)", "depth", "fan-out")]
+        for s in stats:
+            name = s.name()
+            if len(name) > 40:
+                name = "..." + name[-37:]
+            lines.append(fmt_str.format(
+                name, s.calls(), "{:.3f}".format(s.total_time() * 1000.0),
+                "{:.3f}".format(s.max_time() * 1000.0), s.max_depth(), s.max_fan_out()
+            ))
+        return "\n".join(lines)
+
+
+# The profiler currently receiving notify() calls. This is checked on every
+# notify, so it is kept as a plain module attribute to keep that check cheap.
+active = None  # type: Optional[Profiler]
+
+
+def listener_name(listener: 'Callable') -> str:
+    name = getattr(listener, '__qualname__', None)
+    if name is None:
+        name = type(listener).__qualname__
+    module = getattr(listener, '__module__', None)
+    if module is not None:
+        return "{}.{}".format(module, name)
+    return name
+
+
+def enable(profiler: 'Optional[Profiler]' = None) -> Profiler:
+    global active
+    if profiler is None:
+        profiler = Profiler()
+    active = profiler
+    return profiler
+
+
+def disable() -> 'Optional[Profiler]':
+    global active
+    profiler, active = active, None
+    return profiler
+
+
+@contextlib.contextmanager
+def profiling(profiler: 'Optional[Profiler]' = None) -> 'Iterator[Profiler]':
+    """Profile all listener dispatches made inside of the with block.
+
+    The previously active profiler (if any) is restored on exit.
+    """
+    global active
+    previous = active
+    profiler = enable(profiler)
+    try:
+        yield profiler
+    finally:
+        active = previous
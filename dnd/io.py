@@ -1,13 +1,409 @@
 
+import concurrent.futures
+import hashlib
+import io
 import json
+import marshal
+import os
+import re
+import sys
+import tempfile
 
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+import dnd.actor as actor
 import dnd.item as item
 
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, TextIO, Tuple, Union
+    ProgressCallback = Callable[[int, int, int], None]
 
-class FileData(object):
+
+_Whitespace = re.compile(r'[ \t\n\r]*')
+
+# Marks the end of a record stream, which may itself hold nulls
+_End = object()
+
+
+class _JsonStream(object):
+    """A sliding window over a text file for incremental JSON decoding.
+
+    Only the unconsumed tail of the file is kept in memory; each call to
+    decode() parses one complete JSON value with the C decoder and reads
+    more of the file only when the value runs past the end of the window.
+    """
+    def __init__(self, fp: 'TextIO', chunk_size: int = 65536) -> None:
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._buf = ""
+        self._pos = 0
+        self._offset = 0  # Characters discarded from the front of the window
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def position(self) -> int:
+        """Get the number of characters consumed so far."""
+        return self._offset + self._pos
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        data = self._fp.read(self._chunk_size)
+        if len(data) == 0:
+            self._eof = True
+            return False
+        self._offset += self._pos
+        self._buf = self._buf[self._pos:] + data
+        self._pos = 0
+        return True
+
+    def peek(self) -> 'Optional[str]':
+        while True:
+            self._pos = _Whitespace.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return None
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError("Expected '{}' at offset {}, found {}".format(char, self.position(), repr(found)))
+        self._pos += 1
+
+    def decode(self) -> 'Any':
+        if self.peek() is None:
+            raise ValueError("Unexpected end of file at offset {}".format(self.position()))
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number at the very end of the window may continue in the next chunk
+            if end == len(self._buf) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+
+def iter_json_array(fp: 'TextIO', key: str, chunk_size: int = 65536) -> 'Iterator[Any]':
+    """Yield the elements of a top-level array without loading the whole file.
+
+    The file must contain a JSON object; the elements of the array stored
+    under key are decoded and yielded one at a time. Other top-level
+    values are decoded and discarded. Nothing is yielded if the key is
+    missing.
+    """
+    stream = _JsonStream(fp, chunk_size)
+    stream.expect('{')
+    while stream.peek() != '}':
+        name = stream.decode()
+        stream.expect(':')
+        if name != key:
+            stream.decode()
+        else:
+            stream.expect('[')
+            if stream.peek() != ']':
+                while True:
+                    yield stream.decode()
+                    if stream.peek() != ',':
+                        break
+                    stream.expect(',')
+            stream.expect(']')
+            return
+        if stream.peek() != ',':
+            break
+        stream.expect(',')
+    stream.expect('}')
+
+
+class Roster(object):
+    """The actors of a save file, loaded on demand.
+
+    Opening a roster reads nothing. Player records are streamed from the
+    file only as far as the highest index requested, and an Actor is
+    only built for a record the first time it is accessed.
+    """
+    def __init__(self, filename: str, key: str = "players", races: 'Optional[actor.race.Registry]' = None) -> None:
+        self._filename = filename
+        self._key = key
+        self._races = races
+        self._fp = None  # type: Optional[TextIO]
+        self._stream = None  # type: Optional[Iterator[Any]]
+        self._done = False
+        self._records = list()  # type: List[Any]
+        self._actors = list()  # type: List[Optional[actor.Actor]]
+
+    def _load_until(self, index: 'Optional[int]') -> None:
+        if self._done:
+            return
+        if self._stream is None:
+            self._fp = open(self._filename, "r", encoding="utf-8")
+            self._stream = iter_json_array(self._fp, self._key)
+        while index is None or len(self._records) <= index:
+            record = next(self._stream, _End)
+            if record is _End:
+                self.close()
+                return
+            if type(record) is not dict:
+                self.close()
+                raise ValueError("Player {} in {} is not an object, got {}".format(
+                    len(self._records), self._filename, type(record)))
+            self._records.append(record)
+            self._actors.append(None)
+
+    def close(self) -> None:
+        self._done = True
+        self._stream = None
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def record(self, index: int) -> 'Any':
+        """Get the raw save data of a player without building an Actor."""
+        self._load_until(index if index >= 0 else None)
+        return self._records[index]
+
+    def materialized(self) -> int:
+        """Get the number of actors which have been built so far."""
+        return sum(1 for a in self._actors if a is not None)
+
+    def __getitem__(self, index: int) -> 'actor.Actor':
+        self._load_until(index if index >= 0 else None)
+        value = self._actors[index]
+        if value is None:
+            value = self._actors[index] = actor.Actor.from_json(self._records[index], self._races)
+        return value
+
+    def __len__(self) -> int:
+        self._load_until(None)
+        return len(self._records)
+
+    def __iter__(self) -> 'Iterator[actor.Actor]':
+        index = 0
+        while True:
+            self._load_until(index)
+            if index >= len(self._records):
+                return
+            yield self[index]
+            index += 1
+
+    def __enter__(self) -> 'Roster':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+def load_save(filename: str, races: 'Optional[actor.race.Registry]' = None) -> 'Roster':
+    return Roster(filename, races=races)
+
+
+# The fields which mark a mapping in a nested catalog as an item record
+_RecordFields = frozenset(('name', 'type', 'value', 'weight', 'description', 'source'))
+
+_CacheVersion = 1
+
+
+def flatten_items(tree: 'Dict[str, Any]', prefix: str = "") -> 'List[Dict[str, Any]]':
+    """Flatten a nested catalog into item records with dotted keys.
+
+    Nested catalogs (such as data/adventuring_gear.yaml) map category
+    names to further categories, and item keys to item records:
+
+        gear:
+          camping:
+            bedroll: {name: Bedroll, value: 1sp, weight: 5}
+
+    becomes [{"key": "gear.camping.bedroll", "name": "Bedroll", ...}].
+    A mapping is taken as an item record if it has any of the usual
+    record fields (name, type, value, weight, description or source).
+    Records are returned in the order they appear.
+    """
+    records = list()  # type: List[Dict[str, Any]]
+    stack = [(iter(tree.items()), prefix)]
+    while len(stack) > 0:
+        entries, path = stack[-1]
+        entry = next(entries, None)
+        if entry is None:
+            stack.pop()
+            continue
+        name, node = entry
+        key = str(name) if path == "" else path + "." + str(name)
+        if type(node) is not dict:
+            raise ValueError("Expected a category or item record at {}, got {}".format(key, type(node)))
+        if _RecordFields.isdisjoint(node.keys()):
+            stack.append((iter(node.items()), key))
+        else:
+            record = dict(node)
+            record["key"] = key
+            records.append(record)
+    return records
+
+
+def _cache_header(filename: str, digest: 'Optional[str]' = None) -> 'List[Any]':
+    stat = os.stat(filename)
+    return [_CacheVersion, list(sys.version_info[:2]), stat.st_size, stat.st_mtime_ns, digest]
+
+
+def _file_digest(filename: str) -> str:
+    sha = hashlib.sha256()
+    with open(filename, "rb") as fp:
+        for block in iter(lambda: fp.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _read_cache(cache_filename: str) -> 'Optional[Tuple[List[Any], List[Dict[str, Any]]]]':
+    """Read a record cache, or get None if it is missing or not a cache at all."""
+    try:
+        with open(cache_filename, "rb") as fp:
+            data = marshal.load(fp)
+    except (EOFError, ValueError, TypeError, OSError):
+        return None
+    if type(data) is not tuple or len(data) != 2:
+        return None
+    header, records = data
+    if type(header) is not list or len(header) != 5:
+        return None
+    if type(records) is not list:
+        return None
+    return header, records
+
+
+def _write_cache(cache_filename: str, header: 'List[Any]', records: 'List[Dict[str, Any]]') -> None:
+    # Each writer gets its own temporary file, so processes loading the
+    # same catalog at once can't interleave their writes
+    temp_filename = None
+    try:
+        fd, temp_filename = tempfile.mkstemp(prefix=os.path.basename(cache_filename) + ".",
+                                             suffix=".tmp", dir=os.path.dirname(cache_filename) or ".")
+        with os.fdopen(fd, "wb") as fp:
+            marshal.dump((header, records), fp)
+        os.replace(temp_filename, cache_filename)
+    except OSError:
+        if temp_filename is not None:
+            try:
+                os.remove(temp_filename)
+            except OSError:
+                pass
+
+
+def load_yaml_items(filename: str, cache_filename: 'Optional[str]' = None,
+                    use_cache: bool = True) -> 'List[Dict[str, Any]]':
+    """Load the item records of a nested yaml catalog, see flatten_items().
+
+    Parsing yaml is slow, so the flattened records are also written to a
+    marshal cache (by default filename + ".cache"). The cache is keyed by
+    the file's size, mtime and sha256: if the size and mtime match it is
+    used as is, if only the size matches it is used when the content hash
+    still matches. Otherwise the file is parsed again and the cache
+    rewritten. Failing to write the cache is not an error.
+    """
+    if cache_filename is None:
+        cache_filename = filename + ".cache"
+    header = _cache_header(filename)
+
+    if use_cache:
+        cached = _read_cache(cache_filename)
+        if cached is not None and cached[0][:3] == header[:3]:
+            cached_header, records = cached
+            if cached_header[3] == header[3]:
+                return records
+            digest = _file_digest(filename)
+            if cached_header[4] == digest:
+                # Only the mtime changed; record the new one so the next
+                # load doesn't have to hash the file again
+                header[4] = digest
+                _write_cache(cache_filename, header, records)
+                return records
+
+    if yaml is None:
+        raise ImportError("PyYAML is required to load {}".format(filename))
+    with open(filename, "rb") as fp:
+        content = fp.read()
+    data = yaml.load(content, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+    if type(data) is not dict or type(data.get("items", None)) is not dict:
+        raise ValueError("base-level items collection expected mapping in {}".format(filename))
+    records = flatten_items(data["items"])
+
+    if use_cache:
+        header[4] = hashlib.sha256(content).hexdigest()
+        _write_cache(cache_filename, header, records)
+    return records
+
+
+def load_item_records(filename: str) -> 'List[Dict[str, Any]]':
+    """Read the item records of a json or yaml catalog without registering them."""
+    if filename.endswith(".yaml") or filename.endswith(".yml"):
+        return load_yaml_items(filename)
+    with open(filename, "rb") as fp:
+        data = json.load(fp)
+    items = data.get("items", None) if type(data) is dict else None
+    if type(items) is not list:
+        raise ValueError("base-level items collection expected list, got {}".format(type(items)))
+    return items
+
+
+def _parse_file(filename: str) -> 'Tuple[Optional[List[Dict[str, Any]]], Optional[str]]':
+    # Runs in a worker process, so errors are returned rather than raised
+    try:
+        return load_item_records(filename), None
+    except Exception as e:
+        return None, "{}: {}".format(type(e).__name__, str(e))
+
+
+class LoadReport(object):
+    """The outcome of FileData.load_filenames().
+
+    Attributes:
+      * loaded - the number of items registered from each file
+      * errors - the error which stopped each file that failed to load
+      * item_errors - (filename, index, message) for each bad record
+      * conflicts - (key, earlier filename, later filename) for each key
+        found in more than one file; the earlier filename is None for
+        items which were registered before the load
+    """
+    def __init__(self) -> None:
+        self.loaded = dict()       # type: Dict[str, int]
+        self.errors = dict()       # type: Dict[str, str]
+        self.item_errors = list()  # type: List[Tuple[str, int, str]]
+        self.conflicts = list()    # type: List[Tuple[str, Optional[str], str]]
+
+    def ok(self) -> bool:
+        return len(self.errors) == 0 and len(self.item_errors) == 0 and len(self.conflicts) == 0
+
+
+class CancelToken(object):
+    """A flag used to ask a long running load to stop early."""
     def __init__(self) -> None:
+        self._cancelled = False
+
+    def cancel(self) -> None:
+        self._cancelled = True
+
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+
+class FileData(object):
+    def __init__(self, **kwargs) -> None:
+        """Create an empty set of file data.
+
+        With lazy=True items are registered as ItemRefs and only built on
+        first access, see Collection; cache_size is passed on to it.
+        """
         self._log = None
-        self.items = item.Collection()
+        self.items = item.Collection(lazy=kwargs.pop("lazy", False), cache_size=kwargs.pop("cache_size", None))
+
+        if len(kwargs.keys()) > 0:
+            raise KeyError("Unknown keyword arguments: {}".format(", ".join(kwargs.keys())))
 
     def log(self, message) -> None:
         if self._log is not None:
@@ -19,6 +415,9 @@ class FileData(object):
         return self.items
 
     def load_filename(self, filename: str) -> None:
+        if filename.endswith(".yaml") or filename.endswith(".yml"):
+            self._register_many(0, load_yaml_items(filename))
+            return
         with open(filename, "rb") as fp:
             data = json.load(fp)
             items = data.pop("items", None)
@@ -26,11 +425,144 @@ class FileData(object):
                 if type(items) is not list:
                     self.log("base-level items collection expected list, got {}".format(type(items)))
                 else:
-                    for index, item_data in enumerate(items):
-                        try:
-                            i = item.Item.from_json(item_data)
-                            status, err_msg = self.items.register(i, False)
-                            if not status:
-                                self.log("Error while registering item {}: {}".format(index, err_msg))
-                        except Exception as e:
-                            self.log("{} while parsing item {}: {}".format(type(e), index, str(e)))
+                    self._register_many(0, items)
+
+    def _register_many(self, start: int, records: 'List[Any]') -> int:
+        """Register a batch of item records, logging each one which fails.
+
+        :param start: The index of the first record, for the log
+        :return: The number of items registered
+        """
+        entries = list()  # type: List[Union[item.Item, item.ItemRef]]
+        indices = list()  # type: List[int]
+        for index, item_data in enumerate(records, start):
+            try:
+                entries.append(self.items.from_record(item_data))
+                indices.append(index)
+            except Exception as e:
+                self.log("{} while parsing item {}: {}".format(type(e), index, str(e)))
+        count = 0
+        for index, (status, err_msg) in zip(indices, self.items.register_many(entries)):
+            if status:
+                count += 1
+            else:
+                self.log("Error while registering item {}: {}".format(index, err_msg))
+        return count
+
+    def load_stream(self, filename: str, **kwargs) -> bool:
+        """Load the items of a json file, parsing them one at a time.
+
+        Unlike load_filename() the document is never held in memory as a
+        whole: the elements of the top-level items array are decoded and
+        registered in batches of progress_every items, so memory use is
+        bounded by the batch rather than the file size.
+
+        Keyword arguments:
+          * progress - called as progress(items read, bytes read from the
+            file, file size in bytes) every progress_every items and at the
+            end. The bytes read run ahead of the items by up to a buffer.
+          * progress_every - how many items to read between progress calls,
+            1000 by default
+          * cancel - a CancelToken; loading stops before the next batch of
+            progress_every items once it is cancelled, keeping the items
+            registered so far
+          * chunk_size - how many characters to read from the file at a time
+
+        A ValueError is raised if the items aren't stored as a list.
+
+        :return: False if the load was cancelled, True otherwise
+        """
+        progress = kwargs.pop("progress", None)  # type: Optional[ProgressCallback]
+        progress_every = int(kwargs.pop("progress_every", 1000))
+        cancel = kwargs.pop("cancel", None)  # type: Optional[CancelToken]
+        chunk_size = int(kwargs.pop("chunk_size", 65536))
+        if len(kwargs.keys()) > 0:
+            raise KeyError("Unknown keyword arguments: {}".format(", ".join(kwargs.keys())))
+
+        size = os.path.getsize(filename)
+        count = 0
+        batch = list()  # type: List[Any]
+        with open(filename, "rb") as raw, io.TextIOWrapper(raw, encoding="utf-8") as fp:
+            for record in iter_json_array(fp, "items", chunk_size):
+                batch.append(record)
+                if len(batch) < progress_every:
+                    continue
+                if cancel is not None and cancel.cancelled():
+                    return False
+                self._register_many(count, batch)
+                count += len(batch)
+                batch = list()
+                if progress is not None:
+                    progress(count, raw.tell(), size)
+            if len(batch) > 0:
+                if cancel is not None and cancel.cancelled():
+                    return False
+                self._register_many(count, batch)
+                count += len(batch)
+            if progress is not None:
+                progress(count, raw.tell(), size)
+        return True
+
+    def load_filenames(self, filenames: 'Sequence[str]', processes: 'Optional[int]' = None,
+                       replace: bool = False) -> 'LoadReport':
+        """Load several json or yaml catalogs, parsing them in parallel.
+
+        Files are parsed in a pool of worker processes (processes of them,
+        by default one per CPU; 0 or 1 parses them here instead), and the
+        records are registered in this process in the order the files
+        were given, so the result doesn't depend on which file finishes
+        first. A key found in more than one file is a conflict: the first
+        file's item is kept, or the last one's if replace is True. A file
+        which can't be read is reported and skipped.
+        """
+        report = LoadReport()
+        if processes is not None and processes <= 1:
+            results = [_parse_file(filename) for filename in filenames]
+        else:
+            with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+                results = list(executor.map(_parse_file, filenames))
+
+        origins = dict()  # type: Dict[str, Optional[str]]
+        all_items = self.items.all()
+        for filename, (records, error) in zip(filenames, results):
+            if error is not None:
+                report.errors[filename] = error
+                continue
+            # Build the file's items first, then register them in one batch
+            entries = list()  # type: List[Union[item.Item, item.ItemRef]]
+            indices = list()  # type: List[int]
+            replacing = list()  # type: List[Optional[Tuple[str, Optional[str], str]]]
+            batch = set()  # type: Set[str]
+            for index, record in enumerate(records):
+                try:
+                    if type(record) is not dict:
+                        raise ValueError("Item record must be an object, got {}".format(type(record)))
+                    entry = self.items.from_record(record)
+                    key = entry.key()
+                except Exception as e:
+                    report.item_errors.append((filename, index, "{}: {}".format(type(e).__name__, str(e))))
+                    continue
+                conflict = None
+                if key in batch or key in all_items:
+                    conflict = (key, filename if key in batch else origins.get(key, None), filename)
+                    if not replace:
+                        report.conflicts.append(conflict)
+                        continue
+                batch.add(key)
+                entries.append(entry)
+                indices.append(index)
+                replacing.append(conflict)
+
+            count = 0
+            statuses = self.items.register_many(entries, replace)
+            for entry, index, conflict, (status, err_msg) in zip(entries, indices, replacing, statuses):
+                if not status:
+                    report.item_errors.append((filename, index, err_msg))
+                    continue
+                # A conflict is only recorded once the replacement has succeeded
+                if conflict is not None:
+                    report.conflicts.append(conflict)
+                origins[entry.key()] = filename
+                count += 1
+            report.loaded[filename] = count
+        return report
@@ -1,51 +1,211 @@
 
+from dnd.item import money
+
 import typing
 if typing.TYPE_CHECKING:
-    from typing import Dict, List
+    from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
     from dnd.item.item import Item
 
 
 class Category(object):
-    def __init__(self, name: str):
+    """A node in the tree of item categories.
+
+    Each node keeps aggregates over its whole subtree - the item count
+    and total value and weight - which add() and remove() update along
+    the path they walk. Every node created under a root is also entered
+    in a lookup shared by the whole tree, from its dotted path (e.g.
+    "gear.shelter") to the node.
+    """
+    def __init__(self, name: str, parent: 'Optional[Category]' = None):
         self._name = name             # type: str
         self._subcategories = dict()  # type: Dict[str, Category]
-        self._items = list()          # type: List[Item]
+        self._items = dict()          # type: Dict[str, Item]
+
+        self._count = 0
+        self._value = 0               # Total value in cp
+        self._weight = 0.0
+        if parent is None:
+            self._path = ""
+            self._paths = {"": self}  # type: Dict[str, Category]
+        else:
+            self._path = name if parent._path == "" else parent._path + "." + name
+            self._paths = parent._paths
+            self._paths[self._path] = self
 
     def name(self) -> str:
         return self._name
 
+    def path(self) -> str:
+        """Get the dotted path of this category from the root, "" for the root."""
+        return self._path
+
     def items(self) -> 'List[Item]':
-        return self._items
+        return list(self._items.values())
+
+    def get(self, key: str) -> 'Optional[Item]':
+        """Get an item directly in this category by its full key."""
+        return self._items.get(key, None)
 
     def subcategories(self) -> 'Dict[str, Category]':
         return self._subcategories
 
+    def count(self) -> int:
+        """Get the number of items in this category and all of its subcategories."""
+        return self._count
+
+    def total_value(self) -> 'money.Money':
+        """Get the total value of the items in this category and all of its subcategories."""
+        return money.Money({'cp': self._value})
+
+    def total_weight(self) -> float:
+        return self._weight
+
+    def average_value(self) -> 'money.Money':
+        """Get the average item value, rounded down to the cp."""
+        return money.Money({'cp': self._value // self._count if self._count > 0 else 0})
+
+    def average_weight(self) -> float:
+        return self._weight / self._count if self._count > 0 else 0.0
+
+    def find(self, path: str) -> 'Category':
+        """Get a subcategory by dotted path relative to this one, e.g. "gear.shelter".
+
+        Raises a KeyError if there is no such category.
+        """
+        if self._path != "":
+            path = self._path + "." + path if path != "" else self._path
+        return self._paths[path]
+
     def add(self, item: 'Item', category_list: 'List[str]') -> None:
+        self.add_many((item,), category_list)
+
+    def remove(self, item: 'Item', category_list: 'List') -> None:
+        self.remove_many((item,), category_list)
+
+    def add_many(self, items: 'Iterable[Item]', category_list: 'List[str]') -> None:
+        """Add several items which share a category path, walking it once.
+
+        An item with the same key as one already in the category replaces it.
+        """
         category_obj = self  # type: Category
+        path = [category_obj]
         for subcategory in category_list:
             if subcategory not in category_obj._subcategories:
-                category_obj._subcategories[subcategory] = Category(subcategory)
+                category_obj._subcategories[subcategory] = Category(subcategory, category_obj)
             category_obj = category_obj._subcategories[subcategory]
-        category_obj._items.append(item)
+            path.append(category_obj)
 
-    def remove(self, item: 'Item', category_list: 'List') -> None:
-        category_obj = self  # type: Category
+        count, value, weight = 0, 0, 0.0
+        for item in items:
+            old = category_obj._items.get(item.key(), None)
+            if old is not None:
+                count -= 1
+                value -= old.value().total_cp()
+                weight -= old.weight()
+            category_obj._items[item.key()] = item
+            count += 1
+            value += item.value().total_cp()
+            weight += item.weight()
+        for node in path:
+            node._update(count, value, weight)
+
+    def remove_many(self, items: 'Iterable[Item]', category_list: 'List[str]') -> None:
+        """Remove several items which share a category path, walking it once.
+
+        Raises a KeyError if the path or any of the items is missing; items
+        before the missing one are still removed.
+        """
+        path = [self]  # type: List[Category]
         for subcategory in category_list:
-            category_obj = category_obj._subcategories[subcategory]
-        category_obj._items.remove(item)
+            path.append(path[-1]._subcategories[subcategory])
+        category_obj = path[-1]
+
+        count, value, weight = 0, 0, 0.0
+        try:
+            for item in items:
+                old = category_obj._items.pop(item.key())
+                count -= 1
+                value -= old.value().total_cp()
+                weight -= old.weight()
+        finally:
+            for node in path:
+                node._update(count, value, weight)
+
+    def _update(self, count: int, value: int, weight: float) -> None:
+        self._count += count
+        self._value += value
+        self._weight += weight
+        if self._count == 0:
+            # Don't leave float rounding residue in an empty subtree
+            self._weight = 0.0
+
+    def iter_lines(self, space: str = "", details: bool = False, **kwargs) -> 'Iterator[str]':
+        """Generate the lines of a rendering of this category tree.
+
+        The tree is walked depth first with an explicit stack of iterators,
+        so each line is produced in constant time and the only extra memory
+        is proportional to the depth of the tree.
+
+        Keyword arguments:
+          * max_depth - the deepest indentation level to render; 0 renders
+            just this category's line, 1 adds its items and subcategories
+          * item_filter - a function of an item, only items it returns
+            True for are rendered
+          * category_filter - a function of a subcategory, subtrees it
+            returns False for are skipped
+        """
+        max_depth = kwargs.pop("max_depth", None)  # type: Optional[int]
+        item_filter = kwargs.pop("item_filter", None)  # type: Optional[Callable[[Item], bool]]
+        category_filter = kwargs.pop("category_filter", None)  # type: Optional[Callable[[Category], bool]]
+        if len(kwargs.keys()) > 0:
+            raise KeyError("Unknown keyword arguments: {}".format(", ".join(kwargs.keys())))
+
+        stack = [(iter((self,)), space)]  # type: List[Tuple[Iterator[Category], str]]
+        while len(stack) > 0:
+            categories, indent = stack[-1]
+            category_obj = next(categories, None)
+            if category_obj is None:
+                stack.pop()
+                continue
+            depth = len(stack) - 1
+            if depth > 0 and category_filter is not None and not category_filter(category_obj):
+                continue
 
-    def build_str(self, space: str = "", details: bool = False) -> str:
-        tab = space + "  "
-        parts = ["{}{}:".format(space, self._name)]
-        if len(self._items) > 0:
             if details:
-                fmt_str = "{}{} - {}, {} lbs"
-                parts.append("\n".join([fmt_str.format(tab, i.name(), i.value(), i.weight()) for i in self._items]))
+                yield "{}{}: {} items, {}, {} lbs".format(indent, category_obj._name, category_obj._count,
+                                                          category_obj.total_value(), round(category_obj._weight, 3))
             else:
-                parts.append("\n".join(list("{}{}".format(tab, i.name()) for i in self._items)))
-        if len(self._subcategories.keys()):
-            parts.append("\n".join([c.build_str(tab, details) for c in self._subcategories.values()]))
-        return "\n".join(parts)
+                yield "{}{}:".format(indent, category_obj._name)
+            if max_depth is not None and depth >= max_depth:
+                continue
+
+            tab = indent + "  "
+            for i in category_obj._items.values():
+                if item_filter is not None and not item_filter(i):
+                    continue
+                if details:
+                    yield "{}{} - {}, {} lbs".format(tab, i.name(), i.value(), i.weight())
+                else:
+                    yield "{}{}".format(tab, i.name())
+            if len(category_obj._subcategories) > 0:
+                stack.append((iter(category_obj._subcategories.values()), tab))
+
+    def render(self, fp: 'TextIO', details: bool = False, **kwargs) -> int:
+        """Write a rendering of this category tree to a file, a line at a time.
+
+        Takes the same keyword arguments as iter_lines().
+
+        :return: The number of lines written
+        """
+        count = 0
+        for line in self.iter_lines("", details, **kwargs):
+            fp.write(line)
+            fp.write("\n")
+            count += 1
+        return count
+
+    def build_str(self, space: str = "", details: bool = False) -> str:
+        return "\n".join(self.iter_lines(space, details))
 
     def __str__(self) -> str:
         return self.build_str("", False)
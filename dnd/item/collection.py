@@ -1,31 +1,240 @@
 
+import collections
+
 from dnd.item import category
+from dnd.item import index
+from dnd.item import search
+from dnd.item import item as item_
 
 import typing
 if typing.TYPE_CHECKING:
-    from typing import Dict, Optional, Tuple
-    from dnd.item.item import Item
+    from typing import Any, Dict, Iterable, List, Optional, OrderedDict, Tuple, Union
+    from dnd.item.item import Item, ItemRef
     from dnd.item.category import Category
+    from dnd.item.money import MoneyType
 
 
 class Collection(object):
-    def __init__(self) -> None:
+    """All of the known items, with a category tree and indexes over them.
+
+    A lazy collection (lazy=True) registers raw json records as ItemRef
+    placeholders, which are enough to build the category tree and the
+    indexes; the Item for a record is only built when get() (or a query
+    or search) first returns it. Built items are kept on their reference,
+    or if cache_size is given, in a least recently used cache of that
+    many items so memory stays bounded.
+    """
+    def __init__(self, **kwargs) -> None:
         self._root_category = category.Category("All")
-        self._all_items = dict()  # type: Dict[str, Item]
+        self._all_items = dict()  # type: Dict[str, Union[Item, ItemRef]]
+        self._index = index.Index()
+        self._search = None  # type: Optional[search.SearchIndex]
+        self._version = 0
+
+        self._lazy = bool(kwargs.pop("lazy", False))
+        self._cache_size = kwargs.pop("cache_size", None)  # type: Optional[int]
+        self._cache = collections.OrderedDict()  # type: OrderedDict[str, Item]
+
+        if len(kwargs.keys()) > 0:
+            raise KeyError("Unknown keyword arguments: {}".format(", ".join(kwargs.keys())))
 
     def category(self) -> 'Category':
         return self._root_category
 
-    def all(self) -> 'Dict[str, Item]':
+    def all(self) -> 'Dict[str, Union[Item, ItemRef]]':
+        """Get every registered item by key; in a lazy collection these may be ItemRefs."""
         return self._all_items
 
-    def register(self, item: 'Item', replace: bool = False) -> 'Tuple[bool, Optional[str]]':
-        err_str = None
-        if item.key() in self._all_items:
-            err_str = "Item with key={} already exists in Item.All".format(item.key())
-            if not replace:
-                return False, err_str
-            raise NotImplementedError("Item Replacement not implemented")
-        self._all_items[item.key()] = self
-        self._root_category.add(item, item.categories())
-        return True, err_str
+    def lazy(self) -> bool:
+        return self._lazy
+
+    def version(self) -> int:
+        """Get a counter which changes whenever items are registered or removed."""
+        return self._version
+
+    def get(self, key: str) -> 'Item':
+        """Get an item by its full key, building it first if it is lazy.
+
+        Raises a KeyError if no item has the key.
+        """
+        entry = self._all_items[key]
+        if type(entry) is not item_.ItemRef:
+            return entry
+        if self._cache_size is None:
+            return entry.get()
+        cached = self._cache.get(key, None)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+        cached = self._cache[key] = entry.materialize()
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return cached
+
+    def from_record(self, record: 'Dict[str, Any]') -> 'Union[Item, ItemRef]':
+        """Build the entry this collection would hold for a json record, as an ItemRef if it is lazy."""
+        if self._lazy:
+            return item_.ItemRef(record)
+        return item_.Item.from_json(record)
+
+    def register_record(self, record: 'Dict[str, Any]', replace: bool = False) -> 'Tuple[bool, Optional[str]]':
+        """Register an item from its json record, as an ItemRef if the collection is lazy."""
+        return self.register(self.from_record(record), replace)
+
+    def index(self) -> 'index.Index':
+        return self._index
+
+    def register(self, item: 'Union[Item, ItemRef]', replace: bool = False) -> 'Tuple[bool, Optional[str]]':
+        return self.register_many((item,), replace)[0]
+
+    def register_many(self, items: 'Iterable[Union[Item, ItemRef]]', replace: bool = False) -> 'List[Tuple[bool, Optional[str]]]':
+        """Register several items, walking each category path once.
+
+        Items with a key which is already registered are skipped, unless
+        replace is True, in which case the old item is replaced everywhere.
+
+        :return: A (registered, error message) tuple for each item
+        """
+        results = list()  # type: List[Tuple[bool, Optional[str]]]
+        groups = dict()  # type: Dict[Tuple[str, ...], List[Union[Item, ItemRef]]]
+        added = dict()  # type: Dict[str, Union[Item, ItemRef]]
+        for item in items:
+            key = item.key()
+            old = self._all_items.get(key, None)
+            if old is not None:
+                if not replace:
+                    results.append((False, "Item with key={} already exists in Item.All".format(key)))
+                    continue
+                if added.pop(key, None) is None:
+                    self._index.remove(old)
+                if self._search is not None:
+                    self._search.remove(key, old)
+                self._cache.pop(key, None)
+            self._all_items[key] = item
+            added[key] = item
+            if self._search is not None:
+                self._search.add(item)
+            groups.setdefault(tuple(item.categories()), list()).append(item)
+            results.append((True, None))
+
+        self._index.add_many(added.values())
+        for path, group in groups.items():
+            self._root_category.add_many(group, list(path))
+        if len(groups) > 0:
+            self._version += 1
+        return results
+
+    def unregister(self, key: str) -> 'Optional[Union[Item, ItemRef]]':
+        """Remove an item by its full key.
+
+        :return: The removed item (or ItemRef), or None if no item has the key
+        """
+        return self.unregister_many((key,))[0]
+
+    def unregister_many(self, keys: 'Iterable[str]') -> 'List[Optional[Union[Item, ItemRef]]]':
+        """Remove several items by key, walking each category path once."""
+        results = list()  # type: List[Optional[Union[Item, ItemRef]]]
+        groups = dict()  # type: Dict[Tuple[str, ...], List[Union[Item, ItemRef]]]
+        for key in keys:
+            item = self._all_items.pop(key, None)
+            results.append(item)
+            if item is None:
+                continue
+            self._cache.pop(key, None)
+            self._index.remove(item)
+            if self._search is not None:
+                self._search.remove(key, item)
+            groups.setdefault(tuple(item.categories()), list()).append(item)
+
+        for path, group in groups.items():
+            self._root_category.remove_many(group, list(path))
+        if len(groups) > 0:
+            self._version += 1
+        return results
+
+    def search_index(self) -> 'search.SearchIndex':
+        """Get the full-text index of the items, building it on first use."""
+        if self._search is None:
+            self._search = search.SearchIndex()
+            for i in self._all_items.values():
+                self._search.add(i)
+        return self._search
+
+    def set_search_index(self, search_index: 'search.SearchIndex') -> bool:
+        """Use a previously saved full-text index.
+
+        The index is only used if its signature matches the registered
+        items; otherwise it is ignored and rebuilt on first use.
+
+        :return: True if the index was used
+        """
+        if search_index.signature() != search.signature(self._all_items.values()):
+            self._search = None
+            return False
+        self._search = search_index
+        return True
+
+    def search(self, query: str, limit: 'Optional[int]' = 10) -> 'List[Item]':
+        """Get the items best matching a full-text query, best first."""
+        return [self.get(key) for key, _ in self.search_index().search(query, limit)]
+
+    def query(self, **kwargs) -> 'List[Item]':
+        """Find the items matching every given predicate.
+
+        See query_keys() for the keyword arguments.
+        """
+        return [self.get(key) for key in self.query_keys(**kwargs)]
+
+    def query_keys(self, **kwargs) -> 'List[str]':
+        """Find the keys of the items matching every given predicate.
+
+        Keyword arguments:
+          * name - a case-insensitive prefix of the item name
+          * source - the exact item source
+          * category - a dotted category path, e.g. "gear.shelter"
+          * min_value, max_value - an inclusive range on the item value
+          * min_weight, max_weight - an inclusive range on the item weight
+
+        Each predicate is answered from an index, then the results are
+        intersected starting from the smallest. Keys are returned sorted.
+        With no predicates every key is returned. No lazy items are built.
+        """
+        name = kwargs.pop("name", None)  # type: Optional[str]
+        source = kwargs.pop("source", None)  # type: Optional[str]
+        category_path = kwargs.pop("category", None)  # type: Optional[str]
+        min_value = kwargs.pop("min_value", None)  # type: Optional[MoneyType]
+        max_value = kwargs.pop("max_value", None)  # type: Optional[MoneyType]
+        min_weight = kwargs.pop("min_weight", None)  # type: Optional[float]
+        max_weight = kwargs.pop("max_weight", None)  # type: Optional[float]
+        if len(kwargs.keys()) > 0:
+            raise KeyError("Unknown keyword arguments: {}".format(", ".join(kwargs.keys())))
+
+        key_lists = list()
+        if name is not None:
+            key_lists.append(self._index.prefix(name))
+        if source is not None:
+            key_lists.append(self._index.source(source))
+        if min_value is not None or max_value is not None:
+            key_lists.append(self._index.value_range(
+                None if min_value is None else float(min_value),
+                None if max_value is None else float(max_value)))
+        if min_weight is not None or max_weight is not None:
+            key_lists.append(self._index.weight_range(min_weight, max_weight))
+        if category_path is not None:
+            try:
+                category_obj = self._root_category.find(category_path)
+            except KeyError:
+                return list()
+            key_lists.append(_subtree_keys(category_obj))
+
+        keys = index.intersect(key_lists)
+        if keys is None:
+            keys = self._all_items.keys()
+        return sorted(keys)
+
+
+def _subtree_keys(category_obj: 'Category') -> 'List[str]':
+    keys = [i.key() for i in category_obj.items()]
+    for subcategory in category_obj.subcategories().values():
+        keys.extend(_subtree_keys(subcategory))
+    return keys
@@ -0,0 +1,249 @@
+
+import json
+import sys
+
+import dnd.io as dnd_io
+from dnd.item import item as item_
+from dnd.item import money
+
+import typing
+if typing.TYPE_CHECKING:
+    from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+    from dnd.item.collection import Collection
+    Record = Dict[str, Any]
+    Policy = Union[str, Callable[['Change', Optional[Record]], Optional[Record]]]
+
+Added = 'added'
+Removed = 'removed'
+Changed = 'changed'
+
+# The fields compared between records, in output order
+Fields = ('type', 'name', 'weight', 'value', 'source', 'description', 'consumable')
+
+
+def normalize(record: 'Record') -> 'Record':
+    """Get the comparable form of an item record.
+
+    Defaults are filled in as Item.from_json would, the value is
+    normalized through Money, and "desc" (as written by Item.to_json) is
+    read as "description".
+    """
+    key = record.get("key", None)
+    if key is None:
+        raise KeyError("Missing required field 'key'")
+    value = record.get("value", None)
+    return {
+        "key": key,
+        "type": record.get("type", "Item"),
+        "name": record.get("name", ""),
+        "weight": float(record.get("weight", 0.001)),
+        "value": money.Money(dict(value) if type(value) is dict else value).json(),
+        "source": str(record.get("source", "")),
+        "description": str(record.get("description", record.get("desc", ""))),
+        "consumable": item_.consumable_flag(record.get("consumable", False)),
+    }
+
+
+class Change(object):
+    """A difference in one item between two catalogs."""
+    __slots__ = ('_key', '_kind', '_old', '_new', '_fields')
+
+    def __init__(self, key: str, kind: str, old: 'Optional[Record]', new: 'Optional[Record]',
+                 fields: 'Dict[str, Tuple[Any, Any]]') -> None:
+        self._key = key
+        self._kind = kind
+        self._old = old
+        self._new = new
+        self._fields = fields
+
+    def key(self) -> str:
+        return self._key
+
+    def kind(self) -> str:
+        """Get the kind of change: Added, Removed or Changed."""
+        return self._kind
+
+    def old(self) -> 'Optional[Record]':
+        """Get the normalized record in the old catalog, None if added."""
+        return self._old
+
+    def new(self) -> 'Optional[Record]':
+        """Get the normalized record in the new catalog, None if removed."""
+        return self._new
+
+    def fields(self) -> 'Dict[str, Tuple[Any, Any]]':
+        """Get the changed fields, as name: (old value, new value)."""
+        return self._fields
+
+    def to_json(self) -> 'Dict[str, Any]':
+        d = {"key": self._key, "change": self._kind}  # type: Dict[str, Any]
+        if self._kind == Added:
+            d["new"] = self._new
+        elif self._kind == Removed:
+            d["old"] = self._old
+        else:
+            d["fields"] = {name: list(values) for name, values in self._fields.items()}
+        return d
+
+    def __repr__(self) -> str:
+        return "Change({}, {})".format(repr(self._key), self._kind)
+
+
+def _sorted(records: 'Iterable[Record]', presorted: bool) -> 'Iterator[Record]':
+    if not presorted:
+        records = sorted((normalize(r) for r in records), key=lambda r: r["key"])
+        last = None
+        for record in records:
+            if record["key"] == last:
+                raise ValueError("Duplicate item key {}".format(last))
+            last = record["key"]
+            yield record
+        return
+    last = None
+    for record in records:
+        record = normalize(record)
+        if last is not None and record["key"] <= last:
+            raise ValueError("Records out of order: {} after {}".format(record["key"], last))
+        last = record["key"]
+        yield record
+
+
+def diff(old: 'Iterable[Record]', new: 'Iterable[Record]', presorted: bool = False) -> 'Iterator[Change]':
+    """Compare two catalogs of item records by key.
+
+    The catalogs are walked together in key order (a merge join), so the
+    comparison is linear in their size. Records are sorted first unless
+    presorted is True, in which case they are streamed and a ValueError
+    is raised if they turn out not to be in strictly increasing key order.
+
+    Changes are generated in key order; unchanged items are skipped.
+    """
+    old_iter = _sorted(old, presorted)
+    new_iter = _sorted(new, presorted)
+    a = next(old_iter, None)
+    b = next(new_iter, None)
+    while a is not None or b is not None:
+        if b is None or (a is not None and a["key"] < b["key"]):
+            yield Change(a["key"], Removed, a, None, dict())
+            a = next(old_iter, None)
+        elif a is None or b["key"] < a["key"]:
+            yield Change(b["key"], Added, None, b, dict())
+            b = next(new_iter, None)
+        else:
+            fields = {f: (a[f], b[f]) for f in Fields if a[f] != b[f]}
+            if len(fields) > 0:
+                yield Change(a["key"], Changed, a, b, fields)
+            a = next(old_iter, None)
+            b = next(new_iter, None)
+
+
+class MergeReport(object):
+    """The outcome of merge()."""
+    def __init__(self) -> None:
+        self.applied = list()    # type: List[Change]
+        self.skipped = list()    # type: List[Change]
+        self.conflicts = list()  # type: List[Change]
+
+
+def _current(collection: 'Collection', key: str) -> 'Optional[Record]':
+    entry = collection.all().get(key, None)
+    if entry is None:
+        return None
+    return normalize({
+        "key": entry.key(), "type": "Item", "name": entry.name(), "weight": entry.weight(),
+        "value": entry.value().json(), "source": entry.source(), "description": entry.description(),
+        "consumable": entry.consumable(),
+    })
+
+
+def merge(collection: 'Collection', changes: 'Iterable[Change]', policy: 'Policy' = 'error',
+          remove: bool = True) -> 'MergeReport':
+    """Apply changes from diff(old, new) to a collection.
+
+    The collection is treated as a third version of the old catalog.
+    A change applies cleanly if the collection still holds the old item
+    (or already holds the new one, in which case it is skipped). Anything
+    else is a conflict, resolved by the policy:
+      * 'ours' - keep the collection's item
+      * 'theirs' - take the new catalog's item
+      * 'error' - raise a ValueError before anything more is applied
+      * a function of (change, current record) returning the record to
+        keep, or None to remove the item
+
+    Removals are only applied if remove is True; otherwise they are skipped.
+    """
+    report = MergeReport()
+    for change in changes:
+        key = change.key()
+        current = _current(collection, key)
+        target = change.new()
+        if change.kind() == Removed and not remove:
+            report.skipped.append(change)
+            continue
+        if current == target:
+            report.skipped.append(change)
+            continue
+
+        if current != change.old():
+            report.conflicts.append(change)
+            if policy == 'ours':
+                continue
+            if policy == 'error':
+                raise ValueError("Merge conflict on item {}".format(key))
+            if policy != 'theirs':
+                target = policy(change, current)
+                if target == current:
+                    continue
+
+        if target is None:
+            collection.unregister(key)
+        else:
+            # Money pops the coins out of a value dict, so the nested value
+            # is copied too rather than emptying the change's record
+            record = dict(target)
+            if type(record.get("value", None)) is dict:
+                record["value"] = dict(record["value"])
+            status, err_msg = collection.register_record(record, replace=True)
+            if not status:
+                raise ValueError(err_msg)
+        report.applied.append(change)
+    return report
+
+
+def _key_ordered(records: 'List[Record]') -> bool:
+    last = None
+    for record in records:
+        key = record.get("key", None) if type(record) is dict else None
+        if type(key) is not str or (last is not None and key <= last):
+            return False
+        last = key
+    return True
+
+
+def _load(filename: str) -> 'List[Record]':
+    """Read the items of a json catalog, in key order.
+
+    A catalog which is already in strictly increasing key order is used
+    as read rather than normalized and sorted again.
+    """
+    with open(filename, "r", encoding="utf-8") as fp:
+        records = list(dnd_io.iter_json_array(fp, "items"))
+    if not _key_ordered(records):
+        records = list(_sorted(records, False))
+    return records
+
+
+def main(argv: 'List[str]') -> int:
+    """Print the changes between two item json files, one json object per line."""
+    if len(argv) != 2:
+        print("usage: python -m dnd.item.diff OLD.json NEW.json", file=sys.stderr)
+        return 2
+    count = 0
+    for change in diff(_load(argv[0]), _load(argv[1]), presorted=True):
+        print(json.dumps(change.to_json(), sort_keys=True))
+        count += 1
+    return 1 if count > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,152 @@
+
+import bisect
+import heapq
+
+import typing
+if typing.TYPE_CHECKING:
+    from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+    from dnd.item.item import Item
+
+
+class _SortedIndex(object):
+    """A sorted array of (value, key) pairs, for range queries."""
+    def __init__(self) -> None:
+        self._entries = list()  # type: List[Tuple[Any, str]]
+
+    def add(self, value: 'Any', key: str) -> None:
+        bisect.insort(self._entries, (value, key))
+
+    def add_many(self, entries: 'Iterable[Tuple[Any, str]]') -> None:
+        """Add several (value, key) pairs at once.
+
+        A batch of k entries which is small next to the n already held
+        (k < n / log n) is insorted one at a time, each in O(log n)
+        comparisons. A larger batch is sorted on its own and merged in,
+        in O(n + k log k).
+        """
+        new = sorted(entries)
+        if len(new) == 0:
+            return
+        n = len(self._entries)
+        if len(new) * max(1, n.bit_length()) < n:
+            for entry in new:
+                bisect.insort(self._entries, entry)
+        elif n == 0 or self._entries[-1] <= new[0]:
+            self._entries.extend(new)
+        else:
+            self._entries = list(heapq.merge(self._entries, new))
+
+    def remove(self, value: 'Any', key: str) -> None:
+        index = bisect.bisect_left(self._entries, (value, key))
+        if index < len(self._entries) and self._entries[index] == (value, key):
+            del self._entries[index]
+
+    def range(self, low: 'Optional[float]', high: 'Optional[float]') -> 'List[str]':
+        """Get the keys with low <= value <= high, ordered by value."""
+        start = 0 if low is None else bisect.bisect_left(self._entries, (low, ""))
+        if high is None:
+            end = len(self._entries)
+        else:
+            # Every key sorts before chr(0x10ffff), so this includes value == high
+            end = bisect.bisect_right(self._entries, (high, chr(0x10ffff)))
+        return [key for _, key in self._entries[start:end]]
+
+    def prefix(self, prefix: str) -> 'List[str]':
+        """Get the keys whose (string) value starts with prefix, ordered by value."""
+        result = list()
+        for value, key in self._entries[bisect.bisect_left(self._entries, (prefix, "")):]:
+            if not value.startswith(prefix):
+                break
+            result.append(key)
+        return result
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class Index(object):
+    """Secondary indexes over the items of a Collection.
+
+    Maintains:
+      * a sorted array of lowercase names, for case-insensitive prefix
+        lookups by binary search
+      * a map of source to item keys
+      * sorted arrays of value (as a float, see Money.__float__) and
+        weight, for range queries
+
+    Items are keyed by their full key. The indexes are kept up to date
+    by add() and remove(), which Collection calls as items are registered.
+    """
+    def __init__(self) -> None:
+        self._names = _SortedIndex()
+        self._sources = dict()  # type: Dict[str, Set[str]]
+        self._values = _SortedIndex()
+        self._weights = _SortedIndex()
+
+    def add(self, item: 'Item') -> None:
+        key = item.key()
+        self._names.add(item.name().lower(), key)
+        self._sources.setdefault(item.source(), set()).add(key)
+        self._values.add(float(item.value()), key)
+        self._weights.add(item.weight(), key)
+
+    def add_many(self, items: 'Iterable[Item]') -> None:
+        """Add several items, sorting each index once."""
+        names = list()  # type: List[Tuple[str, str]]
+        values = list()  # type: List[Tuple[float, str]]
+        weights = list()  # type: List[Tuple[float, str]]
+        for item in items:
+            key = item.key()
+            names.append((item.name().lower(), key))
+            self._sources.setdefault(item.source(), set()).add(key)
+            values.append((float(item.value()), key))
+            weights.append((item.weight(), key))
+        self._names.add_many(names)
+        self._values.add_many(values)
+        self._weights.add_many(weights)
+
+    def remove(self, item: 'Item') -> None:
+        key = item.key()
+        self._names.remove(item.name().lower(), key)
+        keys = self._sources.get(item.source(), None)
+        if keys is not None:
+            keys.discard(key)
+            if len(keys) == 0:
+                del self._sources[item.source()]
+        self._values.remove(float(item.value()), key)
+        self._weights.remove(item.weight(), key)
+
+    def prefix(self, prefix: str) -> 'List[str]':
+        """Get the keys of items whose name starts with prefix, ignoring case."""
+        return self._names.prefix(prefix.lower())
+
+    def source(self, source: str) -> 'Set[str]':
+        return set(self._sources.get(source, ()))
+
+    def sources(self) -> 'List[str]':
+        return sorted(self._sources.keys())
+
+    def value_range(self, low: 'Optional[float]' = None, high: 'Optional[float]' = None) -> 'List[str]':
+        return self._values.range(low, high)
+
+    def weight_range(self, low: 'Optional[float]' = None, high: 'Optional[float]' = None) -> 'List[str]':
+        return self._weights.range(low, high)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+def intersect(key_lists: 'Iterable[Iterable[str]]') -> 'Optional[Set[str]]':
+    """Intersect several lists of keys, starting from the smallest.
+
+    :return: The keys in every list, or None if no lists were given
+    """
+    sets = sorted((k if isinstance(k, set) else set(k) for k in key_lists), key=len)
+    if len(sets) == 0:
+        return None
+    result = sets[0]
+    for keys in sets[1:]:
+        if len(result) == 0:
+            break
+        result = result & keys
+    return result
@@ -1,11 +1,50 @@
+import functools
+import sys
+
 from dnd.item import money
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
-    from typing import Dict, List, Union
+    from typing import Any, Dict, Optional, Tuple, Union
+
+# Items in the same category share one path tuple. The tuples are kept in
+# a bounded cache, so loading and dropping many catalogs can't grow it
+# without limit; a path evicted from it is simply built again.
+_CategoryPathCacheSize = 4096
+
+
+@functools.lru_cache(maxsize=_CategoryPathCacheSize)
+def _category_path(prefix: str) -> 'Tuple[str, ...]':
+    return tuple(sys.intern(segment) for segment in prefix.split('.')) if prefix != "" else ()
+
+
+def category_path(key: str) -> 'Tuple[Tuple[str, ...], str]':
+    """Split an item key into its shared category path tuple and short key."""
+    prefix, _, short_key = key.rpartition('.')
+    return _category_path(prefix), sys.intern(short_key)
+
+
+def consumable_flag(value: 'Any') -> bool:
+    """Read the "consumable" field of an item record.
+
+    Catalogs may mark consumables with an empty "consumable:" entry, which
+    yaml reads as None, so None counts as True.
+    """
+    return True if value is None else bool(value)
+
+
+def intern_source(source: str) -> str:
+    """Get the shared copy of a source string.
+
+    Sources are interned, so the copy is freed once no item uses it.
+    """
+    return sys.intern(source)
 
 
 class Item(object):
+    __slots__ = ('_key', '_type', '_name', '_weight', '_value', '_desc', '_source', '_consumable', '_categories',
+                 '_short_key')
+
     Item = 0
     Weapon = 1
     Armor = 2
@@ -39,11 +78,11 @@ class Item(object):
         self._weight = float(kwargs.pop("weight", 0.001))  # type: float
         self._value = kwargs.pop("value", money.Money())   # type: money.Money
         self._desc = str(kwargs.pop("description", ""))    # type: str
-        self._source = str(kwargs.pop("source", ""))       # type: str
+        self._source = intern_source(str(kwargs.pop("source", "")))  # type: str
+        self._consumable = consumable_flag(kwargs.pop("consumable", False))  # type: bool
 
         # These are derived from the key
-        self._categories = self._key.split('.')
-        self._short_key = self._categories.pop()
+        self._categories, self._short_key = category_path(self._key)
 
         if len(kwargs.keys()) > 0:
             raise KeyError("Unknown keyword arguments: {}".format(", ".join(kwargs.keys())))
@@ -69,7 +108,10 @@ class Item(object):
     def source(self) -> str:
         return self._source
 
-    def categories(self) -> 'List[str]':
+    def consumable(self) -> bool:
+        return self._consumable
+
+    def categories(self) -> 'Tuple[str, ...]':
         return self._categories
 
     def to_json(self) -> 'Dict':
@@ -83,4 +125,97 @@ class Item(object):
             d["desc"] = self._desc
         if self._source != "":
             d["source"] = self._source
+        if self._consumable:
+            d["consumable"] = True
         return d
+
+
+class ItemRef(object):
+    """A placeholder for an Item which hasn't been built from its record yet.
+
+    Lazy collections hold these in place of items. A reference answers
+    the cheap accessors used to build the category tree and indexes
+    straight from the raw json record, and builds the real Item with
+    materialize() when it is actually needed. The value is parsed into
+    Money afresh on each call rather than kept, so that references which
+    are never materialized hold nothing but their record.
+    """
+    __slots__ = ('_record', '_item')
+
+    def __init__(self, record: 'Dict[str, Union[str, int, float, list, dict]]') -> None:
+        key = record.get("key", None)
+        if key is None:
+            raise KeyError("Missing required field 'key'")
+        if type(key) is not str:
+            raise ValueError("Item key must be a string, got {}".format(type(key)))
+        self._record = record
+        self._item = None  # type: Optional[Item]
+
+    def key(self, full: bool = True) -> str:
+        key = self._record["key"]  # type: str
+        return key if full else category_path(key)[1]
+
+    def type(self) -> int:
+        type_str = self._record.get("type", "Item")
+        type_ = Item.ItemTypeLookup.get(type_str, -1)
+        if type_ == -1:
+            raise KeyError("Invalid Item Type {}".format(type_str))
+        return type_
+
+    def name(self) -> str:
+        return self._record.get("name", "")
+
+    def weight(self) -> float:
+        return float(self._record.get("weight", 0.001))
+
+    def value(self) -> 'money.Money':
+        if self._item is not None:
+            return self._item.value()
+        value = self._record.get("value", None)
+        return money.Money(dict(value) if type(value) is dict else value)
+
+    def description(self) -> str:
+        return str(self._record.get("description", ""))
+
+    def source(self) -> str:
+        return str(self._record.get("source", ""))
+
+    def consumable(self) -> bool:
+        return consumable_flag(self._record.get("consumable", False))
+
+    def categories(self) -> 'Tuple[str, ...]':
+        return category_path(self._record["key"])[0]
+
+    def to_json(self) -> 'Dict':
+        """Get the record as Item.to_json would write it, without building the Item."""
+        d = dict()
+        d["key"] = self.key()
+        d["type"] = "Item"
+        d["name"] = self.name()
+        d["weight"] = self.weight()
+        d["value"] = self.value().json()
+        description = self.description()
+        if description != "":
+            d["desc"] = description
+        source = self.source()
+        if source != "":
+            d["source"] = source
+        if self.consumable():
+            d["consumable"] = True
+        return d
+
+    def materialize(self) -> 'Item':
+        """Build the Item for this record.
+
+        Raises the same errors as Item.from_json if the record is invalid.
+        """
+        record = dict(self._record)
+        if type(record.get("value", None)) is dict:
+            record["value"] = dict(record["value"])
+        return Item.from_json(record)
+
+    def get(self) -> 'Item':
+        """Get the Item for this record, building it on first use and keeping it."""
+        if self._item is None:
+            self._item = self.materialize()
+        return self._item
@@ -0,0 +1,122 @@
+
+import random
+
+import typing
+if typing.TYPE_CHECKING:
+    from typing import Callable, Dict, List, Optional, Tuple, Union
+    from dnd.item.collection import Collection
+    from dnd.item.item import Item, ItemRef
+    from dnd.item.money import MoneyType
+    TableKey = Tuple[Optional[str], Optional[float], Optional[float]]
+
+
+class AliasTable(object):
+    """Samples indices in proportion to their weights in O(1) per draw.
+
+    Built with Vose's alias method: each of the n slots holds a
+    probability and an alias, a draw picks a slot uniformly and then
+    either keeps it or takes its alias.
+    """
+    def __init__(self, weights: 'List[float]') -> None:
+        n = len(weights)
+        total = float(sum(weights))
+        if n == 0 or total <= 0:
+            raise ValueError("Alias table needs at least one positive weight")
+        if any(w < 0 for w in weights):
+            raise ValueError("Weights may not be negative")
+
+        self._probability = [0.0] * n
+        self._alias = list(range(n))
+        scaled = [w * n / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while len(small) > 0 and len(large) > 0:
+            s = small.pop()
+            g = large.pop()
+            self._probability[s] = scaled[s]
+            self._alias[s] = g
+            scaled[g] -= 1.0 - scaled[s]
+            (small if scaled[g] < 1.0 else large).append(g)
+        # Whatever is left is 1 up to rounding
+        for i in large + small:
+            self._probability[i] = 1.0
+
+    def __len__(self) -> int:
+        return len(self._probability)
+
+    def draw(self, rand: 'random.Random') -> int:
+        i = int(rand.random() * len(self._probability))
+        return i if rand.random() < self._probability[i] else self._alias[i]
+
+
+class LootGenerator(object):
+    """Draws random items from a Collection, filtered by category and value.
+
+    An alias table is built the first time a (category, value band) is
+    drawn from and cached, so each draw after that is O(1). Cached tables
+    are rebuilt when the collection's version() shows items have been
+    registered or removed since.
+
+    By default every matching item is equally likely; a weight function
+    of an item (or ItemRef, in lazy collections) can be given instead.
+    """
+    def __init__(self, collection: 'Collection', **kwargs) -> None:
+        self._collection = collection
+        self._rand = kwargs.pop("rand", None) or random.Random()  # type: random.Random
+        self._weight = kwargs.pop("weight", None)  # type: Optional[Callable[[Union[Item, ItemRef]], float]]
+        self._tables = dict()  # type: Dict[TableKey, Tuple[int, List[str], Optional[AliasTable]]]
+
+        if len(kwargs.keys()) > 0:
+            raise KeyError("Unknown keyword arguments: {}".format(", ".join(kwargs.keys())))
+
+    def _table(self, category: 'Optional[str]', min_value: 'Optional[MoneyType]',
+               max_value: 'Optional[MoneyType]') -> 'Tuple[List[str], Optional[AliasTable]]':
+        table_key = (category,
+                     None if min_value is None else float(min_value),
+                     None if max_value is None else float(max_value))
+        version = self._collection.version()
+        cached = self._tables.get(table_key, None)
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+
+        keys = self._collection.query_keys(category=category, min_value=min_value, max_value=max_value)
+        table = None
+        if self._weight is not None and len(keys) > 0:
+            entries = self._collection.all()
+            weights = [float(self._weight(entries[key])) for key in keys]
+            if sum(weights) > 0:
+                table = AliasTable(weights)
+            else:
+                keys = list()
+        self._tables[table_key] = (version, keys, table)
+        return keys, table
+
+    def draw(self, k: int, **kwargs) -> 'List[Item]':
+        """Draw k items, with replacement.
+
+        Keyword arguments:
+          * category - a dotted category path to draw from, e.g. "gear"
+          * min_value, max_value - an inclusive band on the item value
+
+        Returns an empty list if nothing matches.
+        """
+        category = kwargs.pop("category", None)  # type: Optional[str]
+        min_value = kwargs.pop("min_value", None)  # type: Optional[MoneyType]
+        max_value = kwargs.pop("max_value", None)  # type: Optional[MoneyType]
+        if len(kwargs.keys()) > 0:
+            raise KeyError("Unknown keyword arguments: {}".format(", ".join(kwargs.keys())))
+
+        keys, table = self._table(category, min_value, max_value)
+        if len(keys) == 0:
+            return list()
+        rand = self._rand
+        if table is None:
+            n = len(keys)
+            picks = [keys[int(rand.random() * n)] for _ in range(k)]
+        else:
+            picks = [keys[table.draw(rand)] for _ in range(k)]
+        return [self._collection.get(key) for key in picks]
+
+    def clear(self) -> None:
+        """Drop every cached table."""
+        self._tables.clear()
@@ -109,7 +109,11 @@ class Money(object):
             if len(data.keys()) > 0:
                 raise KeyError("Unknown keyword arguments: {}".format(", ".join(data.keys())))
         elif type(data) == str:
-            raise NotImplementedError("Money(str) not implemented")
+            cp, sp, gp, pp = parse_coin_spec(data)
+            self.pp = pp
+            self.gp = gp
+            self.sp = sp
+            self.cp = cp
         elif type(data) == int or type(data) == float:
             if data < 0:
                 raise ValueError("Money value may not be negative")
@@ -197,6 +201,14 @@ class Money(object):
     def weight(self) -> float:
         return (self._cp + self._sp + self._gp + self._pp) * 0.02
 
+    def total_cp(self) -> int:
+        """Get the whole value in cp, on the same scale as float(money) * 100.
+
+        Running totals of values are best kept in these whole units, so
+        that repeated adds and removes can't drift.
+        """
+        return int(round(float(self) * 100))
+
     def json(self) -> 'Dict':
         """Convert a Money value to a json dict.
 
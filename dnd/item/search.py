@@ -0,0 +1,189 @@
+
+import hashlib
+import json
+import math
+import re
+
+import typing
+if typing.TYPE_CHECKING:
+    from typing import Any, Dict, Iterable, List, Tuple
+    from dnd.item.item import Item
+
+
+Version = 1
+
+_Word = re.compile(r"[a-z0-9]+")
+
+StopWords = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'for', 'from', 'has', 'have', 'in', 'into', 'is', 'it',
+    'its', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'with', 'you', 'your',
+))
+
+# Suffixes stripped by stem(), longest first, with their replacements
+_Suffixes = (
+    ('ies', 'y'), ('ches', 'ch'), ('shes', 'sh'), ('xes', 'x'), ('ing', ''), ('ed', ''), ('ly', ''), ('s', ''),
+)
+
+
+def stem(word: str) -> str:
+    """Strip common English suffixes, so 'ropes' and 'rope' match.
+
+    This is deliberately much simpler than a real stemmer: a suffix is
+    only removed if at least 3 characters remain, and words ending in
+    'ss' are left alone.
+    """
+    if word.endswith('ss'):
+        return word
+    for suffix, replacement in _Suffixes:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)] + replacement
+    return word
+
+
+def tokenize(text: str) -> 'List[str]':
+    """Split text into lowercase, stemmed terms, dropping stop words."""
+    return [stem(word) for word in _Word.findall(text.lower()) if word not in StopWords]
+
+
+def _doc_hash(key: str, name: str, description: str) -> int:
+    digest = hashlib.sha1("\0".join((key, name, description)).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+class SearchIndex(object):
+    """An inverted index over item names and descriptions.
+
+    Documents are ranked with BM25. A term in the name counts name_boost
+    times as much as one in the description (a simple form of BM25F), so
+    "rope" ranks the ropes above items which only mention rope.
+
+    The index is updated incrementally by add() and remove(). It can be
+    saved as json and loaded again; signature() identifies the exact
+    set of documents indexed, so a loaded index can be checked against
+    the items it is meant to cover without re-tokenizing them.
+    """
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, name_boost: float = 3.0) -> None:
+        self._name_boost = float(name_boost)
+        self._postings = dict()  # type: Dict[str, Dict[str, float]]
+        self._docs = dict()  # type: Dict[str, Tuple[float, int]]
+        self._total_length = 0.0
+        self._signature = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._docs
+
+    def signature(self) -> int:
+        """Get an order-independent hash of every indexed (key, name, description)."""
+        return self._signature
+
+    def add(self, item: 'Item') -> None:
+        """Index an item, replacing any previously indexed item with the same key."""
+        self.add_document(item.key(), item.name(), item.description())
+
+    def add_document(self, key: str, name: str, description: str) -> None:
+        if key in self._docs:
+            self.remove(key)
+        frequencies = dict()  # type: Dict[str, float]
+        name_terms = tokenize(name)
+        desc_terms = tokenize(description)
+        for term in name_terms:
+            frequencies[term] = frequencies.get(term, 0.0) + self._name_boost
+        for term in desc_terms:
+            frequencies[term] = frequencies.get(term, 0.0) + 1.0
+        for term, frequency in frequencies.items():
+            self._postings.setdefault(term, dict())[key] = frequency
+
+        length = len(name_terms) * self._name_boost + len(desc_terms)
+        doc_hash = _doc_hash(key, name, description)
+        self._docs[key] = (length, doc_hash)
+        self._total_length += length
+        self._signature ^= doc_hash
+
+    def remove(self, key: str, item: 'typing.Optional[Item]' = None) -> None:
+        """Remove an item from the index.
+
+        Postings aren't indexed by document, so without the indexed item
+        to re-tokenize every posting list is scanned for the key.
+        """
+        entry = self._docs.pop(key, None)
+        if entry is None:
+            return
+        length, doc_hash = entry
+        self._total_length -= length
+        self._signature ^= doc_hash
+        if item is not None and _doc_hash(key, item.name(), item.description()) == doc_hash:
+            terms = set(tokenize(item.name())) | set(tokenize(item.description()))
+        else:
+            terms = list(self._postings.keys())
+        for term in terms:
+            docs = self._postings.get(term, None)
+            if docs is not None and docs.pop(key, None) is not None and len(docs) == 0:
+                del self._postings[term]
+
+    def search(self, query: str, limit: 'typing.Optional[int]' = 10) -> 'List[Tuple[str, float]]':
+        """Get the keys of the items best matching a query, with their scores.
+
+        Results are ordered by descending score, then key.
+        """
+        n = len(self._docs)
+        if n == 0:
+            return list()
+        average_length = self._total_length / n
+        scores = dict()  # type: Dict[str, float]
+        for term in set(tokenize(query)):
+            docs = self._postings.get(term, None)
+            if docs is None:
+                continue
+            idf = math.log(1.0 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for key, frequency in docs.items():
+                length = self._docs[key][0]
+                norm = SearchIndex.K1 * (1.0 - SearchIndex.B + SearchIndex.B * length / average_length)
+                scores[key] = scores.get(key, 0.0) + idf * frequency * (SearchIndex.K1 + 1.0) / (frequency + norm)
+        ranked = sorted(scores.items(), key=lambda entry: (-entry[1], entry[0]))
+        return ranked if limit is None else ranked[:limit]
+
+    def to_json(self) -> 'Dict[str, Any]':
+        return {
+            "version": Version,
+            "name_boost": self._name_boost,
+            "signature": self._signature,
+            "docs": {key: list(entry) for key, entry in self._docs.items()},
+            "postings": self._postings,
+        }
+
+    @staticmethod
+    def from_json(json_data: 'Dict[str, Any]') -> 'SearchIndex':
+        if json_data.get("version", None) != Version:
+            raise ValueError("Unsupported search index version {}".format(json_data.get("version", None)))
+        index = SearchIndex(json_data["name_boost"])
+        index._docs = {key: (float(length), int(doc_hash)) for key, (length, doc_hash) in json_data["docs"].items()}
+        index._postings = {term: dict(docs) for term, docs in json_data["postings"].items()}
+        index._total_length = sum(entry[0] for entry in index._docs.values())
+        for _, doc_hash in index._docs.values():
+            index._signature ^= doc_hash
+        if index._signature != json_data["signature"]:
+            raise ValueError("Search index signature mismatch")
+        return index
+
+    def save(self, filename: str) -> None:
+        with open(filename, "w", encoding="utf-8") as fp:
+            json.dump(self.to_json(), fp, separators=(",", ":"))
+
+    @staticmethod
+    def load(filename: str) -> 'SearchIndex':
+        with open(filename, "r", encoding="utf-8") as fp:
+            return SearchIndex.from_json(json.load(fp))
+
+
+def signature(items: 'Iterable[Item]') -> int:
+    """Compute the signature a SearchIndex of these items would have."""
+    result = 0
+    for i in items:
+        result ^= _doc_hash(i.key(), i.name(), i.description())
+    return result
@@ -0,0 +1,73 @@
+
+import io
+
+import pytest
+
+from dnd.item import Category, Item, Money
+
+
+def _item(key, gp, weight):
+    return Item(key, Item.Item, key.split('.')[-1], value=Money({'gp': gp}), weight=weight)
+
+
+def _tree():
+    root = Category("All")
+    for i in (_item("gear.rope", 1, 10), _item("gear.shelter.tent", 2, 20), _item("gear.shelter.tarp", 3, 5),
+              _item("weapon.club", 0, 3)):
+        root.add(i, i.categories())
+    return root
+
+
+def test_aggregates():
+    root = _tree()
+    assert root.count() == 4
+    assert root.total_value() == Money({'gp': 6})
+    assert root.total_weight() == 38
+    shelter = root["gear"]["shelter"]
+    assert shelter.count() == 2
+    assert shelter.average_value() == Money({'gp': 2, 'sp': 50})
+    assert shelter.average_weight() == 12.5
+
+
+def test_aggregates_after_remove():
+    root = _tree()
+    tent = root.find("gear.shelter").items()[0]
+    root.remove(tent, tent.categories())
+    assert root.count() == 3
+    assert root.find("gear").total_value() == Money({'gp': 4})
+    assert root.find("gear.shelter").total_weight() == 5
+
+
+def test_find():
+    root = _tree()
+    assert root.find("") is root
+    assert root.find("gear.shelter") is root["gear"]["shelter"]
+    assert root["gear"].find("shelter").path() == "gear.shelter"
+    with pytest.raises(KeyError):
+        root.find("gear.missing")
+
+
+def test_build_str_details():
+    root = _tree()
+    lines = root.find("gear.shelter").build_str(details=True).split("\n")
+    assert lines[0] == "shelter: 2 items, 5 gp, 25.0 lbs"
+    assert lines[1] == "  tent - 2 gp, 20.0 lbs"
+    assert str(root).split("\n")[:3] == ["All:", "  gear:", "    rope"]
+
+
+def test_iter_lines_depth_and_filters():
+    root = _tree()
+    assert list(root.iter_lines(max_depth=1)) == ["All:", "  gear:", "  weapon:"]
+    assert list(root.iter_lines(max_depth=0)) == ["All:"]
+    lines = list(root.iter_lines(item_filter=lambda i: i.weight() >= 10,
+                                 category_filter=lambda c: c.name() != "weapon"))
+    assert lines == ["All:", "  gear:", "    rope", "    shelter:", "      tent"]
+
+
+def test_render_matches_build_str():
+    root = _tree()
+    fp = io.StringIO()
+    assert root.render(fp, details=True) == 8
+    assert fp.getvalue() == root.build_str(details=True) + "\n"
+    assert str(root) == "\n".join(["All:", "  gear:", "    rope", "    shelter:", "      tent", "      tarp",
+                                   "  weapon:", "    club"])
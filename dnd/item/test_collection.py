@@ -0,0 +1,136 @@
+
+import pytest
+
+from dnd.item import Collection, Item, ItemRef, Money
+
+
+def _collection():
+    c = Collection()
+    c.register(Item("gear.rope_hemp", Item.Item, "Rope, hemp", value=Money({'gp': 1}), weight=10, source="PHB"))
+    c.register(Item("gear.rope_silk", Item.Item, "Rope, silk", value=Money({'gp': 10}), weight=5, source="PHB"))
+    c.register(Item("gear.shelter.tent", Item.Item, "Tent", value=Money({'gp': 2}), weight=20, source="PHB"))
+    c.register(Item("gear.ration", Item.Item, "Rations", value=Money({'sp': 5}), weight=2, source="DMG"))
+    return c
+
+
+def _keys(items):
+    return [i.key() for i in items]
+
+
+def test_register_stores_item():
+    c = _collection()
+    assert c.all()["gear.ration"].name() == "Rations"
+
+
+def test_query_name_prefix():
+    c = _collection()
+    assert _keys(c.query(name="ROPE")) == ["gear.rope_hemp", "gear.rope_silk"]
+    assert _keys(c.query(name="r")) == ["gear.ration", "gear.rope_hemp", "gear.rope_silk"]
+    assert c.query(name="z") == []
+
+
+def test_query_ranges_and_source():
+    c = _collection()
+    assert _keys(c.query(min_value=Money({'gp': 2}))) == ["gear.rope_silk", "gear.shelter.tent"]
+    assert _keys(c.query(max_weight=5)) == ["gear.ration", "gear.rope_silk"]
+    assert _keys(c.query(source="DMG")) == ["gear.ration"]
+
+
+def test_query_combined():
+    c = _collection()
+    assert _keys(c.query(name="rope", max_value=Money({'gp': 5}), source="PHB")) == ["gear.rope_hemp"]
+    assert _keys(c.query(category="gear.shelter", min_weight=10)) == ["gear.shelter.tent"]
+    assert c.query(category="weapons") == []
+    assert len(c.query()) == 4
+
+
+def test_query_unknown_argument():
+    with pytest.raises(KeyError):
+        _collection().query(colour="red")
+
+
+def test_register_replace():
+    c = _collection()
+    tent = Item("gear.shelter.tent", Item.Item, "Pavilion", value=Money({'gp': 20}), weight=40, source="DMG")
+    assert c.register(tent) == (False, "Item with key=gear.shelter.tent already exists in Item.All")
+    assert c.register(tent, replace=True) == (True, None)
+    assert c.all()["gear.shelter.tent"] is tent
+    assert c.category().find("gear.shelter").items() == [tent]
+    assert c.category().total_weight() == 57
+    assert c.query(name="tent") == []
+    assert _keys(c.query(name="pav", source="DMG")) == ["gear.shelter.tent"]
+
+
+def test_unregister():
+    c = _collection()
+    c.search_index()
+    rope = c.unregister("gear.rope_hemp")
+    assert rope.name() == "Rope, hemp"
+    assert c.unregister("gear.rope_hemp") is None
+    assert "gear.rope_hemp" not in c.all()
+    assert c.category().count() == 3
+    assert _keys(c.query(name="rope")) == ["gear.rope_silk"]
+    assert "gear.rope_hemp" not in c.search_index()
+
+
+def test_batch_register_unregister():
+    c = Collection()
+    items = [Item("gear.torch{}".format(i), Item.Item, "Torch", value=Money({'cp': 1}), weight=1) for i in range(50)]
+    results = c.register_many(items + items[:1])
+    assert all(status for status, _ in results[:50])
+    assert not results[50][0]
+    assert c.category().find("gear").count() == 50
+    removed = c.unregister_many(["gear.torch{}".format(i) for i in range(0, 50, 2)] + ["missing"])
+    assert removed[-1] is None
+    assert len(c.all()) == 25
+    assert c.category().count() == 25
+    assert len(c.index()) == 25
+
+
+def test_batch_register_index():
+    c = _collection()
+    first = Item("gear.lamp", Item.Item, "Lamp", value=Money({'sp': 1}), weight=1)
+    second = Item("gear.lamp", Item.Item, "Lantern", value=Money({'gp': 7}), weight=3)
+    c.register_many([first, second], replace=True)
+    assert len(c.index()) == 5
+    assert c.query(name="lamp") == []
+    assert _keys(c.query(name="lan")) == ["gear.lamp"]
+    assert _keys(c.query(min_value=Money({'gp': 5}))) == ["gear.lamp", "gear.rope_silk"]
+
+
+def test_register_one_at_a_time():
+    c = Collection()
+    n = 3000
+    for i in range(n):
+        j = (i * 7919) % n
+        c.register_record({"key": "gear.item{}".format(j), "name": "Item {}".format(j), "value": {"cp": j % 90},
+                           "weight": j % 7})
+    assert len(c.index()) == n
+    for sorted_index in (c.index()._names, c.index()._values, c.index()._weights):
+        assert sorted_index._entries == sorted(sorted_index._entries)
+    assert len(c.query(min_value=Money({'cp': 89}), max_value=Money({'cp': 89}))) == len(range(89, n, 90))
+    assert _keys(c.query(name="Item 2999")) == ["gear.item2999"]
+
+
+def test_lazy_collection_lru():
+    c = Collection(lazy=True, cache_size=2)
+    for name in ("Rope", "Tent", "Torch"):
+        c.register_record({"key": "gear." + name.lower(), "name": name, "value": {"sp": 1}, "weight": 1})
+    assert _keys(c.query(max_value=Money({'sp': 1}))) == ["gear.rope", "gear.tent", "gear.torch"]
+    assert type(c.all()["gear.rope"]) is ItemRef
+    assert c.category().find("gear").count() == 3
+    rope = c.get("gear.rope")
+    assert c.get("gear.rope") is rope
+    c.get("gear.tent")
+    c.get("gear.torch")
+    assert c.get("gear.rope") is not rope
+    assert c.get("gear.rope").value() == Money({'sp': 1})
+
+
+def test_lazy_collection_invalid_record():
+    c = Collection(lazy=True)
+    with pytest.raises(KeyError):
+        c.register_record({"name": "No key"})
+    c.register_record({"key": "gear.bad", "type": "Spaceship"})
+    with pytest.raises(KeyError):
+        c.get("gear.bad")
@@ -0,0 +1,102 @@
+
+import json
+
+import pytest
+
+from dnd.item import Collection, Money
+from dnd.item import diff
+
+
+def _old():
+    return [
+        {"key": "gear.rope", "name": "Rope", "value": {"gp": 1}, "weight": 10},
+        {"key": "gear.tent", "name": "Tent", "value": {"gp": 10}, "weight": 20},
+        {"key": "gear.torch", "name": "Torch", "value": {"cp": 1}, "weight": 1},
+    ]
+
+
+def _new():
+    return [
+        {"key": "gear.torch", "name": "Torch", "value": {"cp": 1}, "weight": 1.0},
+        {"key": "gear.tent", "name": "Tent", "value": {"gp": 12}, "weight": 20, "desc": "Sleeps two."},
+        {"key": "gear.lantern", "name": "Lantern", "value": {"gp": 7}, "weight": 3},
+    ]
+
+
+def test_diff():
+    changes = list(diff.diff(_old(), _new()))
+    assert [(c.key(), c.kind()) for c in changes] == [
+        ("gear.lantern", diff.Added), ("gear.rope", diff.Removed), ("gear.tent", diff.Changed),
+    ]
+    assert changes[2].fields() == {"value": ({"gp": 10}, {"gp": 12}), "description": ("", "Sleeps two.")}
+
+
+def test_diff_presorted_checks_order():
+    with pytest.raises(ValueError):
+        list(diff.diff(_old(), _new(), presorted=True))
+    assert list(diff.diff(_old(), _old(), presorted=True)) == []
+
+
+def _collection():
+    c = Collection()
+    for record in _old():
+        c.register_record(dict(record))
+    return c
+
+
+def test_merge_clean():
+    c = _collection()
+    report = diff.merge(c, diff.diff(_old(), _new()))
+    assert len(report.applied) == 3
+    assert sorted(c.all().keys()) == ["gear.lantern", "gear.tent", "gear.torch"]
+    assert c.get("gear.tent").description() == "Sleeps two."
+
+
+def test_merge_reuses_changes():
+    changes = list(diff.diff(_old(), _new()))
+    diff.merge(_collection(), changes)
+    assert [ch.new()["value"] for ch in changes if ch.new() is not None] == [{"gp": 7}, {"gp": 12}]
+    c = _collection()
+    diff.merge(c, changes)
+    assert c.get("gear.tent").value() == Money({"gp": 12})
+    assert c.get("gear.lantern").value() == Money({"gp": 7})
+
+
+def test_merge_conflict_policies():
+    changes = list(diff.diff(_old(), _new()))
+
+    def edited():
+        c = _collection()
+        c.register_record({"key": "gear.tent", "name": "Pavilion", "value": {"gp": 10}, "weight": 20}, replace=True)
+        return c
+
+    with pytest.raises(ValueError):
+        diff.merge(edited(), changes)
+
+    c = edited()
+    report = diff.merge(c, changes, policy='ours', remove=False)
+    assert [ch.key() for ch in report.conflicts] == ["gear.tent"]
+    assert c.get("gear.tent").name() == "Pavilion"
+    assert "gear.rope" in c.all()
+
+    c = edited()
+    diff.merge(c, changes, policy='theirs')
+    assert c.get("gear.tent").name() == "Tent"
+
+    c = edited()
+    diff.merge(c, changes, policy=lambda change, current: dict(change.new(), name=current["name"]))
+    assert c.get("gear.tent").name() == "Pavilion"
+    assert c.get("gear.tent").description() == "Sleeps two."
+
+
+def test_main(tmp_path, capsys):
+    old = tmp_path / "old.json"
+    new = tmp_path / "new.json"
+    old.write_text(json.dumps({"version": 1, "items": _old()}), encoding="utf-8")
+    new.write_text(json.dumps({"items": _new()}), encoding="utf-8")
+    assert diff.main([str(old), str(new)]) == 1
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(d["key"], d["change"]) for d in lines] == [
+        ("gear.lantern", "added"), ("gear.rope", "removed"), ("gear.tent", "changed"),
+    ]
+    assert diff.main([str(new), str(new)]) == 0
@@ -0,0 +1,45 @@
+
+import pytest
+
+from dnd.item import Item, ItemRef
+from dnd.item import item as item_
+
+
+def test_item_shares_category_path():
+    a = Item("gear.shelter.tent", Item.Item, "Tent", source="".join(["P", "HB"]))
+    b = Item("gear.shelter.tarp", Item.Item, "Tarp", source="".join(["PH", "B"]))
+    assert a.categories() == ("gear", "shelter")
+    assert a.categories() is b.categories()
+    assert a.source() is b.source()
+    assert a.key(False) == "tent"
+    assert Item("rope", Item.Item, "Rope").categories() == ()
+
+
+def test_category_path_cache_is_bounded():
+    for i in range(item_._CategoryPathCacheSize + 100):
+        item_.category_path("cat{}.item".format(i))
+    assert item_._category_path.cache_info().currsize <= item_._CategoryPathCacheSize
+
+
+def test_item_has_no_dict():
+    i = Item("gear.rope", Item.Item, "Rope")
+    with pytest.raises(AttributeError):
+        i.colour = "red"
+
+
+def test_item_ref_matches_item():
+    ref = ItemRef({"key": "gear.shelter.tent", "name": "Tent", "value": {"gp": 2}, "weight": 20})
+    i = ref.materialize()
+    assert ref.categories() is i.categories()
+    assert ref.key(False) == i.key(False) == "tent"
+    assert ref.value() == i.value()
+    assert ref.value() is not ref.value()
+    assert not hasattr(ref, "_value")
+    assert ref.get().value() is ref.value()
+    assert ref.type() == i.type() == Item.Item
+    assert ref.to_json() == i.to_json()
+
+    ref = ItemRef({"key": "gear.soap", "description": "Lye.", "source": "PHB", "consumable": None})
+    assert ref.to_json() == ref.materialize().to_json()
+    with pytest.raises(KeyError):
+        ItemRef({"key": "gear.cannon", "type": "Siege"}).type()
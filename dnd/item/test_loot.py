@@ -0,0 +1,44 @@
+
+import collections
+import random
+
+import pytest
+
+from dnd.item import Collection, Item, Money
+from dnd.item import loot
+
+
+def _collection():
+    c = Collection()
+    for i, gp in enumerate((1, 2, 5, 10, 90)):
+        c.register(Item("gear.thing{}".format(i), Item.Item, "Thing {}".format(i), value=Money({'gp': gp})))
+    c.register(Item("weapon.club", Item.Item, "Club", value=Money({'gp': 1})))
+    return c
+
+
+def test_alias_table_distribution():
+    table = loot.AliasTable([1, 2, 7])
+    rand = random.Random(5)
+    counts = collections.Counter(table.draw(rand) for _ in range(20000))
+    assert abs(counts[2] / 20000 - 0.7) < 0.02
+    assert abs(counts[0] / 20000 - 0.1) < 0.02
+    with pytest.raises(ValueError):
+        loot.AliasTable([0, 0])
+
+
+def test_draw_filters_and_is_seedable():
+    c = _collection()
+    a = loot.LootGenerator(c, rand=random.Random(1)).draw(50, category="gear", max_value=Money({'gp': 5}))
+    b = loot.LootGenerator(c, rand=random.Random(1)).draw(50, category="gear", max_value=Money({'gp': 5}))
+    assert [i.key() for i in a] == [i.key() for i in b]
+    assert {i.key() for i in a} == {"gear.thing0", "gear.thing1", "gear.thing2"}
+    assert loot.LootGenerator(c).draw(3, category="armor") == []
+
+
+def test_weighted_draw_and_invalidation():
+    c = _collection()
+    generator = loot.LootGenerator(c, rand=random.Random(2), weight=lambda i: float(i.value()))
+    draws = generator.draw(1000, min_value=Money({'gp': 10}))
+    assert sum(1 for i in draws if i.key() == "gear.thing4") > 850
+    c.register(Item("gear.crown", Item.Item, "Crown", value=Money({'pp': 100})))
+    assert "gear.crown" in {i.key() for i in generator.draw(100, min_value=Money({'gp': 10}))}
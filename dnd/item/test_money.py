@@ -152,3 +152,16 @@ def test_money_init_numeric_negative():
         money.Money(-0.01)
     with pytest.raises(ValueError):
         money.Money(-0.001)
+
+
+def test_money_from_str():
+    assert money.Money("15gp") == money.Money({'gp': 15})
+    assert money.Money("1 pp 2 sp 3cp").json() == {'pp': 1, 'sp': 2, 'cp': 3}
+    with pytest.raises(ValueError):
+        money.Money("15 dollars")
+
+
+def test_money_total_cp():
+    assert money.Money("1pp 2gp 3sp 4cp").total_cp() == 100000 + 20000 + 300 + 4
+    assert money.Money({'cp': 7}).total_cp() == 7
+    assert money.Money().total_cp() == 0
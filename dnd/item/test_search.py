@@ -0,0 +1,64 @@
+
+import os
+
+import pytest
+
+from dnd.item import Collection, Item
+from dnd.item import search
+
+
+def _item(key, name, description):
+    return Item(key, Item.Item, name, description=description)
+
+
+def _collection():
+    c = Collection()
+    c.register(_item("gear.rope_hemp", "Rope, hemp", "Fifty feet of sturdy hemp rope."))
+    c.register(_item("gear.grappling_hook", "Grappling Hook", "An iron hook, thrown while tied to ropes."))
+    c.register(_item("gear.bedroll", "Bedroll", "Two woolen sheets sewn together for sleeping."))
+    return c
+
+
+def test_tokenize():
+    assert search.tokenize("The Ropes, tied to hooks!") == ["rope", "tied", "hook"]
+    assert search.tokenize("torches and lanterns") == ["torch", "lantern"]
+    assert search.stem("glass") == "glass"
+    assert search.stem("berries") == "berry"
+
+
+def test_search_ranks_name_matches_first():
+    c = _collection()
+    assert [i.key() for i in c.search("rope")] == ["gear.rope_hemp", "gear.grappling_hook"]
+    assert [i.key() for i in c.search("sleeping sheet")] == ["gear.bedroll"]
+    assert c.search("sword") == []
+
+
+def test_search_incremental():
+    c = _collection()
+    c.search_index()
+    c.register(_item("gear.rope_silk", "Rope, silk", "Fifty feet of silk rope."))
+    assert "gear.rope_silk" in [i.key() for i in c.search("silk")]
+    c.search_index().remove("gear.rope_silk")
+    assert c.search("silk") == []
+    assert c.search_index().signature() == search.signature(_collection().all().values())
+
+
+def test_search_save_load(tmp_path):
+    c = _collection()
+    filename = os.path.join(str(tmp_path), "search.json")
+    c.search_index().save(filename)
+    loaded = search.SearchIndex.load(filename)
+    assert loaded.search("rope") == c.search_index().search("rope")
+
+    fresh = _collection()
+    assert fresh.set_search_index(loaded)
+    assert fresh.search_index() is loaded
+    fresh.register(_item("gear.tent", "Tent", "A canvas tent."))
+    assert not _collection().set_search_index(fresh.search_index())
+
+
+def test_search_load_rejects_corrupt_data():
+    data = _collection().search_index().to_json()
+    data["signature"] += 1
+    with pytest.raises(ValueError):
+        search.SearchIndex.from_json(data)
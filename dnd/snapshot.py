@@ -0,0 +1,274 @@
+
+import struct
+
+from dnd.actor import Actor
+from dnd.variable import Attribute
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from typing import Any, List, Sequence, Tuple
+
+
+# The snapshot schema. Fields are stored in exactly this order, so new
+# fields may only be added in a new version. Version 2 added each actor's
+# typed attribute modifiers after its fields; version 1 snapshots, which
+# have none, can still be read.
+Version = 2
+_Versions = (1, 2)
+Fields = (
+    'init_mod', 'init_roll', 'max_dex_mod', 'speed',
+    'hp.max', 'hp.current', 'hp.temp',
+    'mp.max', 'mp.current', 'mp.temp',
+    'str.level', 'str.racial', 'str.enhance', 'str.spell',
+    'dex.level', 'dex.racial', 'dex.enhance', 'dex.spell',
+    'con.level', 'con.racial', 'con.enhance', 'con.spell',
+    'int.level', 'int.racial', 'int.enhance', 'int.spell',
+    'wis.level', 'wis.racial', 'wis.enhance', 'wis.spell',
+    'cha.level', 'cha.racial', 'cha.enhance', 'cha.spell',
+)
+
+_Magic = b'DNDS'
+_Header = struct.Struct('<4sHI')
+_NameLength = struct.Struct('<H')
+# Every field is a 16 bit signed integer, which comfortably fits any hp
+# total or attribute score while keeping each actor to a few dozen bytes.
+_Values = struct.Struct('<{}h'.format(len(Fields)))
+# Typed modifiers: a count, then for each the attribute index and value,
+# followed by the source and bonus type as length-prefixed utf-8 strings.
+_ModifierCount = struct.Struct('<H')
+_Modifier = struct.Struct('<Bh')
+_TypeLength = struct.Struct('<B')
+
+_AttributeKeys = ('str', 'dex', 'con', 'int', 'wis', 'cha')
+_PointsMembers = ('_max', '_current', '_temp')
+_AttributeMembers = ('_level', '_racial', '_enhance', '_spell')
+_BuiltinSources = (Attribute._RacialSource, Attribute._EnhanceSource, Attribute._SpellSource)
+
+# Maps the slot part of a field name to the private member holding it and
+# the public (notifying) setter.
+_Slots = {
+    'max': ('_max', 'max'),
+    'current': ('_current', 'current'),
+    'temp': ('_temp', 'temp'),
+    'level': ('_level', 'level'),
+    'racial': ('_racial', 'racial'),
+    'enhance': ('_enhance', 'enhancement'),
+    'spell': ('_spell', 'spell'),
+}
+
+
+def _peek(actor: 'Actor', key: str) -> 'Any':
+    # Reading a spawned actor's fields shouldn't create its variables, so
+    # unchanged ones are read from the template's prototypes instead
+    return actor._peek(key)
+
+
+def state(actor: 'Actor') -> 'Tuple[int, ...]':
+    """Get the values of all snapshot fields of an actor, in Fields order."""
+    hp, mp = _peek(actor, 'hp'), _peek(actor, 'mp')
+    values = [
+        actor._init_mod, actor._init_roll, actor._max_dex_mod, actor._speed._value,
+        hp._max, hp._current, hp._temp,
+        mp._max, mp._current, mp._temp,
+    ]
+    for key in _AttributeKeys:
+        a = _peek(actor, key)
+        values.extend((a._level, a._racial, a._enhance, a._spell))
+    return tuple(values)
+
+
+def _store(actor: 'Actor', key: str, members: 'Sequence[str]', values: 'Sequence[int]') -> None:
+    if dict.get(actor._attributes, key, None) is None:
+        baseline = _peek(actor, key)
+        if all(getattr(baseline, m) == v for m, v in zip(members, values)):
+            return  # Still the template baseline
+    variable = actor._attributes[key]
+    for member, value in zip(members, values):
+        setattr(variable, member, value)
+    # Typed modifiers are dropped here and re-added by _set_modifiers().
+    # The built-in sources are rebuilt from the fields on demand.
+    if isinstance(variable, Attribute):
+        variable._modifiers = None
+
+
+def _set_state(actor: 'Actor', values: 'Sequence[int]') -> None:
+    actor._init_mod, actor._init_roll, actor._max_dex_mod, actor._speed._value = values[0:4]
+    _store(actor, 'hp', _PointsMembers, values[4:7])
+    _store(actor, 'mp', _PointsMembers, values[7:10])
+    index = 10
+    for key in _AttributeKeys:
+        _store(actor, key, _AttributeMembers, values[index:index + 4])
+        index += 4
+
+
+def modifiers(actor: 'Actor') -> 'List[Tuple[str, Any, str, int]]':
+    """Get the typed modifiers of an actor's attributes, other than racial/enhance/spell.
+
+    :return: A (attribute key, source, type, value) tuple for each modifier
+    """
+    result = list()
+    for key in _AttributeKeys:
+        a = _peek(actor, key)
+        if a._modifiers is None:
+            continue
+        for source, (type_, value) in a._modifiers.sources().items():
+            if source not in _BuiltinSources:
+                result.append((key, source, type_, value))
+    return result
+
+
+def modifier_total(actor: 'Actor', key: str) -> int:
+    """Get how much typed modifiers change an attribute, beyond its fields.
+
+    This is current() less the level, racial, enhance and spell fields.
+    """
+    a = _peek(actor, key)
+    if a._modifiers is None:
+        return 0
+    return a.current() - a._level - a._racial - a._enhance - a._spell
+
+
+def _set_modifiers(actor: 'Actor', entries: 'Sequence[Tuple[str, Any, str, int]]') -> None:
+    for key, source, type_, value in entries:
+        actor._attributes[key].modifiers().add(source, type_, value, False)
+
+
+def get_field(actor: 'Actor', field: str) -> 'Any':
+    """Get a single field by name, e.g. 'hp.current' or 'name'."""
+    if field == 'name':
+        return actor._name.get()
+    if field == 'speed':
+        return actor._speed.get()
+    if '.' not in field:
+        return getattr(actor, '_' + field)
+    key, slot = field.split('.')
+    return getattr(_peek(actor, key), _Slots[slot][0])
+
+
+def set_field(actor: 'Actor', field: str, value: 'Any', notify: bool = True) -> None:
+    """Set a single field by name.
+
+    If notify is True the field is set through its public setter, which
+    notifies listeners; otherwise it is written directly.
+    """
+    if field == 'name':
+        if notify:
+            actor._name.set(value)
+        else:
+            actor._name._value = str(value)
+    elif field == 'speed':
+        if notify:
+            actor._speed.set(value)
+        else:
+            actor._speed._value = int(value)
+    elif field == 'init_roll' and notify:
+        actor.initiative(value)
+    elif '.' not in field:
+        setattr(actor, '_' + field, int(value))
+        if notify:
+            actor.notify()
+    else:
+        key, slot = field.split('.')
+        member, setter = _Slots[slot]
+        if notify:
+            getattr(actor._attributes[key], setter)(int(value))
+        else:
+            setattr(actor._attributes[key], member, int(value))
+
+
+def _pack_str(value: str, length: 'struct.Struct') -> bytes:
+    data = value.encode('utf-8')
+    return length.pack(len(data)) + data
+
+
+def _unpack_str(data: bytes, offset: int, length: 'struct.Struct') -> 'Tuple[str, int]':
+    (size,) = length.unpack_from(data, offset)
+    offset += length.size
+    return data[offset:offset + size].decode('utf-8'), offset + size
+
+
+def snapshot(actors: 'Sequence[Actor]') -> bytes:
+    """Encode the state of a group of actors into a compact binary snapshot.
+
+    Typed modifiers (Attribute.add_modifier) are stored along with the
+    fields. Their sources must be strings.
+    """
+    parts = [_Header.pack(_Magic, Version, len(actors))]
+    for actor in actors:
+        with actor.lock():
+            name = actor._name.get()
+            values = state(actor)
+            entries = modifiers(actor)
+        try:
+            parts.append(_pack_str(name, _NameLength))
+            parts.append(_Values.pack(*values))
+            parts.append(_ModifierCount.pack(len(entries)))
+            for key, source, type_, value in entries:
+                if not isinstance(source, str):
+                    raise ValueError("Actor {} has a modifier from {} on {}, only string sources can be stored in a "
+                                     "snapshot".format(repr(name), repr(source), key))
+                parts.append(_Modifier.pack(_AttributeKeys.index(key), value))
+                parts.append(_pack_str(source, _NameLength))
+                parts.append(_pack_str(type_, _TypeLength))
+        except struct.error:
+            raise ValueError("Actor {} has a value which can not be stored in a snapshot".format(repr(name)))
+    return b''.join(parts)
+
+
+def _decode(data: bytes) -> 'List[Tuple[str, Tuple[int, ...], List[Tuple[str, str, str, int]]]]':
+    magic, version, count = _Header.unpack_from(data, 0)
+    if magic != _Magic:
+        raise ValueError("Data is not an actor snapshot")
+    if version not in _Versions:
+        raise ValueError("Unsupported snapshot version {}".format(version))
+    offset = _Header.size
+    result = list()
+    for _ in range(count):
+        name, offset = _unpack_str(data, offset, _NameLength)
+        values = _Values.unpack_from(data, offset)
+        offset += _Values.size
+        entries = list()  # type: List[Tuple[str, str, str, int]]
+        if version >= 2:
+            (modifier_count,) = _ModifierCount.unpack_from(data, offset)
+            offset += _ModifierCount.size
+            for _ in range(modifier_count):
+                index, value = _Modifier.unpack_from(data, offset)
+                offset += _Modifier.size
+                source, offset = _unpack_str(data, offset, _NameLength)
+                type_, offset = _unpack_str(data, offset, _TypeLength)
+                entries.append((_AttributeKeys[index], source, type_, value))
+        result.append((name, values, entries))
+    if offset != len(data):
+        raise ValueError("Trailing data in snapshot")
+    return result
+
+
+def restore(actors: 'Sequence[Actor]', data: bytes, notify: bool = False) -> None:
+    """Restore a snapshot into the actors it was taken from.
+
+    Values are written directly, without firing any variable listeners.
+    The actors' typed modifiers are replaced by those in the snapshot.
+    If notify is True each actor's own listeners are notified once after
+    its state has been restored.
+    """
+    records = _decode(data)
+    if len(records) != len(actors):
+        raise ValueError("Snapshot holds {} actors, got {}".format(len(records), len(actors)))
+    for actor, (name, values, entries) in zip(actors, records):
+        with actor.lock():
+            actor._name._value = name
+            _set_state(actor, values)
+            _set_modifiers(actor, entries)
+            if notify:
+                actor.notify()
+
+
+def load(data: bytes) -> 'List[Actor]':
+    """Create new actors from a snapshot."""
+    result = list()
+    for name, values, entries in _decode(data):
+        actor = Actor(name=name)
+        _set_state(actor, values)
+        _set_modifiers(actor, entries)
+        result.append(actor)
+    return result
@@ -0,0 +1,191 @@
+
+import collections
+
+from dnd import snapshot
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from typing import Any, Callable, Deque, Dict, Tuple
+    from dnd.actor import Actor
+    Patch = Dict[str, Any]
+
+# The fields mirrored to clients, by index. Besides the snapshot fields
+# each attribute has a 'modifiers' field holding the net effect of its
+# typed modifiers (see snapshot.modifier_total), so that its current
+# value is level + racial + enhance + spell + modifiers.
+_ModifierKeys = ('str', 'dex', 'con', 'int', 'wis', 'cha')
+_ModifierFields = tuple('{}.modifiers'.format(key) for key in _ModifierKeys)
+Fields = ('name',) + snapshot.Fields + _ModifierFields
+
+# Log entries for an actor being added or removed use these field indices
+_Added = -1
+_Removed = -2
+
+
+def _state(actor: 'Actor') -> 'Tuple[Any, ...]':
+    return ((actor._name.get(),) + snapshot.state(actor) +
+            tuple(snapshot.modifier_total(actor, key) for key in _ModifierKeys))
+
+
+class DeltaEngine(object):
+    """Tracks changes to actors so remote displays can be sent patches.
+
+    Every change to a tracked actor is diffed against the last state seen
+    for it and recorded in a bounded log under a new version number. A
+    client that has acknowledged version v is sent only the fields which
+    changed after v, with repeated changes to a field coalesced. Once the
+    log no longer reaches back to a client's version, the client is sent
+    a full snapshot instead.
+
+    Patches are plain dicts which encode to compact JSON:
+
+        {"v": 12, "set": {"3": {"hp.current": 4}}, "add": {...}, "del": [5]}
+        {"v": 12, "full": {"3": {"name": "Goblin 1", "hp.current": 4, ...}}}
+
+    Field names are those in Fields, actors are identified by the id
+    returned from track().
+    """
+    def __init__(self, history: int = 4096) -> None:
+        self._history = history
+        self._version = 0
+        self._oldest = 0  # Clients at or after this version can be sent a delta
+        self._log = collections.deque()  # type: Deque[Tuple[int, int, int, Any]]
+        self._actors = dict()  # type: Dict[int, Tuple[Actor, Callable[[Actor], None]]]
+        self._states = dict()  # type: Dict[int, Tuple[Any, ...]]
+        self._ids = dict()  # type: Dict[int, int]
+        self._next_id = 1
+        self._acked = dict()  # type: Dict[Any, int]
+
+    def version(self) -> int:
+        return self._version
+
+    def _append(self, actor_id: int, field: int, value: 'Any') -> None:
+        self._log.append((self._version, actor_id, field, value))
+        while len(self._log) > self._history:
+            self._oldest = self._log.popleft()[0]
+
+    def track(self, actor: 'Actor') -> int:
+        """Start mirroring an actor, returning the id used for it in patches."""
+        if id(actor) in self._ids:
+            return self._ids[id(actor)]
+        actor_id = self._next_id
+        self._next_id += 1
+        self._ids[id(actor)] = actor_id
+        self._states[actor_id] = _state(actor)
+        self._version += 1
+        self._append(actor_id, _Added, None)
+
+        def listener(a: 'Actor') -> None:
+            self._changed(actor_id, a)
+        self._actors[actor_id] = (actor, listener)
+        actor.add_listener(listener)
+        return actor_id
+
+    def untrack(self, actor: 'Actor') -> None:
+        actor_id = self._ids.pop(id(actor))
+        actor.remove_listener(self._actors.pop(actor_id)[1])
+        del self._states[actor_id]
+        self._version += 1
+        self._append(actor_id, _Removed, None)
+
+    def _changed(self, actor_id: int, actor: 'Actor') -> None:
+        old_state = self._states.get(actor_id, None)
+        if old_state is None:
+            return
+        new_state = _state(actor)
+        if new_state == old_state:
+            return
+        self._states[actor_id] = new_state
+        self._version += 1
+        for index, (old_value, new_value) in enumerate(zip(old_state, new_state)):
+            if old_value != new_value:
+                self._append(actor_id, index, new_value)
+
+    def full(self) -> 'Patch':
+        """Get a full snapshot of every tracked actor."""
+        return {
+            "v": self._version,
+            "full": {str(actor_id): dict(zip(Fields, state)) for actor_id, state in self._states.items()},
+        }
+
+    def patch(self, since: int) -> 'Patch':
+        """Get the changes made after version since.
+
+        Falls back to a full snapshot if the log doesn't reach back that far.
+        """
+        if since < self._oldest or since > self._version:
+            return self.full()
+
+        # Walk back from the newest entry; the first value seen for a field
+        # is the newest, so older ones are skipped.
+        changes = dict()  # type: Dict[int, Dict[str, Any]]
+        added = set()
+        removed = set()
+        for version, actor_id, field, value in reversed(self._log):
+            if version <= since:
+                break
+            if field == _Removed:
+                removed.add(actor_id)
+            elif field == _Added:
+                added.add(actor_id)
+            elif actor_id not in removed:
+                changes.setdefault(actor_id, dict()).setdefault(Fields[field], value)
+
+        result = {"v": self._version}  # type: Patch
+        # Added actors are sent whole, since the client has never seen them
+        new_actors = {
+            str(actor_id): dict(zip(Fields, self._states[actor_id])) for actor_id in added if actor_id not in removed
+        }
+        updates = {str(actor_id): fields for actor_id, fields in changes.items() if actor_id not in added}
+        dead = sorted(actor_id for actor_id in removed if actor_id not in added)
+        if len(updates) > 0:
+            result["set"] = updates
+        if len(new_actors) > 0:
+            result["add"] = new_actors
+        if len(dead) > 0:
+            result["del"] = dead
+        return result
+
+    def connect(self, client: 'Any') -> 'Patch':
+        """Register a client and get the full snapshot it should start from."""
+        self._acked[client] = self._version
+        return self.full()
+
+    def disconnect(self, client: 'Any') -> None:
+        self._acked.pop(client, None)
+
+    def pending(self, client: 'Any') -> 'Patch':
+        """Get the patch for everything a client hasn't acknowledged yet."""
+        return self.patch(self._acked[client])
+
+    def ack(self, client: 'Any', version: int) -> None:
+        if version > self._acked[client]:
+            self._acked[client] = version
+
+
+class Mirror(object):
+    """The client side of a DeltaEngine: applies patches to a local copy."""
+    def __init__(self) -> None:
+        self._version = 0
+        self._actors = dict()  # type: Dict[str, Dict[str, Any]]
+
+    def version(self) -> int:
+        return self._version
+
+    def actors(self) -> 'Dict[str, Dict[str, Any]]':
+        return self._actors
+
+    def apply(self, patch: 'Patch') -> int:
+        """Apply a patch and return the version to acknowledge."""
+        full = patch.get("full", None)
+        if full is not None:
+            self._actors = {actor_id: dict(fields) for actor_id, fields in full.items()}
+        else:
+            for actor_id in patch.get("del", list()):
+                self._actors.pop(str(actor_id), None)
+            for actor_id, fields in patch.get("add", dict()).items():
+                self._actors[actor_id] = dict(fields)
+            for actor_id, fields in patch.get("set", dict()).items():
+                self._actors[actor_id].update(fields)
+        self._version = patch["v"]
+        return self._version
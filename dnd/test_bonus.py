@@ -0,0 +1,94 @@
+
+import random
+
+from dnd import bonus
+from dnd import variable
+
+
+def test_modifier_set_same_type_does_not_stack():
+    mods = bonus.ModifierSet()
+    mods.add("belt", "enhancement", 4)
+    mods.add("spell", "enhancement", 2)
+    assert mods.total() == 4
+    mods.remove("belt")
+    assert mods.total() == 2
+    mods.add("rage", "morale", 2)
+    assert mods.total() == 4
+
+
+def test_modifier_set_stacking_types_and_penalties():
+    mods = bonus.ModifierSet()
+    mods.add("dodge feat", "dodge", 1)
+    mods.add("haste", "dodge", 1)
+    mods.add("a", "untyped", 2)
+    mods.add("b", "untyped", 1)
+    mods.add("fatigue", "untyped", -2)
+    mods.add("poison", "alchemical", -1)
+    mods.add("bless", "alchemical", -1)
+    assert mods.total() == 1 + 1 + 2 + 1 - 2 - 1 - 1
+    assert mods.bonus("dodge") == 2
+
+
+def test_modifier_set_replace_source():
+    mods = bonus.ModifierSet()
+    mods.add("ring", "deflection", 1)
+    mods.add("ring", "deflection", 3)
+    assert mods.total() == 3
+    assert mods.get("ring") == ("deflection", 3)
+    mods.add("ring", "deflection", 2)
+    assert mods.total() == 2
+    assert len(mods) == 1
+
+
+def test_modifier_set_matches_recompute():
+    rand = random.Random(7)
+    mods = bonus.ModifierSet()
+    types = ("enhancement", "morale", "luck", "dodge", "untyped")
+    for _ in range(5000):
+        source = rand.randrange(60)
+        if rand.random() < 0.3:
+            mods.remove(source)
+        else:
+            mods.add(source, rand.choice(types), rand.randint(-3, 8))
+        assert mods.total() == mods.recompute()
+
+
+def test_modifier_set_listener():
+    calls = list()
+    mods = bonus.ModifierSet(lambda m, old, new: calls.append((old, new)))
+    mods.add("a", "luck", 2)
+    mods.add("b", "luck", 1)
+    mods.remove("a")
+    assert calls == [(0, 2), (2, 1)]
+
+
+def test_attribute_modifiers():
+    calls = list()
+    attribute = variable.Attribute(14, racial=2, enhance=2, listener=lambda *args: calls.append(args[1:]))
+    assert attribute.current() == 18
+    attribute.modifiers()
+    assert attribute.current() == 18
+
+    assert attribute.add_modifier("belt", "enhancement", 4) == 20
+    assert calls[-1] == (18, 20, "modifiers")
+    attribute.enhancement(6)
+    assert attribute.current() == 22
+    attribute.spell(1)
+    assert attribute.add_modifier("heroism", "morale", 2) == 25
+    assert attribute.remove_modifier("belt") == 25
+    attribute.enhancement(0)
+    assert attribute.current() == 19
+    assert attribute.mod() == 4
+
+
+def test_attribute_fields_stay_source_of_truth():
+    attribute = variable.Attribute(12, racial=2)
+    attribute.add_modifier('rage', 'morale', 4)
+    assert attribute.current() == 18
+    # Direct field writes (as snapshot.restore() does) are picked up
+    attribute._racial = 0
+    attribute._enhance = 2
+    assert attribute.current() == 18
+    assert attribute.modifiers().get(variable.Attribute._RacialSource) == ('racial', 0)
+    attribute.remove_modifier('rage')
+    assert attribute.current() == 14
@@ -0,0 +1,70 @@
+
+import pytest
+
+from dnd.actor import Template
+from dnd.branch import Branch
+
+
+def test_branch_leaves_live_state_alone():
+    goblin, = Template("Goblin", hp=10).spawn(1)
+    branch = Branch()
+    assert branch.damage(goblin, 4) == 6
+    assert branch.get(goblin, 'hp.current') == 6
+    assert goblin.hp().current() == 10
+
+
+def test_forks_share_and_diverge():
+    a, b = Template("Orc", hp=20).spawn(2)
+    base = Branch()
+    base.damage(a, 5)
+    fireball = base.fork()
+    sleep = base.fork()
+    fireball.damage(a, 8)
+    fireball.damage(b, 8)
+    assert fireball.get(a, 'hp.current') == 7
+    assert sleep.get(a, 'hp.current') == 15
+    assert sleep.get(b, 'hp.current') == 20
+    # Writing to the base after forking doesn't leak into the forks
+    base.heal(a, 5)
+    assert base.get(a, 'hp.current') == 20
+    assert fireball.get(a, 'hp.current') == 7
+
+
+def test_deep_forks_are_flattened():
+    actor, = Template("Troll", hp=100).spawn(1)
+    branch = Branch()
+    for _ in range(Branch.MaxDepth * 3):
+        branch.damage(actor, 1)
+        branch = branch.fork()
+        assert branch.depth() <= Branch.MaxDepth + 2
+    assert branch.get(actor, 'hp.current') == 100 - Branch.MaxDepth * 3
+
+
+def test_commit_applies_with_one_notification():
+    a, b = Template("Kobold", hp=8).spawn(2)
+    a.hp().temp(2)
+    calls = list()
+    a.add_listener(calls.append)
+    calls.clear()
+    branch = Branch().fork()
+    branch.damage(a, 5)
+    branch.set(a, 'str.spell', 2)
+    branch.commit()
+    assert a.hp().temp() == 0
+    assert a.hp().current() == 5
+    assert a.strength().spell() == 2
+    assert b.hp().current() == 8
+    assert calls == [a]
+
+
+def test_commit_detects_conflicts():
+    actor, = Template("Ogre", hp=30).spawn(1)
+    branch = Branch()
+    branch.damage(actor, 10)
+    actor.hp().dec_current(3)
+    assert branch.conflicts() == [(actor, 'hp.current')]
+    with pytest.raises(ValueError):
+        branch.commit()
+    assert actor.hp().current() == 27
+    branch.commit(check=False)
+    assert actor.hp().current() == 20
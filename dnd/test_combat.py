@@ -0,0 +1,71 @@
+
+import random
+
+import pytest
+
+from dnd import combat
+from dnd.actor import Actor, Template
+from dnd.roll import Roll
+
+
+def test_area_damage_saves_and_resistance():
+    a, b, c = Template("Goblin", hp=20).spawn(3)
+    c.hp().temp(5)
+    result = combat.area_damage([a, b, c], 12, saved={b}, resistances={c: 5})
+    assert [t.applied() for t in result] == [12, 6, 7]
+    assert a.hp().current() == 8
+    assert b.hp().current() == 14
+    assert c.hp().temp() == 0
+    assert c.hp().current() == 18
+    assert result.total() == 25
+    assert result.saved() == [b]
+
+
+def test_area_damage_evasion_and_downed():
+    a, b = Template("Kobold", hp=5).spawn(2)
+    result = combat.area_damage([a, b], 8, saved=lambda actor: actor is b, evasion=True)
+    assert result.downed() == [a]
+    assert b.hp().current() == 5
+
+
+def test_area_damage_one_notification_per_actor():
+    actors = Template("Orc", hp=30).spawn(4)
+    calls = list()
+    for actor in actors:
+        actor.add_listener(calls.append)
+        actor.hp().temp(2)
+    calls.clear()
+    combat.area_damage(actors, Roll(8, 6), rand=random.Random(3))
+    assert calls == actors
+
+
+def test_area_damage_per_target_rolls():
+    actors = [Actor(name=str(i)) for i in range(40)]
+    for actor in actors:
+        actor.hp().max(100)
+        actor.hp().current(100)
+    shared = combat.area_damage(actors, Roll(10, 6), rand=random.Random(1))
+    assert len({t.rolled() for t in shared}) == 1
+    separate = combat.area_damage(actors, Roll(10, 6), per_target=True, rand=random.Random(1))
+    assert len({t.rolled() for t in separate}) > 1
+
+
+def test_area_damage_negative_amount():
+    a, b = Template("Goblin", hp=6).spawn(2)
+    with pytest.raises(ValueError):
+        combat.area_damage([a, b], -3)
+    assert [a.hp().value(), b.hp().value()] == [6, 6]
+    result = combat.area_damage([a, b], Roll(1, 4, add=-10), rand=random.Random(0))
+    assert [t.applied() for t in result] == [0, 0]
+    assert a.hp().temp() == 0
+
+
+def test_area_heal():
+    a, b = Template("Cleric", hp=10).spawn(2)
+    a.hp().dec_current(7)
+    result = combat.area_heal([a, b], 5)
+    assert a.hp().current() == 8
+    assert b.hp().current() == 10
+    assert [t.applied() for t in result] == [5, 0]
+    with pytest.raises(ValueError):
+        combat.area_heal([a], 5, saved={a})
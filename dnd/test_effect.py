@@ -0,0 +1,133 @@
+
+import pytest
+
+from dnd.actor import Actor, Template
+from dnd.effect import Effect, EffectScheduler
+from dnd.tracker import Tracker
+
+
+def _actor(name: str, roll: int) -> 'Actor':
+    actor = Actor(name=name)
+    actor.initiative(roll)
+    return actor
+
+
+def test_effect_round_expiry():
+    scheduler = EffectScheduler()
+    actor = Actor(name="Fighter")
+    scheduler.start_round(1)
+    scheduler.add(Effect(actor, 'str', 'enhancement', 4, 2, name="Bull's Strength"))
+    scheduler.add(Effect(actor, 'hp', 'temp', 5, 1))
+    assert actor.strength().current() == 14
+    assert actor.hp().temp() == 5
+    assert len(scheduler) == 2
+
+    actor.hp().damage(3)
+    scheduler.start_round(2)
+    assert actor.hp().temp() == 0
+    assert actor.hp().current() == 10
+    assert actor.strength().current() == 14
+    scheduler.start_round(3)
+    assert actor.strength().current() == 10
+    assert len(scheduler) == 0
+
+
+def test_effect_cancel():
+    scheduler = EffectScheduler()
+    actor = Actor(name="Fighter")
+    effect = scheduler.add(Effect(actor, 'dex', 'spell', 2, 10))
+    scheduler.cancel(effect)
+    assert actor.dexterity().current() == 10
+    assert len(scheduler) == 0
+    scheduler.start_round(20)
+    assert actor.dexterity().current() == 10
+
+
+def test_effect_invalid():
+    actor = Actor()
+    with pytest.raises(ValueError):
+        Effect(actor, 'hp', 'spell', 2, 1)
+    with pytest.raises(ValueError):
+        Effect(actor, 'str', 'temp', 2, 1)
+    with pytest.raises(ValueError):
+        Effect(actor, 'str', 'spell', 2, 0)
+
+
+def test_effect_expires_on_anchor_turn():
+    wizard, fighter, orc = _actor("wizard", 18), _actor("fighter", 12), _actor("orc", 5)
+    tracker = Tracker()
+    for actor in (wizard, fighter, orc):
+        tracker.add(actor)
+    scheduler = EffectScheduler()
+    scheduler.attach(tracker)
+    expired = list()
+    scheduler.add_listener(expired.append)
+
+    assert tracker.start() is wizard
+    haste = scheduler.add(Effect(fighter, 'dex', 'spell', 2, 1, anchor=wizard))
+    tracker.advance()
+    tracker.advance()
+    assert fighter.dexterity().spell() == 2
+    assert tracker.advance() is wizard
+    assert tracker.round() == 2
+    assert fighter.dexterity().spell() == 0
+    assert expired == [haste]
+
+
+def test_effect_missing_anchor_expires_next_round():
+    caster, target = _actor("caster", 18), _actor("target", 5)
+    tracker = Tracker()
+    tracker.add(caster)
+    tracker.add(target)
+    scheduler = EffectScheduler()
+    scheduler.attach(tracker)
+    tracker.start()
+    scheduler.add(Effect(target, 'str', 'spell', 2, 1, anchor=caster))
+    tracker.remove(caster)
+    tracker.advance()
+    tracker.advance()
+    assert tracker.round() == 2
+    assert target.strength().spell() == 2
+    tracker.advance()
+    assert tracker.round() == 3
+    assert target.strength().spell() == 0
+
+
+def test_effect_many():
+    scheduler = EffectScheduler()
+    actors = Template("Soldier", hp=10).spawn(100)
+    for index, actor in enumerate(actors):
+        for duration in range(1, 6):
+            scheduler.add(Effect(actor, 'str', 'spell', 1, duration + index % 3))
+    assert len(scheduler) == 500
+    for round_ in range(1, 10):
+        scheduler.start_round(round_)
+    assert len(scheduler) == 0
+    assert all(a.strength().spell() == 0 for a in actors)
+
+
+def test_effect_triggered_actor_turns():
+    a, b, c = _actor("a", 15), _actor("b", 10), _actor("c", 5)
+    tracker = Tracker()
+    for actor in (a, b, c):
+        tracker.add(actor)
+    scheduler = EffectScheduler()
+    scheduler.attach(tracker)
+    turns = list()
+    tracker.add_listener(lambda t: turns.append(t.current()))
+
+    tracker.start()
+    tracker.ready()
+    tracker.advance()
+    shield = scheduler.add(Effect(c, 'dex', 'spell', 2, 1, anchor=a))
+    assert tracker.trigger(a) is a
+    assert turns[-1] is a
+    assert c.dexterity().spell() == 2
+    assert tracker.advance() is c
+    assert tracker.advance() is b
+    assert tracker.round() == 2
+    assert c.dexterity().spell() == 2
+    # The triggered action moved a to just before c, and the effect ends there
+    assert tracker.advance() is a
+    assert c.dexterity().spell() == 0
+    assert not shield.active()
@@ -0,0 +1,79 @@
+
+from dnd import instrument
+from dnd import variable
+from dnd.actor import Actor
+
+
+def test_profiling_disabled_by_default():
+    assert instrument.active is None
+    calls = list()
+    v = variable.IntVar(1, listener=lambda *args: calls.append(args))
+    v.set(2)
+    assert len(calls) == 1
+    assert instrument.active is None
+
+
+def test_profiling_records_variable_listeners():
+    calls = list()
+
+    def listener(var, old, new, note):
+        calls.append((old, new))
+
+    v = variable.IntVar(1, listener=listener)
+    with instrument.profiling() as profiler:
+        v.set(2)
+        v.set(3)
+    assert instrument.active is None
+    assert calls == [(1, 2), (2, 3)]
+
+    report = profiler.report()
+    assert len(report) == 1
+    assert report[0].listener() is listener
+    assert report[0].calls() == 2
+    assert report[0].max_depth() == 1
+    assert report[0].max_fan_out() == 1
+    assert report[0].total_time() >= report[0].max_time() >= 0.0
+
+
+def test_profiling_records_actor_depth():
+    seen = list()
+    actor = Actor(name="Lyra")
+    actor.add_listener(lambda a: seen.append(a))
+    seen.clear()
+
+    with instrument.profiling() as profiler:
+        actor.hp().dec_current(3)
+
+    assert seen == [actor]
+    assert profiler.dispatches() == 2
+    assert profiler.max_depth() == 2
+    depths = sorted(s.max_depth() for s in profiler.report())
+    assert depths == [1, 2]
+
+
+def test_profiling_restores_previous_profiler():
+    outer = instrument.Profiler()
+    with instrument.profiling(outer):
+        with instrument.profiling() as inner:
+            assert instrument.active is inner
+        assert instrument.active is outer
+    assert instrument.active is None
+
+
+def test_profiling_bound_methods_share_stats():
+    class Watcher(object):
+        def __init__(self):
+            self.count = 0
+
+        def update(self, var, old, new, note):
+            self.count += 1
+
+    w = variable.IntVar(0)
+    watcher = Watcher()
+    w.add_listener(watcher.update)
+    with instrument.profiling() as profiler:
+        for i in range(5):
+            w.set(i)
+    assert watcher.count == 5
+    assert [s.calls() for s in profiler.report()] == [5]
+    assert "Watcher.update" in profiler.format_report()
@@ -0,0 +1,222 @@
+
+import io
+import json
+import marshal
+import os
+
+import pytest
+
+from dnd import io as dnd_io
+from dnd import item
+
+_DataDir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+
+def test_iter_json_array_small_chunks():
+    data = '{"version": {"a": [1, 2]}, "players": [ 12345 , "a,]b", {"k": [true, null]} ], "tail": 1}'
+    for chunk_size in (1, 2, 3, 7, 1024):
+        values = list(dnd_io.iter_json_array(io.StringIO(data), "players", chunk_size))
+        assert values == [12345, "a,]b", {"k": [True, None]}]
+
+
+def test_iter_json_array_missing_key():
+    assert list(dnd_io.iter_json_array(io.StringIO('{"other": []}'), "players")) == []
+    assert list(dnd_io.iter_json_array(io.StringIO('{}'), "players")) == []
+
+
+def test_iter_json_array_invalid():
+    with pytest.raises(ValueError):
+        list(dnd_io.iter_json_array(io.StringIO('[1, 2]'), "players"))
+    with pytest.raises(ValueError):
+        list(dnd_io.iter_json_array(io.StringIO('{"players": [1, 2'), "players"))
+
+
+def test_roster_is_lazy(tmp_path):
+    players = [
+        {"name": "NPC {}".format(i), "hp": {"max": 10 + i, "current": 5}, "str": {"level": 12, "racial": 2}}
+        for i in range(100)
+    ]
+    filename = str(tmp_path / "save.json")
+    with open(filename, "w") as fp:
+        json.dump({"players": players}, fp)
+
+    with dnd_io.load_save(filename) as roster:
+        assert roster.materialized() == 0
+        npc = roster[3]
+        assert roster.materialized() == 1
+        assert len(roster._records) == 4
+        assert npc._name.get() == "NPC 3"
+        assert npc.hp().max() == 13
+        assert npc.hp().current() == 5
+        assert npc.strength().current() == 14
+        assert roster[3] is npc
+        assert len(roster) == 100
+        assert roster.materialized() == 1
+        assert roster.record(99)["name"] == "NPC 99"
+
+
+def test_roster_rejects_non_object(tmp_path):
+    filename = str(tmp_path / "save.json")
+    with open(filename, "w") as fp:
+        json.dump({"players": [{"name": "Lyra"}, None, {"name": "Borin"}]}, fp)
+
+    roster = dnd_io.load_save(filename)
+    assert roster.record(0)["name"] == "Lyra"
+    with pytest.raises(ValueError):
+        len(roster)
+
+
+def test_roster_sample_save():
+    roster = dnd_io.load_save(os.path.join(_DataDir, "save.json"))
+    players = list(roster)
+    assert len(players) == 1
+    lyra = players[0]
+    assert lyra._name.get() == "Lyra Al'Thor"
+    assert lyra.hp().current() == 90
+    assert lyra.dexterity().current() == 18
+    assert lyra.speed().get() == 30
+
+
+def test_file_data_lazy_items():
+    eager = dnd_io.FileData()
+    eager._log = list()
+    eager.load_filename(os.path.join(_DataDir, "items.json"))
+    lazy = dnd_io.FileData(lazy=True)
+    lazy._log = list()
+    lazy.load_filename(os.path.join(_DataDir, "items.json"))
+
+    assert lazy.items.all().keys() == eager.items.all().keys()
+    assert str(lazy.items.category()) == str(eager.items.category())
+    assert lazy.items.category().total_value() == eager.items.category().total_value()
+    key = "gear.shelter.bedroll"
+    assert type(lazy.items.all()[key]) is not type(eager.items.all()[key])
+    assert lazy.items.get(key).to_json() == eager.items.get(key).to_json()
+    assert lazy.items.get(key) is lazy.items.get(key)
+
+
+def _write_catalog(tmp_path, count):
+    filename = os.path.join(str(tmp_path), "catalog.json")
+    records = [{"key": "gear.item{}".format(i), "name": "Ítem {}".format(i), "value": {"cp": i % 90}, "weight": 1}
+               for i in range(count)]
+    records.append({"key": "gear.item0", "name": "Duplicate"})
+    with open(filename, "w", encoding="utf-8") as fp:
+        json.dump({"version": 1, "items": records, "extra": [1, 2]}, fp, ensure_ascii=False)
+    return filename
+
+
+def test_file_data_load_stream(tmp_path):
+    filename = _write_catalog(tmp_path, 250)
+    data = dnd_io.FileData()
+    data._log = list()
+    calls = list()
+    assert data.load_stream(filename, progress=lambda *args: calls.append(args), progress_every=100, chunk_size=512)
+    assert len(data.items.all()) == 250
+    assert len(data._log) == 1
+    assert [c[0] for c in calls] == [100, 200, 251]
+    assert calls[-1][1] == calls[-1][2] == os.path.getsize(filename)
+    assert all(c[1] <= c[2] for c in calls)
+
+    eager = dnd_io.FileData()
+    eager._log = list()
+    eager.load_filename(filename)
+    assert str(eager.items.category()) == str(data.items.category())
+
+
+def test_file_data_load_stream_logs_bad_records(tmp_path):
+    filename = _write_items(tmp_path, "bad.json", [{"key": "gear.rope"}, None, {"key": "gear.ship", "type": "Ship"},
+                                                   {"key": "gear.tent"}])
+    data = dnd_io.FileData()
+    data._log = list()
+    assert data.load_stream(filename, progress_every=3)
+    assert sorted(data.items.all().keys()) == ["gear.rope", "gear.tent"]
+    assert len(data._log) == 2
+    assert "item 1" in data._log[0] and "item 2" in data._log[1]
+
+
+def test_file_data_load_stream_cancel(tmp_path):
+    filename = _write_catalog(tmp_path, 250)
+    data = dnd_io.FileData()
+    token = dnd_io.CancelToken()
+
+    def progress(count, position, size):
+        if count >= 100:
+            token.cancel()
+    assert not data.load_stream(filename, progress=progress, progress_every=50, cancel=token)
+    assert len(data.items.all()) == 100
+
+
+def test_flatten_items():
+    records = dnd_io.flatten_items({"gear": {"camping": {"cot": {"name": "Cot", "value": "1gp"}}, "rope": {"weight": 10}}})
+    assert records == [{"key": "gear.camping.cot", "name": "Cot", "value": "1gp"}, {"key": "gear.rope", "weight": 10}]
+    with pytest.raises(ValueError):
+        dnd_io.flatten_items({"gear": ["cot"]})
+
+
+def test_load_yaml_items_cache(tmp_path, monkeypatch):
+    filename = os.path.join(str(tmp_path), "gear.yaml")
+    with open(os.path.join(_DataDir, "adventuring_gear.yaml"), "rb") as src, open(filename, "wb") as dst:
+        dst.write(src.read())
+
+    data = dnd_io.FileData()
+    data._log = list()
+    data.load_filename(filename)
+    assert sorted(os.listdir(str(tmp_path))) == ["gear.yaml", "gear.yaml.cache"]
+    assert data.items.get("gear.camping.bedroll").value() == item.Money({'sp': 1})
+    assert data.items.get("gear.camping.soap").consumable()
+    records = dnd_io.load_yaml_items(filename)
+
+    # With a valid cache yaml isn't needed at all, even after a touch
+    monkeypatch.setattr(dnd_io, "yaml", None)
+    assert dnd_io.load_yaml_items(filename) == records
+    os.utime(filename, ns=(0, 0))
+    assert dnd_io.load_yaml_items(filename) == records
+    # The touch is recorded, so the next load doesn't hash the file
+    monkeypatch.setattr(dnd_io, "_file_digest", None)
+    assert dnd_io.load_yaml_items(filename) == records
+    monkeypatch.undo()
+
+    # A cache of the wrong shape is a miss, not an error
+    with open(filename + ".cache", "wb") as fp:
+        marshal.dump(([1], []), fp)
+    assert dnd_io.load_yaml_items(filename) == records
+
+    monkeypatch.setattr(dnd_io, "yaml", None)
+    with open(filename, "ab") as fp:
+        fp.write(b"\n")
+    with pytest.raises(ImportError):
+        dnd_io.load_yaml_items(filename)
+
+
+def _write_items(tmp_path, name, records):
+    filename = os.path.join(str(tmp_path), name)
+    with open(filename, "w") as fp:
+        json.dump({"items": records}, fp)
+    return filename
+
+
+@pytest.mark.parametrize("processes", [0, 2])
+def test_file_data_load_filenames(tmp_path, processes):
+    first = _write_items(tmp_path, "a.json", [{"key": "gear.rope", "name": "Rope"}, {"key": "gear.tent", "name": "Tent"}])
+    second = _write_items(tmp_path, "b.json", [{"key": "gear.rope", "name": "Silk Rope"}, {"name": "No key"}])
+    broken = os.path.join(str(tmp_path), "c.json")
+    with open(broken, "w") as fp:
+        fp.write("{\"items\": [")
+    gear = os.path.join(str(tmp_path), "gear.yaml")
+    with open(os.path.join(_DataDir, "adventuring_gear.yaml"), "rb") as src, open(gear, "wb") as dst:
+        dst.write(src.read())
+
+    data = dnd_io.FileData()
+    report = data.load_filenames([first, second, broken, gear], processes=processes)
+    assert report.loaded == {first: 2, second: 0, gear: 18}
+    assert list(report.errors.keys()) == [broken]
+    assert report.conflicts == [("gear.rope", first, second)]
+    assert [(f, i) for f, i, _ in report.item_errors] == [(second, 1)]
+    assert data.items.get("gear.rope").name() == "Rope"
+    assert not report.ok()
+
+    data = dnd_io.FileData()
+    bad = _write_items(tmp_path, "d.json", [{"key": "gear.rope", "type": "Spaceship"}])
+    report = data.load_filenames([first, second, bad], processes=processes, replace=True)
+    assert data.items.get("gear.rope").name() == "Silk Rope"
+    assert report.conflicts == [("gear.rope", first, second)]
+    assert [(f, i) for f, i, _ in report.item_errors] == [(second, 1), (bad, 0)]
@@ -0,0 +1,129 @@
+
+import pytest
+
+from dnd import snapshot
+from dnd.actor import Actor, Template
+
+
+def _party():
+    a = Actor(name="Lyra", init_mod=2)
+    a.initiative(14)
+    a.hp().max(40)
+    a.hp().current(40)
+    a.hp().dec_current(12)
+    a.dexterity().racial(2)
+    b = Actor(name="Borin é")
+    b.strength().enhancement(4)
+    b.mp().temp(3)
+    return [a, b]
+
+
+def test_snapshot_roundtrip():
+    party = _party()
+    before = [snapshot.state(a) for a in party]
+    data = snapshot.snapshot(party)
+
+    party[0].hp().current(1)
+    party[1].strength().level(3)
+    party[1]._name.set("Changed")
+    calls = list()
+    for actor in party:
+        actor.add_listener(calls.append)
+    calls.clear()
+
+    snapshot.restore(party, data)
+    assert calls == []
+    assert [snapshot.state(a) for a in party] == before
+    assert party[1]._name.get() == "Borin é"
+
+    snapshot.restore(party, data, notify=True)
+    assert calls == party
+
+
+def test_snapshot_load():
+    party = _party()
+    loaded = snapshot.load(snapshot.snapshot(party))
+    assert [snapshot.state(a) for a in loaded] == [snapshot.state(a) for a in party]
+    assert loaded[0].hp().current() == 28
+
+
+def test_snapshot_template_actors():
+    goblins = Template("Goblin", hp=6).spawn(3)
+    data = snapshot.snapshot(goblins)
+    goblins[1].hp().dec_current(6)
+    snapshot.restore(goblins, data)
+    assert [g.hp().current() for g in goblins] == [6, 6, 6]
+
+
+def test_snapshot_restore_over_modifiers():
+    actor = Actor(name="Kara")
+    actor.strength().level(11)
+    actor.strength().racial(2)
+    actor.dexterity().add_modifier("haste", "dodge", 1)
+    data = snapshot.snapshot([actor])
+
+    actor.strength().racial(4)
+    actor.strength().add_modifier("rage", "morale", 4)
+    actor.dexterity().remove_modifier("haste")
+    assert actor.strength().current() == 19
+
+    snapshot.restore([actor], data)
+    assert actor.strength().racial() == 2
+    assert actor.strength().current() == 13
+    assert actor.strength().modifiers().get("rage") is None
+    assert actor.dexterity().modifiers().get("haste") == ("dodge", 1)
+    assert actor.dexterity().current() == 11
+    actor.strength().add_modifier("bless", "morale", 1)
+    assert actor.strength().current() == 14
+
+    loaded = snapshot.load(snapshot.snapshot([actor]))[0]
+    assert snapshot.modifiers(loaded) == snapshot.modifiers(actor)
+    assert loaded.strength().current() == 14
+
+
+def test_snapshot_modifier_errors():
+    actor = Actor(name="W")
+    actor.strength().add_modifier(("spell", 3), "morale", 2)
+    with pytest.raises(ValueError) as error:
+        snapshot.snapshot([actor])
+    assert "'W'" in str(error.value)
+
+
+def test_snapshot_reads_version_1():
+    party = _party()
+    # Version 1 is version 2 without the modifiers
+    v1 = snapshot._Header.pack(b'DNDS', 1, len(party))
+    for actor in party:
+        name = actor._name.get().encode('utf-8')
+        v1 += snapshot._NameLength.pack(len(name)) + name + snapshot._Values.pack(*snapshot.state(actor))
+    loaded = snapshot.load(v1)
+    assert [snapshot.state(a) for a in loaded] == [snapshot.state(a) for a in party]
+
+
+def test_snapshot_errors():
+    party = _party()
+    data = snapshot.snapshot(party)
+    with pytest.raises(ValueError):
+        snapshot.restore(party[:1], data)
+    with pytest.raises(ValueError):
+        snapshot.restore(party, b'XXXX' + data[4:])
+    with pytest.raises(ValueError):
+        snapshot.restore(party, data + b'\0')
+    party[0].hp().max(10 ** 6)
+    with pytest.raises(ValueError) as error:
+        snapshot.snapshot(party)
+    assert str(error.value).startswith("Actor 'Lyra' has")
+    with pytest.raises(ValueError) as error:
+        snapshot.snapshot([Actor(name="é" * 40000)])
+    assert "b'" not in str(error.value)
+
+
+def test_fields():
+    actor = _party()[0]
+    values = snapshot.state(actor)
+    for field, value in zip(snapshot.Fields, values):
+        assert snapshot.get_field(actor, field) == value
+    snapshot.set_field(actor, 'hp.current', 5)
+    snapshot.set_field(actor, 'dex.enhance', 2, notify=False)
+    assert actor.hp().current() == 5
+    assert actor.dexterity().enhancement() == 2
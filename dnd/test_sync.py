@@ -0,0 +1,103 @@
+
+import json
+import random
+
+from dnd import sync
+from dnd.actor import Actor, Template
+
+
+def _send(patch):
+    # Stand in for the network: patches must survive a JSON round trip
+    return json.loads(json.dumps(patch))
+
+
+def test_sync_patch_contains_only_changes():
+    engine = sync.DeltaEngine()
+    goblin = Actor(name="Goblin")
+    goblin_id = engine.track(goblin)
+    mirror = sync.Mirror()
+    engine.ack("ui", mirror.apply(_send(engine.connect("ui"))))
+
+    goblin.hp().dec_current(3)
+    goblin.hp().dec_current(2)
+    goblin.strength().inc_spell(2)
+    patch = engine.pending("ui")
+    assert patch == {"v": engine.version(), "set": {str(goblin_id): {"hp.current": 5, "str.spell": 2}}}
+
+    engine.ack("ui", mirror.apply(_send(patch)))
+    assert engine.pending("ui") == {"v": engine.version()}
+    assert mirror.actors() == engine.full()["full"]
+
+
+def test_sync_typed_modifiers():
+    engine = sync.DeltaEngine()
+    ogre = Actor(name="Ogre")
+    ogre_id = engine.track(ogre)
+    engine.connect("ui")
+
+    ogre.strength().add_modifier("bulls", "enhancement", 4)
+    assert ogre.strength().current() == 14
+    assert engine.pending("ui")["set"] == {str(ogre_id): {"str.modifiers": 4}}
+    ogre.strength().enhancement(2)
+    ogre.strength().remove_modifier("bulls")
+    assert engine.full()["full"][str(ogre_id)]["str.modifiers"] == 0
+
+
+def test_sync_add_and_remove():
+    engine = sync.DeltaEngine()
+    a, b, c = Actor(name="a"), Actor(name="b"), Actor(name="c")
+    engine.track(a)
+    mirror = sync.Mirror()
+    mirror.apply(_send(engine.full()))
+    since = engine.version()
+
+    b_id = engine.track(b)
+    engine.track(c)
+    c.hp().dec_current(1)
+    engine.untrack(c)
+    engine.untrack(a)
+    patch = engine.patch(since)
+    assert set(patch["add"].keys()) == {str(b_id)}
+    assert patch["del"] == [1]
+    assert "set" not in patch
+
+    mirror.apply(_send(patch))
+    assert mirror.actors() == engine.full()["full"]
+
+
+def test_sync_falls_back_to_full():
+    engine = sync.DeltaEngine(history=8)
+    actor = Actor(name="a")
+    engine.track(actor)
+    since = engine.version()
+    for i in range(20):
+        actor.hp().current(i)
+    assert "full" in engine.patch(since)
+    assert "full" not in engine.patch(engine.version() - 1)
+
+
+def test_sync_random_changes_converge():
+    rand = random.Random(42)
+    engine = sync.DeltaEngine(history=64)
+    actors = Template("Orc", hp=30).spawn(20)
+    for actor in actors:
+        engine.track(actor)
+    mirrors = {name: sync.Mirror() for name in ("fast", "slow")}
+    for name, mirror in mirrors.items():
+        engine.ack(name, mirror.apply(_send(engine.connect(name))))
+
+    for step in range(500):
+        actor = rand.choice(actors)
+        key = rand.choice(('hp', 'str', 'dex'))
+        if key == 'hp':
+            actor.hp().dec_current(rand.randint(1, 3))
+        else:
+            actor.attribute(key).inc_level(rand.randint(-1, 1) or 1)
+        engine.ack("fast", mirrors["fast"].apply(_send(engine.pending("fast"))))
+        if step % 97 == 0:
+            engine.ack("slow", mirrors["slow"].apply(_send(engine.pending("slow"))))
+
+    engine.ack("slow", mirrors["slow"].apply(_send(engine.pending("slow"))))
+    expected = engine.full()["full"]
+    assert mirrors["fast"].actors() == expected
+    assert mirrors["slow"].actors() == expected
@@ -0,0 +1,152 @@
+
+import random
+
+from dnd.actor import Actor, Template
+from dnd.tracker import Tracker
+
+
+def _actor(name: str, roll: int, dex: int = 10, init_mod: int = 0) -> 'Actor':
+    actor = Actor(name=name, init_mod=init_mod, max_dex_mod=10)
+    actor.dexterity().level(dex)
+    actor.initiative(roll)
+    return actor
+
+
+def _names(actors):
+    return [str(a._name) for a in actors]
+
+
+def test_tracker_order_and_tiebreaks():
+    t = Tracker()
+    a = _actor("a", 10)
+    b = _actor("b", 15)
+    c = _actor("c", 8, dex=14)   # total 10, dex +2 beats a
+    d = _actor("d", 12, init_mod=-2)  # total 10, dex 0, roll 12 beats a
+    for actor in (a, b, c, d):
+        t.add(actor)
+    assert _names(t.order()) == ["b", "c", "d", "a"]
+
+
+def test_tracker_rounds():
+    t = Tracker()
+    a, b = _actor("a", 10), _actor("b", 5)
+    t.add(a)
+    t.add(b)
+    assert t.round() == 0
+    assert t.start() is a
+    assert t.round() == 1
+    assert t.advance() is b
+    assert t.advance() is a
+    assert t.round() == 2
+
+
+def test_tracker_reorders_on_change():
+    t = Tracker()
+    a, b, c = _actor("a", 10), _actor("b", 5), _actor("c", 1)
+    for actor in (a, b, c):
+        t.add(actor)
+    t.start()
+    c.initiative(20)
+    # c already missed its chance this round, but pending order is updated
+    assert _names(t.order()) == ["a", "c", "b"]
+    b.dexterity().level(20)
+    b.initiative(18)
+    assert _names(t.order()) == ["a", "b", "c"]
+
+
+def test_tracker_remove():
+    t = Tracker()
+    a, b, c = _actor("a", 10), _actor("b", 5), _actor("c", 1)
+    for actor in (a, b, c):
+        t.add(actor)
+    t.start()
+    t.remove(b)
+    assert t.advance() is c
+    t.remove(c)
+    assert t.advance() is a
+    assert t.round() == 2
+    assert len(t) == 1
+
+
+def test_tracker_delay_and_resume():
+    t = Tracker()
+    a, b, c = _actor("a", 15), _actor("b", 10), _actor("c", 5)
+    for actor in (a, b, c):
+        t.add(actor)
+    assert t.start() is a
+    assert t.delay() is b
+    assert t.delayed() == [a]
+    assert t.resume(a) is a
+    assert t.current() is a
+    assert t.advance() is c
+    # a now acts between b and c
+    assert t.advance() is b
+    assert t.advance() is a
+    assert t.advance() is c
+
+
+def test_tracker_ready_and_trigger():
+    t = Tracker()
+    a, b, c = _actor("a", 15), _actor("b", 10), _actor("c", 5)
+    for actor in (a, b, c):
+        t.add(actor)
+    t.start()
+    assert t.ready() is b
+    assert t.advance() is c
+    calls = list()
+    t.add_listener(lambda tracker: calls.append(tracker.current()))
+    assert t.trigger(a) is a
+    assert t.current() is a
+    assert t.order() == [a, c, b]
+    assert t.advance() is c
+    assert calls == [a, c]
+    assert t.advance() is b
+    assert t.advance() is a
+    assert t.advance() is c
+    assert t.round() == 2
+
+
+def test_tracker_ready_lapses():
+    t = Tracker()
+    a, b = _actor("a", 15), _actor("b", 10)
+    t.add(a)
+    t.add(b)
+    t.start()
+    t.ready()
+    assert t.advance() is a
+    assert t.round() == 2
+    assert t.advance() is b
+
+
+def test_tracker_empty():
+    t = Tracker(random.Random(1))
+    assert t.advance() is None
+    assert t.round() == 0
+    assert t.start() is None
+    assert t.advance() is None
+    assert t.round() == 1
+
+
+def test_tracker_reads_spawned_actors_without_materializing():
+    goblins = Template("Goblin", dex=14, max_dex_mod=10).spawn(5)
+    t = Tracker(random.Random(7))
+    for goblin in goblins:
+        t.add(goblin)
+    t.start()
+    t.advance()
+    assert [g._attributes.materialized() for g in goblins] == [[]] * 5
+    assert goblins[0].initiative() == 2
+
+
+def test_tracker_mass_battle():
+    rand = random.Random(1234)
+    t = Tracker(rand)
+    actors = [Actor(name=str(i)) for i in range(3000)]
+    for actor in actors:
+        t.add(actor)
+    seen = {id(t.start())}
+    for _ in range(len(actors) - 1):
+        seen.add(id(t.advance()))
+        actors[rand.randrange(len(actors))].dexterity().inc_level()
+    assert len(seen) == len(actors)
+    assert t.round() == 1
@@ -0,0 +1,95 @@
+
+import sys
+import threading
+
+import pytest
+
+from dnd import variable
+from dnd.actor import Actor
+
+
+def _hammer(func, threads: int = 8, iterations: int = 2000) -> None:
+    old_interval = sys.getswitchinterval()
+    # Switch threads as often as possible to provoke lost updates
+    sys.setswitchinterval(1e-6)
+    try:
+        start = threading.Barrier(threads)
+
+        def worker():
+            start.wait()
+            for _ in range(iterations):
+                func()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+    finally:
+        sys.setswitchinterval(old_interval)
+
+
+def test_variable_unlocked_by_default():
+    v = variable.IntVar(0)
+    assert v.lock() is variable.NullLock
+    with v.lock():
+        v += 1
+    assert v.get() == 1
+
+
+def test_anyvar_update():
+    v = variable.IntVar(3, lock=variable.new_lock())
+    assert v.update(lambda x: x * 2) == 6
+    assert v.get() == 6
+
+
+def test_points_inc_temp_notifies_temp():
+    calls = list()
+    p = variable.Points(10, listener=lambda *args: calls.append(args[1:]))
+    p.inc_temp(5)
+    assert calls == [(0, 5, "temp")]
+
+
+def test_points_damage_rejects_negative():
+    p = variable.Points(10)
+    p.temp(3)
+    with pytest.raises(ValueError):
+        p.damage(-4)
+    assert (p.current(), p.temp()) == (10, 3)
+    assert p.damage(5) == 8
+    assert (p.current(), p.temp()) == (8, 0)
+
+
+def test_locked_intvar_no_lost_updates():
+    v = variable.IntVar(0, lock=variable.new_lock())
+
+    def inc():
+        v.__iadd__(1)
+    _hammer(inc)
+    assert v.get() == 8 * 2000
+
+
+def test_thread_safe_actor_no_lost_updates():
+    notifications = [0]
+    actor = Actor(name="Goblin", thread_safe=True)
+    actor.hp().max(10 ** 9)
+    actor.hp().current(0)
+    actor.add_listener(lambda a: notifications.__setitem__(0, notifications[0] + 1))
+    notifications[0] = 0
+
+    def update():
+        actor.hp().inc_current(1)
+        actor.strength().inc_level(1)
+        actor.dexterity().inc_spell(1)
+        with actor.lock():
+            actor.wisdom().inc_level(1)
+            actor.wisdom().dec_level(1)
+    _hammer(update)
+
+    total = 8 * 2000
+    assert actor.thread_safe()
+    assert actor.hp().current() == total
+    assert actor.strength().level() == 10 + total
+    assert actor.dexterity().spell() == total
+    assert actor.wisdom().level() == 10
+    assert notifications[0] == total * 5
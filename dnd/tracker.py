@@ -0,0 +1,373 @@
+
+import random
+
+from dnd import roll
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from typing import Callable, Dict, List, Optional, Tuple
+    from dnd.actor import Actor
+    InitiativeKey = Tuple[int, int, int, float]
+
+
+class _Entry(object):
+    """A single combatant's position in the tracker."""
+    __slots__ = ('actor', 'key', 'pinned', 'order', 'seq', 'heap', 'index', 'listener')
+
+    def __init__(self, actor: 'Actor', seq: int) -> None:
+        self.actor = actor
+        self.key = (0, 0, 0, 0.0)  # type: InitiativeKey
+        self.pinned = False
+        self.order = (0, 0, 0, 0.0, seq)  # type: Tuple[int, int, int, float, int]
+        self.seq = seq
+        self.heap = None  # type: Optional[_Heap]
+        self.index = -1
+        self.listener = None  # type: Optional[Callable[[Actor], None]]
+
+    def set_key(self, key: 'InitiativeKey') -> None:
+        self.key = key
+        # The heaps are min-heaps, so the order is the negated key. The
+        # sequence number keeps the order total and stable for exact ties.
+        self.order = (-key[0], -key[1], -key[2], -key[3], self.seq)
+
+
+class _Heap(object):
+    """A binary min-heap of entries which supports removal and reordering.
+
+    Every entry remembers its index in the heap, so remove() and update()
+    are O(log n) rather than requiring a linear search.
+    """
+    def __init__(self) -> None:
+        self._data = list()  # type: List[_Entry]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def entries(self) -> 'List[_Entry]':
+        return self._data
+
+    def peek(self) -> 'Optional[_Entry]':
+        return self._data[0] if len(self._data) > 0 else None
+
+    def push(self, entry: '_Entry') -> None:
+        entry.heap = self
+        entry.index = len(self._data)
+        self._data.append(entry)
+        self._sift_up(entry.index)
+
+    def pop(self) -> 'Optional[_Entry]':
+        if len(self._data) == 0:
+            return None
+        entry = self._data[0]
+        self.remove(entry)
+        return entry
+
+    def remove(self, entry: '_Entry') -> None:
+        index = entry.index
+        last = self._data.pop()
+        if last is not entry:
+            self._data[index] = last
+            last.index = index
+            self._sift_up(index)
+            self._sift_down(last.index)
+        entry.heap = None
+        entry.index = -1
+
+    def update(self, entry: '_Entry') -> None:
+        self._sift_up(entry.index)
+        self._sift_down(entry.index)
+
+    def _sift_up(self, index: int) -> None:
+        data = self._data
+        entry = data[index]
+        while index > 0:
+            parent_index = (index - 1) >> 1
+            parent = data[parent_index]
+            if entry.order >= parent.order:
+                break
+            data[index] = parent
+            parent.index = index
+            index = parent_index
+        data[index] = entry
+        entry.index = index
+
+    def _sift_down(self, index: int) -> None:
+        data = self._data
+        size = len(data)
+        entry = data[index]
+        while True:
+            child_index = 2 * index + 1
+            if child_index >= size:
+                break
+            right_index = child_index + 1
+            if right_index < size and data[right_index].order < data[child_index].order:
+                child_index = right_index
+            child = data[child_index]
+            if child.order >= entry.order:
+                break
+            data[index] = child
+            child.index = index
+            index = child_index
+        data[index] = entry
+        entry.index = index
+
+
+def initiative_key(actor: 'Actor') -> 'InitiativeKey':
+    """Get the sort key of an actor - higher keys act first.
+
+    Ties on the initiative total are broken by dexterity modifier, then
+    by the raw roll.
+    """
+    init_roll = actor.init_roll()
+    return init_roll + actor.initiative(), actor._peek('dex').mod(), init_roll, 0.0
+
+
+def _key_between(upper: 'Optional[InitiativeKey]', lower: 'Optional[InitiativeKey]') -> 'InitiativeKey':
+    if upper is None and lower is None:
+        return 0, 0, 0, 0.0
+    if lower is None:
+        return upper[0], upper[1], upper[2], upper[3] - 1.0
+    if upper is None or upper[:3] != lower[:3]:
+        return lower[0], lower[1], lower[2], lower[3] + 1.0
+    return lower[0], lower[1], lower[2], (upper[3] + lower[3]) / 2.0
+
+
+class Tracker(object):
+    """Keeps combatants in initiative order and tracks turns and rounds.
+
+    Combatants waiting to act in the current round and combatants who
+    have already acted are kept in two separate heaps, so adding,
+    removing or re-ordering a combatant is O(log n) and advancing the
+    turn is an O(log n) pop. When the waiting heap runs dry the heaps
+    are swapped and a new round begins.
+
+    The tracker listens to every actor it holds; when an actor's
+    initiative inputs change, only that actor's entry is re-sorted.
+
+    Delaying and readying follow the Pathfinder rules: a combatant who
+    delays is taken out of the order until they choose to resume(), and
+    a combatant who readies an action acts when it is trigger()ed. In
+    both cases their initiative is permanently moved to the point where
+    they acted.
+    """
+    _D20 = roll.Roll(1, 20)
+
+    def __init__(self, rand: 'Optional[random.Random]' = None) -> None:
+        self._rand = rand
+        self._entries = dict()  # type: Dict[int, _Entry]
+        self._pending = _Heap()
+        self._acted = _Heap()
+        self._delayed = dict()  # type: Dict[int, _Entry]
+        self._readied = dict()  # type: Dict[int, _Entry]
+        self._current = None  # type: Optional[_Entry]
+        self._interrupted = None  # type: Optional[_Entry]
+        self._last_key = None  # type: Optional[InitiativeKey]
+        self._round = 0
+        self._seq = 0
+        self._listeners = list()  # type: List[Callable[[Tracker], None]]
+
+    def add_listener(self, listener: 'Callable[[Tracker], None]') -> None:
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: 'Callable[[Tracker], None]') -> None:
+        self._listeners.remove(listener)
+
+    def notify(self) -> None:
+        for listener in self._listeners:
+            listener(self)
+
+    def round(self) -> int:
+        """Get the current round, or 0 if combat hasn't started."""
+        return self._round
+
+    def current(self) -> 'Optional[Actor]':
+        return self._current.actor if self._current is not None else None
+
+    def key(self, actor: 'Actor') -> 'InitiativeKey':
+        return self._entries[id(actor)].key
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, actor: 'Actor') -> bool:
+        return id(actor) in self._entries
+
+    def add(self, actor: 'Actor', roll_value: 'Optional[int]' = None) -> None:
+        """Add an actor to the tracker.
+
+        If no roll is given and the actor doesn't already have one, a d20
+        is rolled for them. An actor joining mid-round whose initiative
+        has already passed will first act in the next round.
+        """
+        if id(actor) in self._entries:
+            raise KeyError("Actor is already in the tracker")
+        if roll_value is None and actor.init_roll() == 0:
+            roll_value = Tracker._D20.roll(self._rand).value()
+
+        entry = _Entry(actor, self._seq)
+        self._seq += 1
+        self._entries[id(actor)] = entry
+
+        # Setting the roll may notify, so do it before we start listening
+        if roll_value is not None:
+            actor.initiative(roll_value)
+        entry.set_key(initiative_key(actor))
+        entry.listener = lambda a, e=entry: self._actor_changed(e)
+        actor.add_listener(entry.listener)
+
+        passed = self._current.order if self._current is not None else None
+        if passed is None and self._last_key is not None:
+            passed = (-self._last_key[0], -self._last_key[1], -self._last_key[2], -self._last_key[3], -1)
+        if self._round > 0 and passed is not None and entry.order < passed:
+            self._acted.push(entry)
+        else:
+            self._pending.push(entry)
+
+    def remove(self, actor: 'Actor') -> None:
+        entry = self._entries.pop(id(actor))
+        actor.remove_listener(entry.listener)
+        if entry.heap is not None:
+            entry.heap.remove(entry)
+        elif entry is self._current:
+            self._current = None
+        elif entry is self._interrupted:
+            self._interrupted = None
+        else:
+            self._delayed.pop(id(actor), None)
+            self._readied.pop(id(actor), None)
+
+    def _actor_changed(self, entry: '_Entry') -> None:
+        if entry.pinned:
+            return
+        key = initiative_key(entry.actor)
+        if key != entry.key:
+            entry.set_key(key)
+            if entry.heap is not None:
+                entry.heap.update(entry)
+
+    def start(self) -> 'Optional[Actor]':
+        """Start (or restart) combat at round 1 and return the first actor."""
+        for entry in (self._current, self._interrupted):
+            if entry is not None:
+                self._pending.push(entry)
+        self._current = self._interrupted = None
+        for entry in list(self._readied.values()) + list(self._acted.entries()):
+            if entry.heap is not None:
+                entry.heap.remove(entry)
+            self._pending.push(entry)
+        self._readied.clear()
+        self._round = 1
+        self._last_key = None
+        return self.advance()
+
+    def advance(self) -> 'Optional[Actor]':
+        """End the current turn and return the actor whose turn is next.
+
+        Returns None if there is nobody left to act, or if combat hasn't
+        started; the round is only advanced if someone can act in it. At
+        the end of a triggered action (see trigger()) the interrupted
+        actor's turn resumes.
+        """
+        if self._round == 0:
+            return None
+        if self._current is not None:
+            self._last_key = self._current.key
+            self._acted.push(self._current)
+            self._current = None
+        if self._interrupted is not None:
+            self._current, self._interrupted = self._interrupted, None
+            self.notify()
+            return self.current()
+
+        if len(self._pending) == 0:
+            if len(self._acted) == 0 and len(self._readied) == 0:
+                return None
+            self._new_round()
+        self._current = self._pending.pop()
+        self.notify()
+        return self.current()
+
+    def _new_round(self) -> None:
+        self._pending, self._acted = self._acted, self._pending
+        # A readied action lapses if it isn't triggered before the actor's
+        # next turn; they act normally at their original count.
+        for entry in self._readied.values():
+            self._pending.push(entry)
+        self._readied.clear()
+        self._last_key = None
+        self._round += 1
+
+    def delay(self) -> 'Optional[Actor]':
+        """The current actor delays; returns the next actor to act."""
+        if self._current is None:
+            raise ValueError("No current actor to delay")
+        entry, self._current = self._current, None
+        self._delayed[id(entry.actor)] = entry
+        return self.advance()
+
+    def ready(self) -> 'Optional[Actor]':
+        """The current actor readies an action; returns the next actor to act."""
+        if self._current is None:
+            raise ValueError("No current actor to ready an action")
+        entry, self._current = self._current, None
+        self._readied[id(entry.actor)] = entry
+        return self.advance()
+
+    def delayed(self) -> 'List[Actor]':
+        return [e.actor for e in self._delayed.values()]
+
+    def readied(self) -> 'List[Actor]':
+        return [e.actor for e in self._readied.values()]
+
+    def resume(self, actor: 'Actor') -> 'Actor':
+        """A delayed actor takes their turn now.
+
+        The current turn (if any) ends, and the delayed actor becomes the
+        current actor. Their initiative is moved to just after the actor
+        who last acted.
+        """
+        entry = self._delayed.pop(id(actor))
+        if self._current is not None:
+            self._last_key = self._current.key
+            self._acted.push(self._current)
+        next_entry = self._pending.peek()
+        entry.set_key(_key_between(self._last_key, next_entry.key if next_entry is not None else None))
+        entry.pinned = True
+        self._current = entry
+        self.notify()
+        return actor
+
+    def trigger(self, actor: 'Actor') -> 'Actor':
+        """A readied actor's trigger occurs and they act immediately.
+
+        The readied actor interrupts the current actor's turn and becomes
+        the current actor, so listeners see their turn start. Their
+        initiative is moved to just before the interrupted actor, whose
+        turn resumes at the next advance().
+        """
+        if self._interrupted is not None:
+            raise ValueError("A triggered action is already in progress")
+        entry = self._readied.pop(id(actor))
+        upper = self._last_key
+        lower = self._current.key if self._current is not None else None
+        if lower is None:
+            next_entry = self._pending.peek()
+            lower = next_entry.key if next_entry is not None else None
+        entry.set_key(_key_between(upper, lower))
+        entry.pinned = True
+        self._interrupted, self._current = self._current, entry
+        self.notify()
+        return actor
+
+    def order(self) -> 'List[Actor]':
+        """Get all combatants in the order they will act, starting with the
+        current actor and wrapping around into the next round.
+
+        Delayed actors are not included. This sorts the tracker, so it is
+        O(n log n) and intended for display.
+        """
+        result = [e.actor for e in (self._current, self._interrupted) if e is not None]
+        result.extend(e.actor for e in sorted(self._pending.entries(), key=lambda e: e.order))
+        next_round = list(self._acted.entries()) + list(self._readied.values())
+        result.extend(e.actor for e in sorted(next_round, key=lambda e: e.order))
+        return result
@@ -1,4 +1,9 @@
 
+import threading
+
+import dnd.bonus as _bonus
+import dnd.instrument as _instrument
+
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from typing import Any, Callable, List, Optional, Tuple, Union
@@ -14,10 +19,45 @@ class Listener(object):
         self.update(variable, note, old_value, new_value)
 
 
+class _NullLock(object):
+    """A stand-in for a lock used by variables that are not shared between threads."""
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        return True
+
+    def release(self) -> None:
+        pass
+
+    def __enter__(self) -> bool:
+        return True
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> bool:
+        return False
+
+
+NullLock = _NullLock()
+
+
+def new_lock() -> 'threading.RLock':
+    """Create a lock suitable for sharing between Variables.
+
+    Compound updates (e.g. Points.inc_current()) re-enter the lock through
+    the plain setters, so the lock must be reentrant.
+    """
+    return threading.RLock()
+
+
 class Variable(object):
+    # Variables are unlocked unless given a lock. The default lives on the
+    # class so unlocked variables don't pay for it per instance.
+    _lock = NullLock
+
     def __init__(self, **kwargs):
         self._listeners = list()  # type: List[VariableListener]
 
+        lock = kwargs.pop('lock', None)
+        if lock is not None:
+            self._lock = lock
+
         listener = kwargs.pop('listener', None)    # type: Optional[VariableListener]
         listeners = kwargs.pop('listeners', None)  # type: Optional[List[VariableListener]]
 
@@ -39,7 +79,22 @@ class Variable(object):
     def get_listener(self, index: int) -> 'VariableListener':
         return self._listeners[index]
 
+    def lock(self) -> 'Any':
+        """Get the lock guarding this variable.
+
+        Holding the lock makes a series of reads and updates atomic with
+        respect to other threads using the same variable. Listeners are
+        notified while the lock is held.
+        """
+        return self._lock
+
+    def set_lock(self, lock: 'Optional[Any]') -> None:
+        self._lock = lock if lock is not None else NullLock
+
     def notify(self, old_value: 'Any', new_value: 'Any', note: 'Optional[str]' = None) -> None:
+        if _instrument.active is not None:
+            _instrument.active.dispatch(self._listeners, (self, old_value, new_value, note))
+            return
         for listener in self._listeners:
             listener(self, old_value, new_value, note)
 
@@ -53,8 +108,18 @@ class AnyVar(Variable):
         return self._value
 
     def set(self, value: 'Any') -> None:
-        old_value, self._value = self._value, value
-        self.notify(old_value, value)
+        with self._lock:
+            old_value, self._value = self._value, value
+            self.notify(old_value, value)
+
+    def update(self, func: 'Callable[[Any], Any]') -> 'Any':
+        """Atomically replace the value with func(value).
+
+        :return: The new value
+        """
+        with self._lock:
+            self.set(func(self._value))
+            return self._value
 
     def __add__(self, other: 'Any') -> 'Any':
         return self._value + other
@@ -135,51 +200,63 @@ class AnyVar(Variable):
         return other | self._value
 
     def __iadd__(self, other: 'Any') -> 'AnyVar':
-        self.set(self._value + other)
+        with self._lock:
+            self.set(self._value + other)
         return self
 
     def __isub__(self, other: 'Any') -> 'AnyVar':
-        self.set(self._value - other)
+        with self._lock:
+            self.set(self._value - other)
         return self
 
     def __imul__(self, other: 'Any') -> 'AnyVar':
-        self.set(self._value * other)
+        with self._lock:
+            self.set(self._value * other)
         return self
 
     def __itruediv__(self, other: 'Any') -> 'AnyVar':
-        self.set(self._value / other)
+        with self._lock:
+            self.set(self._value / other)
         return self
 
     def __ifloordiv__(self, other: 'Any') -> 'AnyVar':
-        self.set(self._value // other)
+        with self._lock:
+            self.set(self._value // other)
         return self
 
     def __imod__(self, other: 'Any') -> 'AnyVar':
-        self.set(self._value % other)
+        with self._lock:
+            self.set(self._value % other)
         return self
 
     def __ipow__(self, other: 'Any') -> 'AnyVar':
-        self.set(self._value ** other)
+        with self._lock:
+            self.set(self._value ** other)
         return self
 
     def __ilshift__(self, other: 'Any') -> 'AnyVar':
-        self.set(self._value << other)
+        with self._lock:
+            self.set(self._value << other)
         return self
 
     def __irshift__(self, other: 'Any') -> 'AnyVar':
-        self.set(self._value >> other)
+        with self._lock:
+            self.set(self._value >> other)
         return self
 
     def __iand__(self, other: 'Any') -> 'AnyVar':
-        self.set(self._value & other)
+        with self._lock:
+            self.set(self._value & other)
         return self
 
     def __ior__(self, other: 'Any') -> 'AnyVar':
-        self.set(self._value | other)
+        with self._lock:
+            self.set(self._value | other)
         return self
 
     def __ixor__(self, other: 'Any') -> 'AnyVar':
-        self.set(self._value ^ other)
+        with self._lock:
+            self.set(self._value ^ other)
         return self
 
     def __neg__(self) -> 'Any':
@@ -215,8 +292,9 @@ class IntVar(AnyVar):
         return self._value
 
     def set(self, value: int) -> None:
-        old_value, self._value = self._value, int(value)
-        self.notify(old_value, value)
+        with self._lock:
+            old_value, self._value = self._value, int(value)
+            self.notify(old_value, value)
 
     def __neg__(self) -> int:
         return -self._value
@@ -245,8 +323,9 @@ class FloatVar(AnyVar):
         return self._value
 
     def set(self, value: float) -> None:
-        old_value, self._value = self._value, float(value)
-        self.notify(old_value, value)
+        with self._lock:
+            old_value, self._value = self._value, float(value)
+            self.notify(old_value, value)
 
     def __neg__(self) -> float:
         return -self._value
@@ -272,8 +351,9 @@ class StrVar(AnyVar):
         return self._value
 
     def set(self, value: str) -> None:
-        old_value, self._value = self._value, str(value)
-        self.notify(old_value, value)
+        with self._lock:
+            old_value, self._value = self._value, str(value)
+            self.notify(old_value, value)
 
     def __int__(self) -> int:
         return int(self._value)
@@ -286,6 +366,16 @@ class StrVar(AnyVar):
 
 
 class Attribute(Variable):
+    # Sources used for the fixed adjustments once typed modifiers are in use.
+    # The level/racial/enhance/spell fields stay the source of truth; these
+    # sources are re-synced from them whenever the modifiers are read.
+    _RacialSource = ('attribute', 'racial')
+    _EnhanceSource = ('attribute', 'enhancement')
+    _SpellSource = ('attribute', 'spell')
+
+    # Created on demand by modifiers()
+    _modifiers = None  # type: Optional[_bonus.ModifierSet]
+
     def __init__(self, level: int = 10, **kwargs):
         self._level = level
         self._racial = int(kwargs.pop('racial', 0))
@@ -295,98 +385,161 @@ class Attribute(Variable):
 
     def level(self, new_value: 'Optional[int]' = None) -> int:
         if new_value is not None:
-            old_val, self._level = self._level, new_value
-            self.notify(old_val, self._level, "level")
+            with self._lock:
+                old_val, self._level = self._level, new_value
+                self.notify(old_val, self._level, "level")
         return self._level
 
     def racial(self, new_value: 'Optional[int]' = None) -> int:
         if new_value is not None:
-            old_val, self._racial = self._racial, new_value
-            self.notify(old_val, self._racial, "racial")
+            with self._lock:
+                old_val, self._racial = self._racial, new_value
+                self.notify(old_val, self._racial, "racial")
         return self._racial
 
     def enhancement(self, new_value: 'Optional[int]' = None) -> int:
         if new_value is not None:
-            old_val, self._enhance = self._enhance, new_value
-            self.notify(old_val, self._enhance, "enhancement")
+            with self._lock:
+                old_val, self._enhance = self._enhance, new_value
+                self.notify(old_val, self._enhance, "enhancement")
         return self._enhance
 
     def spell(self, new_value: 'Optional[int]' = None) -> int:
         if new_value is not None:
-            old_val, self._spell = self._spell, new_value
-            self.notify(old_val, self._spell, "spell")
+            with self._lock:
+                old_val, self._spell = self._spell, new_value
+                self.notify(old_val, self._spell, "spell")
         return self._spell
 
     def current(self) -> int:
+        if self._modifiers is not None:
+            return self._level + self._synced_modifiers().total()
         return self._level + self._racial + self._enhance + self._spell
 
+    def _synced_modifiers(self) -> '_bonus.ModifierSet':
+        # Bring the built-in sources in line with the fields, which may have
+        # been written directly (e.g. by snapshot.restore())
+        modifiers = self._modifiers
+        for source, type_, value in ((Attribute._RacialSource, 'racial', self._racial),
+                                     (Attribute._EnhanceSource, 'enhancement', self._enhance),
+                                     (Attribute._SpellSource, 'untyped', self._spell)):
+            entry = modifiers.get(source)
+            if entry is None or entry[1] != value:
+                modifiers.add(source, type_, value, False)
+        return modifiers
+
+    def modifiers(self) -> '_bonus.ModifierSet':
+        """Get the typed modifiers of this attribute, creating them if needed.
+
+        Once typed modifiers are in use the racial, enhancement and spell
+        adjustments are tracked as 'racial', 'enhancement' and 'untyped'
+        modifiers, so e.g. a belt's enhancement bonus and an enhancement
+        spell no longer stack.
+        """
+        with self._lock:
+            if self._modifiers is None:
+                self._modifiers = _bonus.ModifierSet(self._modifiers_changed)
+            return self._synced_modifiers()
+
+    def _modifiers_changed(self, modifiers: '_bonus.ModifierSet', old_total: int, new_total: int) -> None:
+        self.notify(self._level + old_total, self._level + new_total, "modifiers")
+
+    def add_modifier(self, source: 'Any', type_: str, value: int) -> int:
+        """Add a typed modifier from a source, returning the new current value."""
+        with self._lock:
+            self.modifiers().add(source, type_, value)
+            return self.current()
+
+    def remove_modifier(self, source: 'Any') -> int:
+        with self._lock:
+            self.modifiers().remove(source)
+            return self.current()
+
     def mod(self) -> int:
         return (self.current() // 2) - 5
 
     def inc_level(self, amount: int = 1) -> int:
-        return self.level(self._level + amount)
+        with self._lock:
+            return self.level(self._level + amount)
 
     def dec_level(self, amount: int = 1) -> int:
-        return self.level(self._level - amount)
+        with self._lock:
+            return self.level(self._level - amount)
 
     def inc_enhancement(self, amount: int = 1) -> int:
-        return self.enhancement(self._enhance + amount)
+        with self._lock:
+            return self.enhancement(self._enhance + amount)
 
     def dec_enhancement(self, amount: int = 1) -> int:
-        return self.enhancement(self._enhance - amount)
+        with self._lock:
+            return self.enhancement(self._enhance - amount)
 
     def inc_spell(self, amount: int = 1) -> int:
-        return self.spell(self._spell + amount)
+        with self._lock:
+            return self.spell(self._spell + amount)
 
     def dec_spell(self, amount: int = 1) -> int:
-        return self.spell(self._spell - amount)
+        with self._lock:
+            return self.spell(self._spell - amount)
 
     def __iadd__(self, other: 'Any') -> 'Attribute':
-        self.level(self._level + other)
+        with self._lock:
+            self.level(self._level + other)
         return self
 
     def __isub__(self, other: 'Any') -> 'Attribute':
-        self.level(int(self._level - other))
+        with self._lock:
+            self.level(int(self._level - other))
         return self
 
     def __imul__(self, other: 'Any') -> 'Attribute':
-        self.level(int(self._level * other))
+        with self._lock:
+            self.level(int(self._level * other))
         return self
 
     def __itruediv__(self, other: 'Any') -> 'Attribute':
-        self.level(int(self._level / other))
+        with self._lock:
+            self.level(int(self._level / other))
         return self
 
     def __ifloordiv__(self, other: 'Any') -> 'Attribute':
-        self.level(int(self._level // other))
+        with self._lock:
+            self.level(int(self._level // other))
         return self
 
     def __imod__(self, other: 'Any') -> 'Attribute':
-        self.level(int(self._level % other))
+        with self._lock:
+            self.level(int(self._level % other))
         return self
 
     def __ipow__(self, other: 'Any', modulo: 'Any') -> 'Attribute':
-        self.level(int(pow(self._level, other, modulo)))
+        with self._lock:
+            self.level(int(pow(self._level, other, modulo)))
         return self
 
     def __ilshift__(self, other: 'Any') -> 'Attribute':
-        self.level(int(self._level << other))
+        with self._lock:
+            self.level(int(self._level << other))
         return self
 
     def __irshift__(self, other: 'Any') -> 'Attribute':
-        self.level(int(self._level >> other))
+        with self._lock:
+            self.level(int(self._level >> other))
         return self
 
     def __iand__(self, other: 'Any') -> 'Attribute':
-        self.level(int(self._level & other))
+        with self._lock:
+            self.level(int(self._level & other))
         return self
 
     def __ixor__(self, other: 'Any') -> 'Attribute':
-        self.level(int(self._level ^ other))
+        with self._lock:
+            self.level(int(self._level ^ other))
         return self
 
     def __ior__(self, other: 'Any') -> 'Attribute':
-        self.level(int(self._level | other))
+        with self._lock:
+            self.level(int(self._level | other))
         return self
 
     def __neg__(self) -> int:
@@ -430,47 +583,73 @@ class Points(Variable):
 
     def max(self, new_value: 'Optional[int]' = None) -> int:
         if new_value is not None:
-            old_val, self._max = self._max, int(new_value)
-            self.notify(old_val, self._max, "max")
+            with self._lock:
+                old_val, self._max = self._max, int(new_value)
+                self.notify(old_val, self._max, "max")
         return self._max
 
     def current(self, new_value: 'Optional[int]' = None) -> int:
         if new_value is not None:
-            old_val, self._current = self._current, int(new_value)
-            self.notify(old_val, self._current, "current")
+            with self._lock:
+                old_val, self._current = self._current, int(new_value)
+                self.notify(old_val, self._current, "current")
         return self._current
 
     def temp(self, new_value: 'Optional[int]' = None) -> int:
         if new_value is not None:
-            old_val, self._temp = self._temp, int(new_value)
-            self.notify(old_val, self._temp, "temp")
+            with self._lock:
+                old_val, self._temp = self._temp, int(new_value)
+                self.notify(old_val, self._temp, "temp")
         return self._temp
 
     def value(self) -> int:
         return self._current + self._temp
 
     def inc_max(self, amount: int = 1) -> int:
-        old_val, self._max = self._max, int(self._max + amount)
-        self._current += amount
-        self.notify(old_val, self._max, "max,current")
-        return self._max
+        with self._lock:
+            old_val, self._max = self._max, int(self._max + amount)
+            self._current += amount
+            self.notify(old_val, self._max, "max,current")
+            return self._max
 
     def dec_max(self, amount: int) -> int:
         return self.inc_max(-amount)
 
     def inc_current(self, amount: int = 1) -> int:
-        old_val, self._current = self._current, min(int(self._current + amount), self._max)
-        if old_val != self._current:
-            self.notify(old_val, self._current, "current")
-        return self._current
+        with self._lock:
+            old_val, self._current = self._current, min(int(self._current + amount), self._max)
+            if old_val != self._current:
+                self.notify(old_val, self._current, "current")
+            return self._current
 
     def dec_current(self, amount: int = 1) -> int:
         return self.inc_current(-amount)
 
+    def damage(self, amount: int) -> int:
+        """Apply damage, removing temporary points before current points.
+
+        Listeners are notified once, with the old and new value(). Raises
+        a ValueError if amount is negative; use inc_current() to heal.
+
+        :return: The new value()
+        """
+        amount = int(amount)
+        if amount < 0:
+            raise ValueError("Damage must not be negative, got {}".format(amount))
+        with self._lock:
+            old_val = self._current + self._temp
+            absorbed = min(max(self._temp, 0), amount)
+            self._temp -= absorbed
+            self._current -= amount - absorbed
+            if amount != 0:
+                self.notify(old_val, self._current + self._temp, "temp,current")
+            return self._current + self._temp
+
     def inc_temp(self, amount: int = 1) -> int:
-        old_val, self._temp = self._temp, int(self._temp + amount)
-        self.notify(old_val, self._current)
-        return self._temp
+        with self._lock:
+            old_val, self._temp = self._temp, int(self._temp + amount)
+            self.notify(old_val, self._temp, "temp")
+            return self._temp
 
     def __str__(self) -> str:
         return "{}/{}".format(self.value(), self._max)